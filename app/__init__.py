@@ -120,8 +120,30 @@ def create_app(config_overrides=None):
     migrate.init_app(app, db)
     csrf.init_app(app)
 
+    from .fragment_cache import init_fragment_cache
+    init_fragment_cache(app)
+
     # Import models
     from . import models
+    from . import result_stats
+    from . import search_index
+    from . import vocab_sync
+    from . import vocab_import
+
+    from .catalog_index import init_catalog_index
+    init_catalog_index(app)
+
+    from .http_client import init_http_client
+    init_http_client(app)
+
+    from .audio_cache import init_audio_cache
+    init_audio_cache(app)
+
+    from .result_queue import init_result_queue
+    init_result_queue(app)
+
+    from .cli import register_commands
+    register_commands(app)
 
     # Register Blueprints
     from .routes.auth import auth_bp
@@ -0,0 +1,286 @@
+"""On-disk LRU cache for proxied text-to-speech clips, shared by all workers."""
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import ExitStack
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+import requests
+from flask import current_app
+from werkzeug.utils import import_string
+
+from .http_client import get_http_client
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+EXTENSION_KEY = 'audio_cache'
+SUFFIX = '.mp3'
+CHUNK_SIZE = 16 * 1024
+# Writes between rescans that pick up clips written by other workers
+EVICT_SCAN_INTERVAL = 256
+# Upstream response headers passed on to the client
+FORWARDED_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges')
+
+GOOGLE_TTS_URL = 'https://translate.google.com/translate_tts'
+
+
+def normalize_tts_text(text: str) -> str:
+    """Case and spacing do not change the audio, so they do not change the key."""
+    return ' '.join((text or '').split()).lower()
+
+
+class AudioStream(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    chunks: Iterable[bytes]
+    close: Callable[[], None]
+
+
+def google_tts(text: str, lang: str, range_header: Optional[str] = None) -> AudioStream:
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    if range_header:
+        headers['Range'] = range_header
+    stack = ExitStack()
+    # The pooled client's slot is held until the response is closed
+    response = stack.enter_context(get_http_client().stream(
+        GOOGLE_TTS_URL,
+        params={'ie': 'UTF-8', 'tl': lang, 'client': 'gtx', 'q': text},
+        headers=headers,
+    ))
+    try:
+        response.raise_for_status()
+    except BaseException:
+        stack.close()
+        raise
+
+    def chunks():
+        try:
+            yield from response.iter_content(CHUNK_SIZE)
+        except requests.RequestException as e:
+            # Closing with the error, not just on close, counts it as a failure
+            stack.__exit__(type(e), e, e.__traceback__)
+            raise
+
+    return AudioStream(
+        response.status_code,
+        {name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers},
+        chunks(),
+        stack.close,
+    )
+
+
+class CacheWriter:
+    """Accumulates one clip in a temporary file; ``commit`` publishes it."""
+
+    def __init__(self, cache: 'AudioCache', key: str):
+        self.cache = cache
+        self.path = cache.path(key)
+        self.size = 0
+        self._file = None
+        self._tmp_path = None
+
+    def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            # Created on the first chunk, so an unstarted stream leaves nothing behind
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            self._file = os.fdopen(fd, 'wb')
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> str:
+        if self._file is None:
+            self.write(b'')
+        self._file.close()
+        # Published in one step, so readers never see a partial clip
+        os.replace(self._tmp_path, self.path)
+        self._file = self._tmp_path = None
+        self.cache.added(self.size)
+        return self.path
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self._tmp_path)
+            self._file = self._tmp_path = None
+
+
+class AudioCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Estimated size of the cache; None until the first scan
+        self.current_bytes = None
+        self._writes = 0
+        self._stats_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # Clips live at <dir>/<key[:2]>/<key>.mp3, so every worker and restart
+    # finds the same files
+    @staticmethod
+    def key(lang: str, text: str) -> str:
+        return hashlib.sha256(f'{lang}\0{normalize_tts_text(text)}'.encode('utf-8')).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + SUFFIX)
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached clip, or None; a hit marks the clip as recently used.
+
+        The file's mtime is the LRU clock.
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._stats_lock:
+                self.misses += 1
+            return None
+        with self._stats_lock:
+            self.hits += 1
+        return path
+
+    def writer(self, key: str) -> CacheWriter:
+        return CacheWriter(self, key)
+
+    def put(self, key: str, data: bytes) -> str:
+        writer = self.writer(key)
+        try:
+            writer.write(data)
+            return writer.commit()
+        finally:
+            writer.abort()
+
+    def added(self, size: int) -> int:
+        """Count a newly written clip, evicting once the total may be over the cap.
+
+        The total is this worker's last scan plus its own writes since, so a
+        miss only rescans the shards when it passes the cap (or every
+        ``EVICT_SCAN_INTERVAL`` writes, to pick up other workers' clips).
+        """
+        with self._stats_lock:
+            self._writes += 1
+            if self.current_bytes is not None:
+                self.current_bytes += size
+            due = (
+                self.current_bytes is None
+                or self.current_bytes > self.max_bytes
+                or self._writes % EVICT_SCAN_INTERVAL == 0
+            )
+        return self.evict() if due else 0
+
+    def _clips(self):
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for clip in os.scandir(entry.path):
+                if clip.name.endswith(SUFFIX):
+                    try:
+                        stat = clip.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, clip.path
+
+    def evict(self) -> int:
+        """Drop least recently used clips down to 90% once the cache is over its cap.
+
+        Runs under an ``flock``, so only one worker evicts at a time.
+        """
+        lock_path = os.path.join(self.directory, '.evict.lock')
+        with open(lock_path, 'w') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another worker is already evicting
+                    return 0
+            clips = list(self._clips())
+            total = sum(size for _, size, _ in clips)
+            if total <= self.max_bytes:
+                with self._stats_lock:
+                    self.current_bytes = total
+                return 0
+            target = self.max_bytes * 0.9
+            evicted = 0
+            for _, size, path in sorted(clips):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+        with self._stats_lock:
+            self.current_bytes = total
+            self.evictions += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'current_bytes': self.current_bytes or 0,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def init_audio_cache(app) -> Optional[AudioCache]:
+    max_bytes = app.config.get('AUDIO_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    if not max_bytes:
+        return None
+    directory = app.config.get('AUDIO_CACHE_DIR') or os.path.join(app.instance_path, 'audio_cache')
+    cache = AudioCache(directory, max_bytes)
+    app.extensions[EXTENSION_KEY] = cache
+    return cache
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def get_tts_upstream() -> Callable[..., Union[bytes, AudioStream]]:
+    # A callable or import path taking (text, lang), so tests and
+    # benchmarks can swap in a local stub
+    upstream = current_app.config.get('TTS_UPSTREAM') or google_tts
+    if isinstance(upstream, str):
+        upstream = import_string(upstream)
+    return upstream
+
+
+def open_tts_stream(text: str, lang: str, range_header: Optional[str] = None) -> AudioStream:
+    """Start fetching a clip; upstreams may return plain bytes or an AudioStream.
+
+    ``range_header`` is only passed (as a keyword) when the client asked for
+    part of the clip, so simple ``(text, lang)`` stubs keep working.
+    """
+    upstream = get_tts_upstream()
+    if range_header:
+        result = upstream(text, lang, range_header=range_header)
+    else:
+        result = upstream(text, lang)
+    if isinstance(result, bytes):
+        return AudioStream(200, {'Content-Length': str(len(result))}, [result], lambda: None)
+    return result
+
+
+def tee_to_cache(chunks: Iterable[bytes], writer: CacheWriter, expected_length: Optional[int] = None) -> Iterator[bytes]:
+    """Yield ``chunks`` while writing them to ``writer``; commit only a complete body."""
+    try:
+        for chunk in chunks:
+            if chunk:
+                writer.write(chunk)
+                yield chunk
+        if expected_length is None or writer.size == expected_length:
+            writer.commit()
+    finally:
+        writer.abort()
@@ -0,0 +1,297 @@
+"""In-process indexes of book titles and test names for autocomplete and fuzzy search."""
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+from . import db
+from .models import Book, Test
+from .utils import normalize_text
+
+EXTENSION_KEY = 'catalog_index'
+BOOKS = 'books'
+TESTS = 'tests'
+_SESSION_KEY = 'catalog_index_changes'
+
+
+class PrefixIndex:
+    """Word-prefix lookup over a multiset of names.
+
+    Keeps the ``normalize_text`` form of every distinct name in two sorted
+    lists, the whole name and each suffix starting at a later word, so a
+    lookup is a ``bisect`` plus a walk of at most ``limit`` entries.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, str]] = ()):
+        self._by_id: Dict[int, str] = {}
+        self._counts: Dict[str, int] = {}
+        # Sorted (normalized key, display name) pairs
+        self._whole: List[Tuple[str, str]] = []
+        self._words: List[Tuple[str, str]] = []
+        for item_id, name in items:
+            self._by_id[item_id] = name
+            self._counts[name] = self._counts.get(name, 0) + 1
+        for name in self._counts:
+            whole, words = self._keys(name)
+            self._whole.append(whole)
+            self._words.extend(words)
+        self._whole.sort()
+        self._words.sort()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    @staticmethod
+    def _keys(name: str):
+        normalized = normalize_text(name)
+        words = []
+        position = normalized.find(' ')
+        while position != -1:
+            words.append((normalized[position + 1:], name))
+            position = normalized.find(' ', position + 1)
+        return (normalized, name), words
+
+    def add(self, item_id: int, name: str) -> None:
+        if self._by_id.get(item_id) == name:
+            return
+        self.discard(item_id)
+        self._by_id[item_id] = name
+        count = self._counts.get(name, 0)
+        self._counts[name] = count + 1
+        if count:
+            return
+        whole, words = self._keys(name)
+        insort(self._whole, whole)
+        for key in words:
+            insort(self._words, key)
+
+    def discard(self, item_id: int) -> None:
+        name = self._by_id.pop(item_id, None)
+        if name is None:
+            return
+        count = self._counts.pop(name) - 1
+        if count:
+            self._counts[name] = count
+            return
+        whole, words = self._keys(name)
+        for entries, key in [(self._whole, whole)] + [(self._words, key) for key in words]:
+            index = bisect_left(entries, key)
+            if index < len(entries) and entries[index] == key:
+                del entries[index]
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """Names starting with ``query``, then names with a later word starting with it."""
+        prefix = normalize_text(query)
+        if not prefix or limit <= 0:
+            return []
+        results = []
+        seen = set()
+        for entries in (self._whole, self._words):
+            index = bisect_left(entries, (prefix,))
+            while index < len(entries) and len(results) < limit:
+                key, name = entries[index]
+                if not key.startswith(prefix):
+                    break
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                index += 1
+        return results
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    """Trigrams of each word padded like pg_trgm: two spaces before, one after."""
+    grams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """Similarity-ranked fuzzy lookup of ids by name.
+
+    Names are ranked by Jaccard similarity of their trigrams to the query.
+    Candidates come from the rarest query trigrams first, capped at
+    ``max_candidates``, so a lookup does bounded work.
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, str]] = (), max_candidates: int = 2000):
+        self.max_candidates = max_candidates
+        self._by_id: Dict[int, str] = {}
+        self._ids: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        for item_id, name in items:
+            self.add(item_id, name)
+
+    def add(self, item_id: int, name: str) -> None:
+        normalized = normalize_text(name)
+        if self._by_id.get(item_id) == normalized:
+            return
+        self.discard(item_id)
+        self._by_id[item_id] = normalized
+        ids = self._ids.get(normalized)
+        if ids is not None:
+            ids.add(item_id)
+            return
+        self._ids[normalized] = {item_id}
+        grams = self._grams[normalized] = trigrams(normalized)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(normalized)
+
+    def discard(self, item_id: int) -> None:
+        normalized = self._by_id.pop(item_id, None)
+        if normalized is None:
+            return
+        ids = self._ids[normalized]
+        ids.discard(item_id)
+        if ids:
+            return
+        del self._ids[normalized]
+        for gram in self._grams.pop(normalized):
+            names = self._postings[gram]
+            names.discard(normalized)
+            if not names:
+                del self._postings[gram]
+
+    def search(self, query: str, limit: int = 50, threshold: float = 0.3) -> List[int]:
+        """Ids whose name is at least ``threshold`` similar to ``query``, best first."""
+        query_grams = trigrams(normalize_text(query))
+        if not query_grams:
+            return []
+        postings = sorted(
+            (self._postings[gram] for gram in query_grams if gram in self._postings),
+            key=len,
+        )
+        candidates: Set[str] = set()
+        for names in postings:
+            if len(candidates) + len(names) > self.max_candidates:
+                if candidates:
+                    break
+                names = list(names)[:self.max_candidates]
+            candidates.update(names)
+
+        scored = []
+        for normalized in candidates:
+            grams = self._grams[normalized]
+            shared = len(query_grams & grams)
+            similarity = shared / (len(query_grams) + len(grams) - shared)
+            if similarity >= threshold:
+                scored.append((-similarity, normalized))
+        scored.sort()
+
+        results = []
+        for _, normalized in scored:
+            results.extend(sorted(self._ids[normalized]))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+
+class CatalogIndex:
+    """This worker's prefix and trigram indexes of books and tests.
+
+    Built on first use and rebuilt every ``refresh_interval`` seconds to pick
+    up other workers' changes; this worker's own commits apply straight away.
+
+    Readers do not take the lock: a lookup racing an update may miss or
+    repeat an entry for that one response, which autocomplete can live with.
+    """
+
+    def __init__(self, refresh_interval: float = 300):
+        self.refresh_interval = refresh_interval
+        self.indexes: Dict[str, PrefixIndex] = {BOOKS: PrefixIndex(), TESTS: PrefixIndex()}
+        self.fuzzy: Dict[str, TrigramIndex] = {BOOKS: TrigramIndex(), TESTS: TrigramIndex()}
+        self.built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def rebuild(self) -> None:
+        books = db.session.execute(db.select(Book.id, Book.title)).all()
+        tests = db.session.execute(db.select(Test.id, Test.name)).all()
+        indexes = {BOOKS: PrefixIndex(books), TESTS: PrefixIndex(tests)}
+        fuzzy = {BOOKS: TrigramIndex(books), TESTS: TrigramIndex(tests)}
+        with self._lock:
+            self.indexes = indexes
+            self.fuzzy = fuzzy
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        built_at = self.built_at
+        if built_at is not None and time.monotonic() - built_at < self.refresh_interval:
+            return
+        # One thread rebuilds; the others keep serving the previous index
+        if not self._rebuild_lock.acquire(blocking=built_at is None):
+            return
+        try:
+            if self.built_at == built_at:
+                self.rebuild()
+        finally:
+            self._rebuild_lock.release()
+
+    def search(self, kind: str, query: str, limit: int = 10) -> List[str]:
+        self.ensure_fresh()
+        return self.indexes[kind].search(query, limit)
+
+    def fuzzy_search(self, kind: str, query: str, limit: int = 50) -> List[int]:
+        self.ensure_fresh()
+        return self.fuzzy[kind].search(query, limit)
+
+    def apply(self, changes: Iterable[Tuple[str, int, Optional[str]]]) -> None:
+        """Apply ``(kind, id, name)`` changes; a name of None removes the row."""
+        with self._lock:
+            for kind, item_id, name in changes:
+                for index in (self.indexes[kind], self.fuzzy[kind]):
+                    if name is None:
+                        index.discard(item_id)
+                    else:
+                        index.add(item_id, name)
+
+
+# --- Following commits -----------------------------------------------------
+
+_NAME_ATTRIBUTES = ((Book, BOOKS, 'title'), (Test, TESTS, 'name'))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault(_SESSION_KEY, [])
+    for model, kind, attribute in _NAME_ATTRIBUTES:
+        for obj in session.new:
+            if isinstance(obj, model):
+                changes.append((kind, obj.id, getattr(obj, attribute)))
+        for obj in session.dirty:
+            if isinstance(obj, model) and attributes.get_history(obj, attribute).has_changes():
+                changes.append((kind, obj.id, getattr(obj, attribute)))
+        for obj in session.deleted:
+            if isinstance(obj, model):
+                changes.append((kind, obj.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop(_SESSION_KEY, None)
+    if changes and has_app_context():
+        catalog = current_app.extensions.get(EXTENSION_KEY)
+        if catalog is not None and catalog.built_at is not None:
+            catalog.apply(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def init_catalog_index(app) -> CatalogIndex:
+    catalog = CatalogIndex(refresh_interval=app.config.get('CATALOG_INDEX_REFRESH', 300))
+    app.extensions[EXTENSION_KEY] = catalog
+    return catalog
+
+
+def get_catalog_index() -> CatalogIndex:
+    return current_app.extensions[EXTENSION_KEY]
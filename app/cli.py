@@ -0,0 +1,98 @@
+import json
+
+import click
+
+
+def register_commands(app):
+    @app.cli.command('backfill-test-stats')
+    def backfill_test_stats_command():
+        """Recompute question counts and score statistics for all tests."""
+        from .result_stats import backfill_test_stats
+
+        updated = backfill_test_stats()
+        click.echo(f'Updated statistics for {updated} tests.')
+
+    @app.cli.command('grade-batch')
+    @click.argument('test_id', type=int)
+    @click.argument('submissions_file', type=click.File('r', encoding='utf-8'))
+    def grade_batch_command(test_id, submissions_file):
+        """Grade a JSON file of submissions for TEST_ID ('-' reads stdin).
+
+        The file holds a list (or {"submissions": [...]}) of objects with
+        "username" or "user_id" and "answers" ({qid: answer}).
+        """
+        from sqlalchemy.orm import undefer
+
+        from .grading import GradingError, grade_batch, save_results
+        from .models import Test
+
+        test = Test.query.options(undefer(Test.compiled_content)).filter_by(id=test_id).first()
+        if test is None:
+            raise click.ClickException(f'Test {test_id} does not exist.')
+
+        data = json.load(submissions_file)
+        submissions = data.get('submissions') if isinstance(data, dict) else data
+        if not isinstance(submissions, list) or not all(isinstance(sub, dict) for sub in submissions):
+            raise click.ClickException('Expected a list of submission objects.')
+
+        try:
+            graded = grade_batch(test, submissions)
+        except GradingError as e:
+            raise click.ClickException(str(e))
+        save_results(test, graded)
+
+        for row in graded:
+            click.echo(f"{row['username']}\t{row['score']}/{row['total_questions']}")
+        click.echo(f'Graded {len(graded)} submissions for "{test.name}".')
+
+    @app.cli.command('flush-result-journal')
+    def flush_result_journal_command():
+        """Write journaled test results (RESULT_WRITE_BEHIND) to the database."""
+        from .result_queue import get_result_queue
+
+        queue = get_result_queue()
+        if queue is None:
+            raise click.ClickException('RESULT_WRITE_BEHIND is not enabled.')
+        click.echo(f'Inserted {queue.flush()} journaled results.')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Repopulate the full-text search tables from books and tests."""
+        from .search_index import rebuild_search_index
+
+        click.echo(f'Indexed {rebuild_search_index()} books and tests.')
+
+    @app.cli.command('prune-vocabulary-tombstones')
+    def prune_vocabulary_tombstones_command():
+        """Delete sync tombstones older than SYNC_TOMBSTONE_TTL."""
+        from .vocab_sync import prune_tombstones
+
+        click.echo(f'Pruned {prune_tombstones()} tombstones.')
+
+    @app.cli.command('import-vocabulary')
+    @click.argument('words_file', type=click.File('rb'))
+    @click.option('--user', 'usernames', multiple=True, help='Username to import into (repeatable).')
+    @click.option('--user-id', 'user_ids', multiple=True, type=int, help='User id to import into (repeatable).')
+    @click.option('--format', 'fmt', help='csv, jsonl or json (default: from the file name, else csv).')
+    def import_vocabulary_command(words_file, usernames, user_ids, fmt):
+        """Add a word list to the vocabulary of the given users ('-' reads stdin).
+
+        Words already in a user's vocabulary are skipped.
+        """
+        from .vocab_import import InvalidImport, find_users, import_format, import_vocabulary, read_rows
+
+        user_ids, missing = find_users(user_ids, usernames)
+        if missing:
+            raise click.ClickException(f'Unknown users: {", ".join(missing)}')
+        if not user_ids:
+            raise click.ClickException('Pass at least one --user or --user-id.')
+        fmt = (import_format(fmt) or fmt) if fmt else (import_format(words_file.name) or 'csv')
+
+        try:
+            result = import_vocabulary(read_rows(words_file, fmt), user_ids)
+        except InvalidImport as e:
+            raise click.ClickException(f'Invalid {fmt} file: {e}')
+        click.echo(
+            f'Inserted {result.inserted} words for {result.users} users '
+            f'({result.duplicates} duplicates, {result.invalid} invalid rows skipped).'
+        )
@@ -4,3 +4,41 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pre-rendered take_test question HTML kept in memory per worker
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 512))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    # Journal TestResult inserts and write them in batches from a background thread
+    RESULT_WRITE_BEHIND = os.environ.get('RESULT_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+    RESULT_JOURNAL_DIR = os.environ.get('RESULT_JOURNAL_DIR')  # default: <instance>/result_journal
+    RESULT_FLUSH_INTERVAL = float(os.environ.get('RESULT_FLUSH_INTERVAL', 1.0))
+    RESULT_FLUSH_BATCH = int(os.environ.get('RESULT_FLUSH_BATCH', 500))
+    # Seconds before a worker reloads its autocomplete index from the database
+    CATALOG_INDEX_REFRESH = int(os.environ.get('CATALOG_INDEX_REFRESH', 300))
+    # Proxied TTS clips cached on disk and shared by all workers (0 disables the cache)
+    AUDIO_CACHE_DIR = os.environ.get('AUDIO_CACHE_DIR')  # default: <instance>/audio_cache
+    AUDIO_CACHE_MAX_BYTES = int(os.environ.get('AUDIO_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    AUDIO_CACHE_MAX_AGE = int(os.environ.get('AUDIO_CACHE_MAX_AGE', 30 * 24 * 3600))
+    # 'module:function' taking (text, lang) and returning MP3 bytes; default: Google Translate TTS
+    TTS_UPSTREAM = os.environ.get('TTS_UPSTREAM')
+    # Word translations cached in the database; refetched after this many seconds
+    TRANSLATION_CACHE_TTL = int(os.environ.get('TRANSLATION_CACHE_TTL', 30 * 24 * 3600))
+    TRANSLATE_MAX_WORKERS = int(os.environ.get('TRANSLATE_MAX_WORKERS', 8))
+    TRANSLATE_BATCH_MAX_WORDS = int(os.environ.get('TRANSLATE_BATCH_MAX_WORDS', 100))
+    # 'module:function' taking (word, source, target) and returning the translation
+    TRANSLATE_UPSTREAM = os.environ.get('TRANSLATE_UPSTREAM')
+    # Outbound HTTP (TTS, translation): (connect, read) timeouts in seconds, keep-alive
+    # connections per host, in-flight calls per worker, and the per-host circuit breaker
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10.0))
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+    HTTP_MAX_CONCURRENCY = int(os.environ.get('HTTP_MAX_CONCURRENCY', 16))
+    HTTP_ACQUIRE_TIMEOUT = float(os.environ.get('HTTP_ACQUIRE_TIMEOUT', 2.0))
+    HTTP_BREAKER_THRESHOLD = int(os.environ.get('HTTP_BREAKER_THRESHOLD', 5))
+    HTTP_BREAKER_RESET = float(os.environ.get('HTTP_BREAKER_RESET', 30.0))
+    # Offline vocabulary sync: words per reply, how far behind now a token restarts
+    # (covers transactions still open when it was issued), and tombstone lifetime
+    SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 1000))
+    SYNC_SAFETY_WINDOW = int(os.environ.get('SYNC_SAFETY_WINDOW', 5))
+    SYNC_TOMBSTONE_TTL = int(os.environ.get('SYNC_TOMBSTONE_TTL', 90 * 24 * 3600))
+    # Bulk vocabulary import: rows (words x target users) written per transaction
+    VOCAB_IMPORT_BATCH_SIZE = int(os.environ.get('VOCAB_IMPORT_BATCH_SIZE', 5000))
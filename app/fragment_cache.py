@@ -0,0 +1,86 @@
+"""Bounded in-process LRU cache for pre-rendered HTML fragments."""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Sequence, Tuple
+
+from flask import current_app
+
+EXTENSION_KEY = 'fragment_cache'
+
+
+class FragmentCache:
+    """LRU cache of rendered line lists, bounded by entry count and size.
+
+    Size is measured in characters of rendered HTML, which is close enough to
+    bytes for budgeting memory per worker.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[Tuple[str, ...], int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Sequence[str]]) -> Tuple[str, ...]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Render outside the lock; two threads racing on the same key
+        # produce identical fragments, so the later store is harmless.
+        fragments = tuple(render())
+        size = sum(len(fragment) for fragment in fragments)
+        if size > self.max_bytes:
+            return fragments
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (fragments, size)
+            self.current_bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return fragments
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def init_fragment_cache(app) -> FragmentCache:
+    cache = FragmentCache(
+        max_entries=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 512),
+        max_bytes=app.config.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024),
+    )
+    app.extensions[EXTENSION_KEY] = cache
+    return cache
+
+
+def get_fragment_cache() -> FragmentCache:
+    return current_app.extensions[EXTENSION_KEY]
@@ -0,0 +1,125 @@
+"""Grade answer sets against a compiled test, one at a time or in bulk."""
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from . import db
+from .markup_compiler import MODE_STANDARD, question_count
+from .models import TestResult, User
+from .result_stats import apply_results
+from .utils import normalize_text
+
+
+class GradingError(ValueError):
+    """Raised when a batch contains a submission that cannot be graded."""
+
+
+def make_normalizer() -> Callable[[str], str]:
+    """normalize_text that runs once per distinct (stripped) answer string."""
+    cache: Dict[str, str] = {}
+
+    def normalize(answer: str) -> str:
+        answer = (answer or '').strip()
+        normalized = cache.get(answer)
+        if normalized is None:
+            normalized = cache[answer] = normalize_text(answer)
+        return normalized
+
+    return normalize
+
+
+def score_answers(compiled: Dict, answers: Mapping[str, str], normalize: Optional[Callable[[str], str]] = None) -> int:
+    normalize = normalize or make_normalizer()
+    return sum(
+        1
+        for question in compiled['questions']
+        if normalize(answers.get(question['qid'], '')) == question['normalized_answer']
+    )
+
+
+def score_order(compiled: Dict, item_order: List[str]) -> int:
+    original_order = [item['id'] for item in compiled['items']]
+    if len(item_order) != len(original_order):
+        raise GradingError('The number of items in the order does not match the test.')
+    return sum(1 for given, expected in zip(item_order, original_order) if given == expected)
+
+
+def _check_submission(index: int, submission, standard: bool) -> None:
+    """Raise GradingError unless ``submission`` has the types grading relies on."""
+    if not isinstance(submission, Mapping):
+        raise GradingError(f'Submission {index}: expected an object.')
+    user_id = submission.get('user_id')
+    if user_id is not None and (not isinstance(user_id, int) or isinstance(user_id, bool)):
+        raise GradingError(f'Submission {index}: "user_id" must be an integer.')
+    username = submission.get('username')
+    if username is not None and not isinstance(username, str):
+        raise GradingError(f'Submission {index}: "username" must be a string.')
+    if standard:
+        answers = submission.get('answers')
+        if not isinstance(answers, Mapping) or not all(
+            isinstance(qid, str) and isinstance(answer, str) for qid, answer in answers.items()
+        ):
+            raise GradingError(f'Submission {index}: "answers" must be an object of qid to answer.')
+    else:
+        item_order = submission.get('item_order')
+        if not isinstance(item_order, list) or not all(isinstance(item, str) for item in item_order):
+            raise GradingError(f'Submission {index}: "item_order" must be a list of item ids.')
+
+
+def grade_batch(test, submissions: Iterable[Mapping]) -> List[Dict]:
+    """Score every submission; raises GradingError without grading any on bad input.
+
+    Each submission names its student by ``user_id`` or ``username`` and
+    carries ``answers`` ({qid: answer}) or, for drag-and-drop tests,
+    ``item_order`` (list of item ids).
+    """
+    submissions = list(submissions)
+    compiled = test.get_compiled()
+    standard = compiled['mode'] == MODE_STANDARD
+    for index, submission in enumerate(submissions):
+        _check_submission(index, submission, standard)
+
+    usernames = {sub.get('username') for sub in submissions if sub.get('username')}
+    user_ids = {sub.get('user_id') for sub in submissions if sub.get('user_id')}
+    users = User.query.filter(db.or_(User.username.in_(usernames), User.id.in_(user_ids))).all()
+    by_username = {user.username: user for user in users}
+    by_id = {user.id: user for user in users}
+
+    normalize = make_normalizer()
+    total = question_count(compiled)
+    graded = []
+    for index, submission in enumerate(submissions):
+        user = by_id.get(submission.get('user_id')) or by_username.get(submission.get('username'))
+        if user is None:
+            raise GradingError(f'Submission {index}: unknown user.')
+        if standard:
+            score = score_answers(compiled, submission['answers'], normalize)
+        else:
+            try:
+                score = score_order(compiled, submission['item_order'])
+            except GradingError as e:
+                raise GradingError(f'Submission {index}: {e}') from e
+        graded.append({
+            'user_id': user.id,
+            'username': user.username,
+            'score': score,
+            'total_questions': total,
+        })
+    return graded
+
+
+def save_results(test, graded: List[Dict]) -> None:
+    """Insert all graded rows and update the test's stats in one transaction."""
+    if not graded:
+        return
+    rows = [
+        {
+            'score': row['score'],
+            'total_questions': row['total_questions'],
+            'user_id': row['user_id'],
+            'test_id': test.id,
+        }
+        for row in graded
+    ]
+    connection = db.session.connection()
+    connection.execute(TestResult.__table__.insert(), rows)
+    apply_results(connection, [(test.id, row['score']) for row in rows])
+    db.session.commit()
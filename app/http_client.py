@@ -0,0 +1,247 @@
+"""Shared client for outbound HTTP calls (TTS and translation upstreams)."""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+EXTENSION_KEY = 'http_client'
+# Latency percentiles are computed over this many recent calls per host
+LATENCY_WINDOW = 256
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """The call was refused locally without reaching the upstream.
+
+    A ``requests.RequestException``, so callers keep a single ``except``.
+    """
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class ConcurrencyLimitError(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures, for ``reset_timeout`` seconds."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class _HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def as_dict(self) -> Dict[str, object]:
+        latencies = sorted(self.latencies)
+        stats = {'requests': self.requests, 'failures': self.failures, 'rejected': self.rejected}
+        if latencies:
+            stats['latency_p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+            stats['latency_p95_ms'] = round(latencies[int(len(latencies) * 0.95)] * 1000, 2)
+            stats['latency_max_ms'] = round(latencies[-1] * 1000, 2)
+        return stats
+
+
+class HTTPClient:
+    """Pooled keep-alive sessions, timeouts, a concurrency cap and circuit breakers.
+
+    Sessions are created lazily and per process, which keeps them out of the
+    preloaded gunicorn master.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        pool_maxsize: int = 10,
+        max_concurrency: int = 16,
+        acquire_timeout: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_maxsize = pool_maxsize
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, _HostStats] = {}
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def session(self, url: str) -> requests.Session:
+        """The pooled session for ``url``'s host."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._stats[host] = _HostStats()
+            return session
+
+    @contextmanager
+    def stream(self, url: str, **kwargs) -> Iterator[requests.Response]:
+        """GET ``url`` with ``stream=True``; the slot is held until the block exits.
+
+        Raises ConcurrencyLimitError when no slot frees up within
+        ``acquire_timeout`` and CircuitOpenError while the host's breaker is
+        open. Connection errors, timeouts, 5xx and bodies cut off mid-read
+        count as failures.
+        """
+        session = self.session(url)
+        host = urlsplit(url).netloc
+        stats = self._stats[host]
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                stats.rejected += 1
+            raise ConcurrencyLimitError('Too many outbound requests in flight')
+        if not self._breakers[host].allow():
+            self._slots.release()
+            with self._lock:
+                stats.rejected += 1
+            raise CircuitOpenError(f'Circuit open for {host}')
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        response = None
+        try:
+            kwargs.setdefault('timeout', self.timeout)
+            try:
+                response = session.get(url, stream=True, **kwargs)
+            except requests.RequestException:
+                self._record(host, started, failed=True)
+                raise
+            failed = response.status_code >= 500
+            self._record(host, started, failed=failed)
+            try:
+                yield response
+            except requests.RequestException:
+                # The body failed mid-read (read timeout, dropped connection)
+                self._record(host, None, failed=True)
+                raise
+            if not failed:
+                # Only once the body arrived: a stream that fails after its
+                # headers must not reset the failure count
+                self._breakers[host].record_success()
+        finally:
+            if response is not None:
+                response.close()
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _record(self, host: str, started: Optional[float], failed: bool) -> None:
+        if failed:
+            self._breakers[host].record_failure()
+        with self._lock:
+            stats = self._stats[host]
+            if started is not None:
+                stats.requests += 1
+                stats.latencies.append(time.perf_counter() - started)
+            if failed:
+                stats.failures += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET ``url`` and read the whole body."""
+        with self.stream(url, **kwargs) as response:
+            response.content
+        return response
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            hosts = {}
+            for host, stats in self._stats.items():
+                host_stats = stats.as_dict()
+                host_stats['circuit'] = self._breakers[host].state
+                adapter = self._sessions[host].get_adapter(f'https://{host}')
+                pool_manager = getattr(adapter, 'poolmanager', None)
+                if pool_manager is not None:
+                    # Fewer connections than requests means keep-alive reuse
+                    pools = pool_manager.pools
+                    host_stats['connections_opened'] = sum(pools[key].num_connections for key in pools.keys())
+                hosts[host] = host_stats
+            return {
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'max_concurrency': self.max_concurrency,
+                'timeout': list(self.timeout),
+                'hosts': hosts,
+            }
+
+
+def init_http_client(app) -> HTTPClient:
+    client = HTTPClient(
+        connect_timeout=app.config.get('HTTP_CONNECT_TIMEOUT', 3.05),
+        read_timeout=app.config.get('HTTP_READ_TIMEOUT', 10.0),
+        pool_maxsize=app.config.get('HTTP_POOL_MAXSIZE', 10),
+        max_concurrency=app.config.get('HTTP_MAX_CONCURRENCY', 16),
+        acquire_timeout=app.config.get('HTTP_ACQUIRE_TIMEOUT', 2.0),
+        failure_threshold=app.config.get('HTTP_BREAKER_THRESHOLD', 5),
+        reset_timeout=app.config.get('HTTP_BREAKER_RESET', 30.0),
+    )
+    app.extensions[EXTENSION_KEY] = client
+    return client
+
+
+def get_http_client() -> HTTPClient:
+    return current_app.extensions[EXTENSION_KEY]
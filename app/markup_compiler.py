@@ -0,0 +1,247 @@
+"""Compile test markup into a structured form and render it back to HTML."""
+import hashlib
+import re
+from html import unescape as unescape_html
+from typing import Dict, List, Optional
+
+from markupsafe import escape
+
+from .markup_tokenizer import DROPDOWN, INPUT, LINE_END, Token, tokenize
+from .utils import normalize_text
+
+# Bump whenever the layout of the compiled dict (or the tokenization behind it)
+# changes so stale rows are recompiled instead of being rendered with the wrong
+# shape. 2: dropdowns take priority over an earlier "[" again.
+COMPILED_FORMAT_VERSION = 2
+
+MODE_STANDARD = 'standard'
+MODE_SENTENCES = 'sentences'
+MODE_PARAGRAPHS = 'paragraphs'
+
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+')
+TAG_PATTERN = re.compile(r'<[^<>]*>')
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def content_mode(shuffle_sentences: bool, shuffle_paragraphs: bool) -> str:
+    if shuffle_sentences:
+        return MODE_SENTENCES
+    if shuffle_paragraphs:
+        return MODE_PARAGRAPHS
+    return MODE_STANDARD
+
+
+def _dropdown_question(qid: str, token: Token) -> Dict:
+    options = list(token.options)
+    return {
+        'qid': qid,
+        'kind': 'dropdown',
+        'answer': token.value,
+        'normalized_answer': normalize_text(token.value),
+        'options': options,
+        'normalized_options': [normalize_text(opt) for opt in options],
+    }
+
+
+def _input_question(qid: str, token: Token) -> Dict:
+    return {
+        'qid': qid,
+        'kind': 'input',
+        'answer': token.value,
+        'normalized_answer': normalize_text(token.value),
+    }
+
+
+def _compile_line(tokens: List[Token], questions: List[Dict], counter: int):
+    """Turn one line of tokens into text/question segments.
+
+    Question ids keep the numbering of the original two-pass substitution:
+    all dropdowns of a line are numbered before its inputs. Saved learn-mode
+    answers are keyed by these ids, so the order must not change.
+    """
+    qids = {}
+    for kind, build in ((DROPDOWN, _dropdown_question), (INPUT, _input_question)):
+        for index, token in enumerate(tokens):
+            if token.kind == kind:
+                qid = f'q{counter}'
+                counter += 1
+                qids[index] = qid
+                questions.append(build(qid, token))
+
+    segments = []
+    for index, token in enumerate(tokens):
+        if index in qids:
+            segments.append({'qid': qids[index]})
+        else:
+            segments.append({'text': token.value})
+    return segments, counter
+
+
+def _compile_items(content: str, mode: str) -> List[Dict]:
+    if mode == MODE_SENTENCES:
+        chunks = []
+        for line in content.splitlines():
+            chunks.extend(SENTENCE_SPLIT_PATTERN.split(line.strip()))
+    else:
+        chunks = [para for para in content.split('\n\n') if para.strip()]
+    return [
+        {'id': f'item_{idx + 1}', 'content': chunk.strip()}
+        for idx, chunk in enumerate(chunks)
+    ]
+
+
+def compile_test_content(content: str, mode: str = MODE_STANDARD) -> Dict:
+    """Parse test markup into questions, per-line segments and shuffle items.
+
+    Run once when a test is saved; the take/learn views render from the
+    JSON-serialisable result instead of re-parsing the markup per request.
+    """
+    content = content or ''
+    questions: List[Dict] = []
+    lines = []
+    counter = 1
+    line_tokens: List[Token] = []
+    for token in tokenize(content):
+        if token.kind == LINE_END:
+            segments, counter = _compile_line(line_tokens, questions, counter)
+            lines.append(segments)
+            line_tokens = []
+        else:
+            line_tokens.append(token)
+
+    compiled = {
+        'version': COMPILED_FORMAT_VERSION,
+        'mode': mode,
+        'questions': questions,
+        'lines': lines,
+        'items': [],
+    }
+    if mode != MODE_STANDARD:
+        compiled['items'] = _compile_items(content, mode)
+    return compiled
+
+
+def is_current(compiled: Optional[Dict], mode: str) -> bool:
+    return (
+        isinstance(compiled, dict)
+        and compiled.get('version') == COMPILED_FORMAT_VERSION
+        and compiled.get('mode') == mode
+    )
+
+
+def question_count(compiled: Dict) -> int:
+    """Number of gaps, or of tiles for drag-and-drop tests.
+
+    The most a result can score; take_test and grade_batch record it as
+    TestResult.total_questions, so listings and averages agree.
+    """
+    if compiled['mode'] == MODE_STANDARD:
+        return len(compiled['questions'])
+    return len(compiled['items'])
+
+
+def plain_text(compiled: Dict) -> str:
+    """The test's text without HTML tags and with every gap blanked out."""
+    if compiled['mode'] != MODE_STANDARD:
+        lines = [item['content'] for item in compiled['items']]
+    else:
+        lines = [
+            ''.join(segment.get('text', '___') for segment in segments)
+            for segments in compiled['lines']
+        ]
+    return unescape_html(TAG_PATTERN.sub(' ', '\n'.join(lines)))
+
+
+def questions_by_qid(compiled: Dict) -> Dict[str, Dict]:
+    return {question['qid']: question for question in compiled['questions']}
+
+
+def is_correct(question: Dict, user_answer: Optional[str]) -> bool:
+    return normalize_text((user_answer or '').strip()) == question['normalized_answer']
+
+
+# --- Rendering ---------------------------------------------------------------
+
+def _render_take_question(question: Dict, form=None) -> str:
+    qid = question['qid']
+    graded = form is not None
+    if graded:
+        raw_answer = form.get(qid, '')
+        normalized_user_answer = normalize_text(raw_answer.strip())
+        correct = normalized_user_answer == question['normalized_answer']
+
+    if question['kind'] == 'dropdown':
+        if graded:
+            select_class = 'custom-select correct' if correct else 'custom-select incorrect'
+            disabled = 'disabled'
+        else:
+            select_class = 'custom-select'
+            disabled = ''
+        html = f'<select name="{qid}" class="{select_class}" {disabled}>'
+        html += '<option value="">-- Select an option --</option>'
+        for option, normalized_option in zip(question['options'], question['normalized_options']):
+            selected = 'selected' if graded and normalized_user_answer == normalized_option else ''
+            html += f'<option value="{escape(option)}" {selected}>{option}</option>'
+        html += '</select>'
+    else:
+        if graded:
+            input_class = 'form-control correct' if correct else 'form-control incorrect'
+            readonly = 'readonly'
+            value = raw_answer
+        else:
+            input_class = 'form-control'
+            readonly = ''
+            value = ''
+        html = f'<input type="text" name="{qid}" value="{escape(value)}" class="{input_class}" {readonly}>'
+
+    if graded and not correct:
+        html += f' <span class="correct-answer">(Correct answer: {question["answer"]})</span>'
+    return html
+
+
+def _render_learn_question(question: Dict, user_answer: str) -> str:
+    qid = question['qid']
+    correct = normalize_text(user_answer) == question['normalized_answer']
+
+    if question['kind'] == 'dropdown':
+        select_class = 'custom-select correct' if correct else 'custom-select'
+        html = f'<select name="{qid}" class="{select_class}">'
+        html += '<option value="">-- Select an option --</option>'
+        for option in question['options']:
+            selected = 'selected' if user_answer == option else ''
+            html += f'<option value="{escape(option)}" {selected}>{option}</option>'
+        html += '</select>'
+        return html
+
+    input_class = 'form-control correct' if correct else 'form-control'
+    return f'<input type="text" name="{qid}" value="{escape(user_answer)}" class="{input_class}">'
+
+
+def _render_lines(compiled: Dict, render_question) -> List[str]:
+    questions = questions_by_qid(compiled)
+    rendered = []
+    for segments in compiled['lines']:
+        parts = []
+        for segment in segments:
+            if 'qid' in segment:
+                parts.append(render_question(questions[segment['qid']]))
+            else:
+                parts.append(segment['text'])
+        rendered.append(''.join(parts))
+    return rendered
+
+
+def render_take_lines(compiled: Dict, form=None) -> List[str]:
+    """Render every line for ``take_test``; pass ``form`` to render graded."""
+    return _render_lines(compiled, lambda question: _render_take_question(question, form))
+
+
+def render_learn_lines(compiled: Dict, answers: Dict[str, str]) -> List[str]:
+    """Render every line for ``learn_test`` pre-filled with ``answers``."""
+    return _render_lines(
+        compiled,
+        lambda question: _render_learn_question(question, answers.get(question['qid'], '')),
+    )
@@ -0,0 +1,94 @@
+"""Linear-time tokenizer for test markup: ``#[opt1, opt2] answer#`` dropdowns
+and ``[answer]`` inputs.
+"""
+from typing import Iterator, List, NamedTuple, Tuple
+
+TEXT = 'text'
+DROPDOWN = 'dropdown'
+INPUT = 'input'
+LINE_END = 'line_end'
+
+
+class Token(NamedTuple):
+    kind: str
+    # Literal text for TEXT tokens, the stripped correct answer for questions
+    value: str = ''
+    options: Tuple[str, ...] = ()
+
+
+def _dropdowns(line: str) -> Iterator[Tuple[int, int, Token]]:
+    """``(start, end, token)`` for every dropdown, found like the legacy first pass."""
+    find = line.find
+    length = len(line)
+    # Cached delimiter positions. -2 means "not looked up yet" and -1 means
+    # "none left in the line"; a cached value is only refreshed once the
+    # position it was asked for has moved past it. Nothing is read twice, so
+    # a long run of "#[" with no closing bracket (quadratic for the old
+    # regexes) stays linear.
+    close = end = -2
+    position = 0
+    while True:
+        start = find('#', position)
+        if start == -1:
+            return
+        bracket = start + 1
+        while bracket < length and line[bracket].isspace():
+            bracket += 1
+        if bracket < length and line[bracket] == '[':
+            if close != -1 and close <= bracket:
+                close = find(']', bracket + 1)
+            if close > bracket + 1:
+                if end != -1 and end <= close:
+                    end = find('#', close + 1)
+                if end > close + 1:
+                    options = tuple([opt.strip() for opt in line[bracket + 1:close].split(',')])
+                    yield start, end + 1, Token(DROPDOWN, line[close + 1:end].strip(), options)
+                    position = end + 1
+                    continue
+        position = start + 1
+
+
+def tokenize_line(line: str) -> List[Token]:
+    """Split a single line into TEXT/DROPDOWN/INPUT tokens.
+
+    Like the legacy ``re.sub`` passes, dropdowns are matched first over the
+    whole line and inputs only in the text between them, so ``[a #[b] c#``
+    is a dropdown after the text ``[a ``.
+    """
+    find = line.find
+    tokens: List[Token] = []
+    input_close = -2
+
+    def text_tokens(position: int, stop: int) -> None:
+        nonlocal input_close
+        text_start = position
+        while position < stop:
+            start = find('[', position, stop)
+            if start == -1:
+                break
+            if input_close != -1 and input_close <= start:
+                input_close = find(']', start + 1)
+            if start + 1 < input_close < stop:
+                if start > text_start:
+                    tokens.append(Token(TEXT, line[text_start:start]))
+                tokens.append(Token(INPUT, line[start + 1:input_close].strip()))
+                text_start = position = input_close + 1
+            else:
+                position = start + 1
+        if text_start < stop:
+            tokens.append(Token(TEXT, line[text_start:stop]))
+
+    position = 0
+    for start, end, token in _dropdowns(line):
+        text_tokens(position, start)
+        tokens.append(token)
+        position = end
+    text_tokens(position, len(line))
+    return tokens
+
+
+def tokenize(content: str) -> Iterator[Token]:
+    """Yield the tokens of every line of ``content``, each followed by LINE_END."""
+    for line in (content or '').splitlines():
+        yield from tokenize_line(line)
+        yield Token(LINE_END)
@@ -3,8 +3,11 @@ from flask_login import UserMixin
 from datetime import datetime, timezone
 import hashlib
 import hmac
+from .markup_compiler import compile_test_content, content_hash, content_mode, is_current, question_count
 # Import JSON type based on your database (using SQLite's here)
 from sqlalchemy.dialects.sqlite import JSON
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import deferred
 # Or use db.JSON if using PostgreSQL/MySQL:
 # from sqlalchemy import JSON as db_JSON
 
@@ -60,16 +63,25 @@ class Book(db.Model):
         cascade='all, delete-orphan'
     )
 
+# Large text columns are deferred: listing queries never pay for them, and the
+# views that do need them ask for them explicitly with undefer().
 class Test(db.Model):
     __tablename__ = 'test'  # Explicitly specify table name
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    content = deferred(db.Column(db.Text, nullable=False))
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False, index=True)
     time_limit = db.Column(db.Integer, nullable=True)  # Time limit in minutes
     shuffle_sentences = db.Column(db.Boolean, default=False)
     shuffle_paragraphs = db.Column(db.Boolean, default=False)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Parsed form of `content`, rebuilt by compile_content() whenever the test is saved
+    content_hash = db.Column(db.String(64), nullable=True)
+    compiled_content = deferred(db.Column(JSON, nullable=True))
+    # Denormalised for listing pages; see app/result_stats.py
+    question_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attempt_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    avg_score = db.Column(db.Float, nullable=True)  # Mean TestResult.score, None before the first attempt
     test_results = db.relationship(
         'TestResult',
         backref='test',
@@ -84,6 +96,23 @@ class Test(db.Model):
     )
     # learn_progress defined via backref in LearnTestProgress
 
+    @property
+    def mode(self):
+        return content_mode(self.shuffle_sentences, self.shuffle_paragraphs)
+
+    def compile_content(self):
+        self.compiled_content = compile_test_content(self.content, self.mode)
+        self.content_hash = content_hash(self.content)
+        self.question_count = question_count(self.compiled_content)
+        return self.compiled_content
+
+    def get_compiled(self):
+        # Rows saved before compilation existed (or with an older format) are
+        # compiled in memory; they are persisted the next time the test is saved.
+        if is_current(self.compiled_content, self.mode):
+            return self.compiled_content
+        return compile_test_content(self.content, self.mode)
+
 class TestResult(db.Model):
     __tablename__ = 'test_result'  # Explicitly specify table name
     id = db.Column(db.Integer, primary_key=True)
@@ -92,18 +121,74 @@ class TestResult(db.Model):
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
+    # Set by the write-behind result queue so replaying its journal is idempotent
+    submission_key = db.Column(db.String(32), unique=True, index=True)
+
+class TestAttempt(db.Model):
+    __tablename__ = 'test_attempt'
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_SUBMITTED = 'submitted'
+    STATUS_TIMED_OUT = 'timed_out'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    deadline = db.Column(db.DateTime, nullable=True)  # None when the test has no time limit
+    submitted_at = db.Column(db.DateTime, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_IN_PROGRESS)
+
+    user = db.relationship('User', backref=db.backref('test_attempts', lazy='dynamic', cascade='all, delete-orphan'))
+    test = db.relationship('Test', backref=db.backref('attempts', lazy='dynamic', cascade='all, delete-orphan'))
+
+    __table_args__ = (db.Index('ix_test_attempt_user_test_status', 'user_id', 'test_id', 'status'),)
 
 class Vocabulary(db.Model):
     __tablename__ = 'vocabulary'
     id = db.Column(db.Integer, primary_key=True)
     word = db.Column(db.String(150), nullable=False)
+    # Set from word on assignment (app/vocab_import.py); unique per user
+    normalized_word = db.Column(db.String(150), nullable=False)
     translation = db.Column(db.String(150), nullable=False)
     pronunciation_url = db.Column(db.String(200), nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     next_review = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     interval = db.Column(db.Float, nullable=False, default=0)  # Interval in days
     ease_factor = db.Column(db.Float, nullable=False, default=2.5)  # Default ease factor
     learning_stage = db.Column(db.Integer, nullable=False, default=0)  # 0: New, 1: First Step, etc.
+    last_reviewed_at = db.Column(db.DateTime, nullable=True)
+    # Bumped on every change so offline clients can download deltas (app/vocab_sync.py)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Serves the review queue: WHERE user_id = ? AND next_review <= ? ORDER BY next_review
+    __table_args__ = (
+        db.Index('ix_vocabulary_user_next_review', 'user_id', 'next_review'),
+        db.Index('ix_vocabulary_user_updated_at', 'user_id', 'updated_at'),
+        db.UniqueConstraint('user_id', 'normalized_word', name='_user_normalized_word_uc'),
+    )
+
+class VocabularyTombstone(db.Model):
+    """A deleted Vocabulary row, kept so sync clients learn about the deletion."""
+    __tablename__ = 'vocabulary_tombstone'
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: tombstones outlive the words and may outlive the user
+    user_id = db.Column(db.Integer, nullable=False)
+    vocabulary_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_vocabulary_tombstone_user_deleted_at', 'user_id', 'deleted_at'),)
+
+class Translation(db.Model):
+    """Upstream word translations shared by every user; see app/translation_cache.py."""
+    __tablename__ = 'translation'
+    id = db.Column(db.Integer, primary_key=True)
+    source_lang = db.Column(db.String(8), nullable=False)
+    target_lang = db.Column(db.String(8), nullable=False)
+    normalized_word = db.Column(db.String(150), nullable=False)
+    translation = db.Column(db.String(150), nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('source_lang', 'target_lang', 'normalized_word', name='_translation_lookup_uc'),)
 
 class LearnTestResult(db.Model):
     __tablename__ = 'learn_test_result'
@@ -117,8 +202,8 @@ class LearnTestProgress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
-    # Consider using JSON if PickleType causes issues or for better database portability
-    answers = db.Column(db.PickleType, nullable=False)
+    # {qid: answer} as JSON so single answers can be updated in place with json_set()
+    answers = db.Column(JSON, nullable=False)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', backref=db.backref('learn_progress', lazy='dynamic', cascade='all, delete-orphan'))
@@ -126,6 +211,26 @@ class LearnTestProgress(db.Model):
 
     __table_args__ = (db.UniqueConstraint('user_id', 'test_id', name='_user_test_uc'),)
 
+    @classmethod
+    def upsert_answer(cls, user_id, test_id, qid, answer):
+        """Store one answer without reading or rewriting the rest of the dict."""
+        now = datetime.utcnow()
+        table = cls.__table__
+        stmt = sqlite_insert(table).values(
+            user_id=user_id,
+            test_id=test_id,
+            answers={qid: answer},
+            last_updated=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.test_id],
+            set_={
+                'answers': db.func.json_set(table.c.answers, f'$.{qid}', answer),
+                'last_updated': now,
+            },
+        )
+        db.session.execute(stmt)
+
 class ReadingActivity(db.Model):
     __tablename__ = 'reading_activity' # Add this line for clarity
     id = db.Column(db.Integer, primary_key=True)
@@ -136,7 +241,7 @@ class ReadingActivity(db.Model):
 class ReadingPage(db.Model):
     __tablename__ = 'reading_page' # Add this line for clarity
     id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text)
+    content = deferred(db.Column(db.Text))
     page_number = db.Column(db.Integer)
     activity_id = db.Column(db.Integer, db.ForeignKey('reading_activity.id'), nullable=False)
 
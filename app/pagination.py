@@ -0,0 +1,120 @@
+"""Keyset (seek) pagination for listing pages and their JSON variants."""
+import base64
+import json
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from flask import abort, request, url_for
+from sqlalchemy import tuple_
+
+NEXT = 'n'
+PREV = 'p'
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string cannot be decoded."""
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+    def links(self) -> dict:
+        return {'next_cursor': self.next_cursor, 'prev_cursor': self.prev_cursor}
+
+    def url(self, cursor: str) -> str:
+        """The current URL (path and query string) moved to ``cursor``."""
+        args = dict(request.view_args, **request.args.to_dict())
+        args['cursor'] = cursor
+        return url_for(request.endpoint, **args)
+
+
+class PageRequest(NamedTuple):
+    after: Optional[Tuple]
+    direction: str
+    per_page: int
+
+
+def encode_cursor(key: Sequence, direction: str) -> str:
+    # Opaque to clients: the boundary key and the direction to fetch in
+    raw = json.dumps([direction, list(key)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Tuple, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, key = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+    if direction not in (NEXT, PREV) or not isinstance(key, list) or not key:
+        raise InvalidCursor('malformed cursor')
+    # Only scalars can be bound into the keyset comparison
+    if not all(value is None or isinstance(value, (int, float, str)) for value in key):
+        raise InvalidCursor('malformed cursor key')
+    return tuple(key), direction
+
+
+def page_request(default_per_page: int = DEFAULT_PER_PAGE) -> PageRequest:
+    """Read ``cursor`` and ``per_page`` from the query string; bad cursors are a 400."""
+    per_page = request.args.get('per_page', default_per_page, type=int)
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return PageRequest(None, NEXT, per_page)
+    try:
+        key, direction = decode_cursor(cursor)
+    except InvalidCursor:
+        abort(400)
+    return PageRequest(key, direction, per_page)
+
+
+def wants_json() -> bool:
+    return request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+
+
+def build_page(rows: List[Any], page: PageRequest, key: Callable[[Any], Sequence]) -> Page:
+    """Turn ``per_page + 1`` rows fetched in ``page.direction`` into a Page."""
+    more = len(rows) > page.per_page
+    rows = list(rows[:page.per_page])
+    if page.direction == PREV:
+        rows.reverse()
+    has_cursor = page.after is not None
+    has_next = more if page.direction == NEXT else has_cursor
+    has_prev = more if page.direction == PREV else has_cursor
+    return Page(
+        rows,
+        encode_cursor(key(rows[-1]), NEXT) if rows and has_next else None,
+        encode_cursor(key(rows[0]), PREV) if rows and has_prev else None,
+    )
+
+
+def keyset_filter(columns: Sequence, page: PageRequest):
+    """(where clause or None, order_by clauses) for ascending ``columns``."""
+    if page.direction == NEXT:
+        order = [column.asc() for column in columns]
+    else:
+        order = [column.desc() for column in columns]
+    if page.after is None:
+        return None, order
+    if len(page.after) != len(columns):
+        abort(400)
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    bound = tuple_(*page.after) if len(columns) > 1 else page.after[0]
+    return (key > bound if page.direction == NEXT else key < bound), order
+
+
+def paginate(query, columns: Sequence, page: PageRequest) -> Page:
+    """Keyset-paginate an ORM query ordered by ``columns`` (ascending).
+
+    ``WHERE key > :last ... LIMIT per_page + 1`` instead of an OFFSET, so
+    deep pages cost the same as the first. ``columns`` should end in a unique
+    one (normally the id) to keep the order stable.
+    """
+    where, order = keyset_filter(columns, page)
+    if where is not None:
+        query = query.filter(where)
+    rows = query.order_by(*order).limit(page.per_page + 1).all()
+    return build_page(rows, page, lambda row: [getattr(row, column.key) for column in columns])
@@ -0,0 +1,287 @@
+"""Optional write-behind journal for TestResult inserts (``RESULT_WRITE_BEHIND``)."""
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db
+from .models import TestAttempt, TestResult
+from .result_stats import apply_results
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+EXTENSION_KEY = 'result_queue'
+SEGMENT_SUFFIX = '.jsonl'
+# Segments being created; flush skips them
+OPENING_SUFFIX = '.opening'
+
+
+def _try_lock(handle) -> bool:
+    if fcntl is None:
+        # Windows development servers: assume a single process
+        return True
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def attempt_submission_key(attempt_id: int, started_at: datetime) -> str:
+    """Same for every submit of one attempt; restarting the test changes it.
+
+    The attempt stays in progress until the flush, so a double submit is
+    journaled twice under one key and the second insert is dropped.
+    """
+    return hashlib.sha256(f'{attempt_id}:{started_at.isoformat()}'.encode()).hexdigest()[:32]
+
+
+def _read_records(handle) -> List[Dict]:
+    records = []
+    for line in handle:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # A torn final line from a crash mid-write; its request never returned
+            continue
+    return records
+
+
+class ResultQueue:
+    def __init__(self, app, directory: str, batch_size: int = 500, interval: float = 1.0):
+        self.app = app
+        self.directory = directory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        # The segment and flusher thread belong to one process. They are
+        # created on first use, so with gunicorn's preload_app every forked
+        # worker gets its own instead of sharing the master's.
+        self._active = None
+        self._active_path = None
+        self._pid = None
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Writing ---------------------------------------------------------
+
+    def _open_segment(self) -> None:
+        # Each process appends to its own segment and holds an flock on it
+        # while it is active. It is locked under a temporary name, which flush
+        # ignores, so no other worker can flush and delete it first.
+        path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex}{SEGMENT_SUFFIX}')
+        opening = path + OPENING_SUFFIX
+        handle = open(opening, 'a', encoding='utf-8')
+        if not _try_lock(handle):
+            handle.close()
+            os.unlink(opening)
+            raise RuntimeError(f'Could not lock new journal segment {opening}')
+        # The lock belongs to the open file, so it carries over the rename
+        os.rename(opening, path)
+        self._active, self._active_path = handle, path
+
+    def _ensure_writer(self) -> None:
+        if self._pid == os.getpid():
+            return
+        self._open_segment()
+        self._pid = os.getpid()
+        self.pending = 0
+        self._thread = None
+        if self.interval:
+            self.start()
+
+    def submit(self, record: Dict) -> str:
+        """Durably journal one result record and return its submission key.
+
+        One fsync'd JSON line per submission; the flusher thread inserts them
+        in batches.
+        """
+        record = dict(record)
+        record.setdefault('submission_key', uuid.uuid4().hex)
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._ensure_writer()
+            self._active.write(line)
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self._wake.set()
+        return record['submission_key']
+
+    # --- Flushing --------------------------------------------------------
+
+    def _rotate(self) -> Optional[str]:
+        with self._lock:
+            if not self.pending:
+                return None
+            old, path = self._active, self._active_path
+            self._open_segment()
+            self.pending = 0
+        old.close()
+        return path
+
+    def flush(self) -> int:
+        """Write every unlocked journal segment to the database; returns rows inserted.
+
+        Unlocked segments include those left behind by dead processes.
+        """
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                self._rotate()
+            inserted = 0
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith(SEGMENT_SUFFIX):
+                    inserted += self._flush_segment(os.path.join(self.directory, name))
+            return inserted
+
+    recover = flush
+
+    def _flush_segment(self, path: str) -> int:
+        try:
+            handle = open(path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return 0
+        with handle:
+            if path == self._active_path:
+                return 0
+            if not _try_lock(handle):
+                return 0
+            records = _read_records(handle)
+            inserted = self._store(records) if records else 0
+            # Deleted only after the commit; replaying a segment that survives a
+            # crash right here is a no-op thanks to submission_key. Another
+            # worker that adopted the same dead segment may have deleted it.
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+        return inserted
+
+    def _store(self, records: List[Dict]) -> int:
+        table = TestResult.__table__
+        inserted = []
+        with self.app.app_context():
+            try:
+                connection = db.session.connection()
+                for start in range(0, len(records), self.batch_size):
+                    batch = records[start:start + self.batch_size]
+                    stmt = (
+                        sqlite_insert(table)
+                        .values([
+                            {
+                                'submission_key': record['submission_key'],
+                                'score': record['score'],
+                                'total_questions': record['total_questions'],
+                                'user_id': record['user_id'],
+                                'test_id': record['test_id'],
+                                'timestamp': datetime.fromisoformat(record['timestamp']),
+                            }
+                            for record in batch
+                        ])
+                        .on_conflict_do_nothing(index_elements=[table.c.submission_key])
+                        .returning(table.c.test_id, table.c.score)
+                    )
+                    inserted.extend(connection.execute(stmt).all())
+                self._close_attempts(connection, records)
+                apply_results(connection, [(row.test_id, row.score) for row in inserted])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+        return len(inserted)
+
+    @staticmethod
+    def _close_attempts(connection, records: Iterable[Dict]) -> None:
+        table = TestAttempt.__table__
+        updates = [
+            {
+                'attempt_id': record['attempt_id'],
+                'attempt_started_at': datetime.fromisoformat(record['attempt_started_at']),
+                'new_status': record['attempt_status'],
+                'new_submitted_at': datetime.fromisoformat(record['submitted_at']),
+            }
+            for record in records
+            if record.get('attempt_id')
+        ]
+        if not updates:
+            return
+        # Only close the attempt the result belongs to: if the student already
+        # restarted the test, started_at has moved on and the row is left alone.
+        stmt = (
+            table.update()
+            .where(
+                table.c.id == db.bindparam('attempt_id'),
+                table.c.started_at == db.bindparam('attempt_started_at'),
+                table.c.status == TestAttempt.STATUS_IN_PROGRESS,
+            )
+            .values(status=db.bindparam('new_status'), submitted_at=db.bindparam('new_submitted_at'))
+        )
+        connection.execute(stmt, updates)
+
+    # --- Background thread -----------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("result_queue: flush failed; records stay journaled")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='result-queue-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception("result_queue: final flush failed; records stay journaled")
+
+
+def init_result_queue(app) -> Optional[ResultQueue]:
+    if not app.config.get('RESULT_WRITE_BEHIND'):
+        return None
+    directory = app.config.get('RESULT_JOURNAL_DIR') or os.path.join(app.instance_path, 'result_journal')
+    queue = ResultQueue(
+        app,
+        directory,
+        batch_size=app.config.get('RESULT_FLUSH_BATCH', 500),
+        interval=app.config.get('RESULT_FLUSH_INTERVAL', 1.0),
+    )
+    app.extensions[EXTENSION_KEY] = queue
+    try:
+        queue.recover()
+    except Exception:
+        # e.g. running `flask db upgrade` before submission_key exists; the
+        # segments stay on disk and the next flush picks them up.
+        app.logger.exception("result_queue: could not replay the journal at start-up")
+    return queue
+
+
+def get_result_queue() -> Optional[ResultQueue]:
+    return current_app.extensions.get(EXTENSION_KEY)
@@ -0,0 +1,78 @@
+"""Keep Test.attempt_count / Test.avg_score in step with TestResult rows.
+
+Single inserts and deletes through the ORM update the counters
+incrementally via mapper events. Bulk inserts that bypass the ORM call
+``apply_results`` with the same numbers, and ``backfill_test_stats``
+recomputes everything from scratch (``flask backfill-test-stats``).
+"""
+from typing import Iterable, Tuple
+
+from sqlalchemy import event, func, select
+
+from . import db
+from .markup_compiler import is_current, question_count
+from .models import Test, TestResult
+
+test_table = Test.__table__
+
+
+def _stats_update(test_id: int, added: int, score_total: float):
+    """UPDATE statement folding ``added`` results summing to ``score_total`` into the mean."""
+    new_count = test_table.c.attempt_count + added
+    new_avg = (
+        func.coalesce(test_table.c.avg_score, 0.0) * test_table.c.attempt_count + float(score_total)
+    ) / new_count
+    return (
+        test_table.update()
+        .where(test_table.c.id == test_id)
+        .values(
+            attempt_count=new_count,
+            avg_score=db.case((new_count > 0, new_avg), else_=None),
+        )
+    )
+
+
+def apply_results(connection, results: Iterable[Tuple[int, int]]) -> None:
+    """Fold ``(test_id, score)`` pairs into the counters of their tests."""
+    totals = {}
+    for test_id, score in results:
+        count, score_total = totals.get(test_id, (0, 0))
+        totals[test_id] = (count + 1, score_total + score)
+    for test_id, (count, score_total) in totals.items():
+        connection.execute(_stats_update(test_id, count, score_total))
+
+
+@event.listens_for(TestResult, 'after_insert')
+def _result_inserted(mapper, connection, target):
+    connection.execute(_stats_update(target.test_id, 1, target.score))
+
+
+@event.listens_for(TestResult, 'after_delete')
+def _result_deleted(mapper, connection, target):
+    connection.execute(_stats_update(target.test_id, -1, -target.score))
+
+
+def backfill_test_stats() -> int:
+    """Recompile stale tests and recompute question_count, attempt_count and avg_score."""
+    aggregates = {
+        row.test_id: row
+        for row in db.session.execute(
+            select(
+                TestResult.test_id,
+                func.count(TestResult.id).label('attempts'),
+                func.avg(TestResult.score).label('avg_score'),
+            ).group_by(TestResult.test_id)
+        )
+    }
+
+    updated = 0
+    for test in Test.query.all():
+        if not is_current(test.compiled_content, test.mode):
+            test.compile_content()
+        test.question_count = question_count(test.get_compiled())
+        row = aggregates.get(test.id)
+        test.attempt_count = row.attempts if row else 0
+        test.avg_score = float(row.avg_score) if row else None
+        updated += 1
+    db.session.commit()
+    return updated
@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app.models import User, TestResult, LearnTestResult, Vocabulary
 from app.utils import admin_required
+from app.fragment_cache import get_fragment_cache
+from app.http_client import get_http_client
 from app import db
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -56,3 +58,11 @@ def delete_user(user_id):
         db.session.commit()
         flash(f'User {user.username} has been deleted.', 'success')
     return redirect(url_for('admin.admin_panel'))
+
+@admin_bp.route('/metrics')
+@admin_required
+def metrics():
+    return jsonify({
+        'fragment_cache': get_fragment_cache().stats(),
+        'http_client': get_http_client().stats(),
+    })
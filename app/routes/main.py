@@ -1,23 +1,86 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, abort, current_app, send_file
 from flask_login import login_required, current_user
 from ..models import Book, Test
 from .. import db
 from ..utils import admin_required
+from ..search_index import search_books, search_tests
+from ..catalog_index import BOOKS, TESTS, get_catalog_index
+from ..audio_cache import AudioCache, get_audio_cache, normalize_tts_text, open_tts_stream, tee_to_cache
+from ..http_client import UpstreamUnavailable
+from ..translation_cache import translate_words
+from ..pagination import PREV, Page, build_page, page_request, paginate, wants_json
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, load_only
 import requests
 
 main_bp = Blueprint('main', __name__)
 
+# Columns listing pages render; everything else (content, compiled form) stays unloaded
+TEST_LISTING_COLUMNS = (
+    Test.id,
+    Test.name,
+    Test.book_id,
+    Test.time_limit,
+    Test.created_by,
+    Test.question_count,
+    Test.attempt_count,
+    Test.avg_score,
+)
+
+AUTOCOMPLETE_LIMIT = 10
+# Suggestions may be reused by the browser for this long; ETags cover the rest
+AUTOCOMPLETE_MAX_AGE = 60
+
+def _suggestions(payload, public=False):
+    response = jsonify(payload)
+    response.cache_control.max_age = AUTOCOMPLETE_MAX_AGE
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+def _test_counts(book_ids=None):
+    """{book_id: number of tests} from one GROUP BY, without loading any test rows."""
+    stmt = db.select(Test.book_id, func.count(Test.id)).group_by(Test.book_id)
+    if book_ids is not None:
+        stmt = stmt.filter(Test.book_id.in_(book_ids))
+    return dict(db.session.execute(stmt).all())
+
 @main_bp.route('/')
 def index():
     books = Book.query.all()
-    total_tests = sum(len(book.tests) for book in books)
-    return render_template('main/index.html', books=books, total_tests=total_tests)
+    test_counts = _test_counts()
+    total_tests = sum(test_counts.values())
+    return render_template('main/index.html', books=books, test_counts=test_counts, total_tests=total_tests)
+
+def _test_json(test):
+    return {
+        'id': test.id,
+        'name': test.name,
+        'book_id': test.book_id,
+        'time_limit': test.time_limit,
+        'question_count': test.question_count,
+        'attempt_count': test.attempt_count,
+        'avg_score': test.avg_score,
+    }
 
 @main_bp.route('/book/<int:book_id>')
 def book_tests(book_id):
     book = Book.query.get_or_404(book_id)
-    tests = Test.query.filter_by(book_id=book.id).all()
-    return render_template('main/book_tests.html', book=book, tests=tests)
+    page = paginate(
+        Test.query.options(load_only(*TEST_LISTING_COLUMNS)).filter_by(book_id=book.id),
+        (Test.id,),
+        page_request(),
+    )
+    if wants_json():
+        return jsonify({
+            'book': {'id': book.id, 'title': book.title},
+            'tests': [_test_json(test) for test in page.items],
+            **page.links(),
+        })
+    return render_template('main/book_tests.html', book=book, tests=page.items, page=page)
 
 @main_bp.route('/search')
 def search():
@@ -28,14 +91,65 @@ def search():
         flash('Please enter a search term.', 'warning')
         return redirect(url_for('main.index'))
 
-    if search_option == 'books':
-        # Search for books by title
-        books = Book.query.filter(Book.title.ilike(f'%{query}%')).all()
-        return render_template('main/search_results.html', books=books, query=query, search_option=search_option)
+    # Ranked full-text match first, paged by (rank, id). If the first page is
+    # empty the query is probably misspelt, so fall back to trigram similarity
+    # on titles and names (a single, bounded page).
+    kind = BOOKS if search_option == 'books' else TESTS
+    page_args = page_request()
+    if page_args.after is not None and len(page_args.after) != 2:
+        abort(400)
+    search_fn = search_books if kind == BOOKS else search_tests
+    hits = search_fn(query, page_args.per_page + 1, page_args.after, page_args.direction == PREV)
+    if hits or page_args.after is not None:
+        page = build_page(hits, page_args, lambda hit: (hit.rank, hit.id))
+        ids = [hit.id for hit in page.items]
+        highlights = {hit.id: hit.highlight for hit in page.items}
     else:
-        # Search for tests by name
-        tests = Test.query.filter(Test.name.ilike(f'%{query}%')).all()
-        return render_template('main/search_results.html', tests=tests, query=query, search_option=search_option)
+        ids = get_catalog_index().fuzzy_search(kind, query, page_args.per_page)
+        page = Page(ids, None, None)
+        highlights = {}
+    fuzzy = not hits and bool(ids)
+
+    if kind == BOOKS:
+        found = {book.id: book for book in Book.query.filter(Book.id.in_(ids))}
+        books = [found[book_id] for book_id in ids if book_id in found]
+        test_counts = _test_counts([book.id for book in books])
+        if wants_json():
+            return jsonify({
+                'query': query,
+                'search_option': search_option,
+                'fuzzy': fuzzy,
+                'books': [
+                    {
+                        'id': book.id,
+                        'title': book.title,
+                        'test_count': test_counts.get(book.id, 0),
+                        'highlight': str(highlights.get(book.id, '')),
+                    }
+                    for book in books
+                ],
+                **page.links(),
+            })
+        return render_template('main/search_results.html', books=books, test_counts=test_counts, highlights=highlights, fuzzy=fuzzy, page=page, query=query, search_option=search_option)
+    else:
+        found = {
+            test.id: test
+            for test in Test.query.options(load_only(*TEST_LISTING_COLUMNS), joinedload(Test.book))
+            .filter(Test.id.in_(ids))
+        }
+        tests = [found[test_id] for test_id in ids if test_id in found]
+        if wants_json():
+            return jsonify({
+                'query': query,
+                'search_option': search_option,
+                'fuzzy': fuzzy,
+                'tests': [
+                    dict(_test_json(test), book_title=test.book.title, snippet=str(highlights.get(test.id, '')))
+                    for test in tests
+                ],
+                **page.links(),
+            })
+        return render_template('main/search_results.html', tests=tests, snippets=highlights, fuzzy=fuzzy, page=page, query=query, search_option=search_option)
 
 @main_bp.route('/autocomplete_search')
 def autocomplete_search():
@@ -44,30 +158,56 @@ def autocomplete_search():
 
     results = []
 
-    if query:
-        if search_option == 'books':
-            # Search for matching books by title
-            books = Book.query.filter(Book.title.ilike(f'%{query}%')).all()
-            results = [{'label': book.title, 'value': book.title} for book in books]
-        elif search_option == 'tests':
-            # Search for matching tests by name
-            tests = Test.query.filter(Test.name.ilike(f'%{query}%')).all()
-            results = [{'label': test.name, 'value': test.name} for test in tests]
+    if query and search_option in (BOOKS, TESTS):
+        # Served from the in-process prefix index; no database query per keystroke
+        names = get_catalog_index().search(search_option, query, AUTOCOMPLETE_LIMIT)
+        results = [{'label': name, 'value': name} for name in names]
+
+    return _suggestions(results, public=True)
 
-    return jsonify(results)
+def _audio_response(response, key):
+    # The key is a hash of (language, text), so a clip never changes under its URL
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['AUDIO_CACHE_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
 
 @main_bp.route('/tts')
 def tts():
-    text = request.args.get('text')
+    text = normalize_tts_text(request.args.get('text'))
     language = request.args.get('lang', 'en')
+    if not text:
+        abort(400)
+
+    cache = get_audio_cache()
+    key = AudioCache.key(language, text)
+    path = cache.get(key) if cache is not None else None
+    if path is not None:
+        return _audio_response(send_file(path, mimetype='audio/mpeg', etag=key, conditional=True), key)
+    if key in request.if_none_match:
+        return _audio_response(Response(status=304), key)
 
-    # Make the request to Google TTS API
-    tts_url = f'https://translate.google.com/translate_tts?ie=UTF-8&tl={language}&client=gtx&q={text}'
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(tts_url, headers=headers)
+    # Browsers ask media for "bytes=0-"; serving the whole clip keeps it cacheable
+    range_header = request.headers.get('Range')
+    if range_header == 'bytes=0-':
+        range_header = None
+    try:
+        upstream = open_tts_stream(text, language, range_header)
+    except UpstreamUnavailable:
+        # Refused locally (circuit open or too many calls in flight)
+        abort(503)
+    except requests.RequestException:
+        abort(502)
 
-    # Return the audio response
-    return Response(response.content, mimetype='audio/mpeg')
+    # Stream chunks through as they arrive instead of buffering the clip
+    chunks = upstream.chunks
+    if cache is not None and upstream.status == 200:
+        length = upstream.headers.get('Content-Length')
+        chunks = tee_to_cache(chunks, cache.writer(key), int(length) if length else None)
+    response = Response(chunks, status=upstream.status, mimetype='audio/mpeg', headers=upstream.headers)
+    response.call_on_close(upstream.close)
+    return _audio_response(response, key)
 
 @main_bp.route('/translate')
 def translate_word():
@@ -78,47 +218,41 @@ def translate_word():
     if not word:
         return jsonify({'error': 'No word provided for translation'}), 400
 
-    # Construct the translation URL for Google Translate
-    translate_url = (
-        f'https://translate.googleapis.com/translate_a/single?client=gtx&sl={source_lang}&tl={target_lang}&dt=t&q={word}'
-    )
+    result = translate_words([word], source_lang, target_lang)
+    if word not in result.translations:
+        return jsonify({'error': result.errors.get(word, 'Nothing to translate')}), 500
 
-    try:
-        # Make the request to the Google Translate API
-        response = requests.get(translate_url)
-        response.raise_for_status()
+    pronunciation_url = f'https://translate.google.com/translate_tts?ie=UTF-8&tl={source_lang}&client=gtx&q={word}'
+    return jsonify({
+        'translation': result.translations[word],
+        'pronunciation_url': pronunciation_url
+    })
 
-        translation_data = response.json()
-
-        if translation_data and isinstance(translation_data, list) and len(translation_data) > 0:
-            translation = translation_data[0][0][0]
-            pronunciation_url = f'https://translate.google.com/translate_tts?ie=UTF-8&tl={source_lang}&client=gtx&q={word}'
-
-            return jsonify({
-                'translation': translation,
-                'pronunciation_url': pronunciation_url
-            })
-        else:
-            return jsonify({'error': 'Unexpected translation response format'}), 500
+@main_bp.route('/translate/batch', methods=['POST'])
+@login_required
+def translate_batch():
+    """Translate the words in view in one round trip: {"words": [...]}."""
+    payload = request.get_json(silent=True) or {}
+    words = payload.get('words')
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        return jsonify({'error': 'Expected a JSON list of words'}), 400
+    if len(words) > current_app.config['TRANSLATE_BATCH_MAX_WORDS']:
+        return jsonify({'error': 'Too many words in one batch'}), 400
 
-    except requests.RequestException as e:
-        return jsonify({'error': f'Translation API request failed: {str(e)}'}), 500
+    result = translate_words(words, 'en', 'uk')
+    return jsonify({'translations': result.translations, 'errors': result.errors})
 
 @main_bp.route('/autocomplete_book')
 @login_required
 def autocomplete_book():
     q = request.args.get('q', '')
-    books = Book.query.filter(Book.title.ilike(f'%{q}%')).all()
-    titles = [book.title for book in books]
-    return jsonify(titles)
+    return _suggestions(get_catalog_index().search(BOOKS, q, AUTOCOMPLETE_LIMIT))
 
 @main_bp.route('/autocomplete_test')
 @login_required
 def autocomplete_test():
     q = request.args.get('q', '')
-    tests = Test.query.filter(Test.name.ilike(f'%{q}%')).all()
-    names = [test.name for test in tests]
-    return jsonify(names)
+    return _suggestions(get_catalog_index().search(TESTS, q, AUTOCOMPLETE_LIMIT))
 
 @main_bp.route('/book/delete/<int:book_id>', methods=['POST'])
 @login_required
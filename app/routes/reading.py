@@ -6,6 +6,8 @@ from app.models import ReadingActivity, ReadingPage, UserReadingProgress
 from app import db
 # --- ADD THIS IMPORT ---
 from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import func
+from sqlalchemy.orm import undefer
 # -----------------------
 
 # Optional: For logging instead of print
@@ -20,12 +22,17 @@ def reading_tasks():
     """Displays the list of available reading activities."""
     try:
         activities = ReadingActivity.query.order_by(ReadingActivity.title.asc()).all()
+        page_counts = dict(
+            db.session.query(ReadingPage.activity_id, func.count(ReadingPage.id))
+            .group_by(ReadingPage.activity_id)
+            .all()
+        )
         progress_records = UserReadingProgress.query.filter_by(user_id=current_user.id).all()
         progress_map = {record.activity_id: record for record in progress_records}
 
         activity_cards = []
         for activity in activities:
-            total_pages = len(activity.pages or [])
+            total_pages = page_counts.get(activity.id, 0)
             progress = progress_map.get(activity.id)
             unlocked_pages = []
 
@@ -86,25 +93,24 @@ def reading_activity(activity_id, page_number):
     )
     try:
         activity = ReadingActivity.query.get_or_404(activity_id)
-        page = ReadingPage.query.filter_by(activity_id=activity_id, page_number=page_number).first_or_404()
+        page = (
+            ReadingPage.query.options(undefer(ReadingPage.content))
+            .filter_by(activity_id=activity_id, page_number=page_number)
+            .first_or_404()
+        )
+        total_pages = ReadingPage.query.filter_by(activity_id=activity_id).count()
 
+        # Viewing a page never writes: without a progress row only page 1 is
+        # unlocked, and unlock_page creates the row on the first unlock.
         progress = UserReadingProgress.query.filter_by(user_id=current_user.id, activity_id=activity_id).first()
         if not progress:
             current_app.logger.debug(
-                "reading.reading_activity: no progress found for user %s activity %s; creating entry",
-                current_user.id,
-                activity_id,
-            )
-            progress = UserReadingProgress(user_id=current_user.id, activity_id=activity_id, unlocked_pages=[1])
-            db.session.add(progress)
-            db.session.commit()
-            current_app.logger.debug(
-                "reading.reading_activity: created initial progress for user %s activity %s",
+                "reading.reading_activity: no progress found for user %s activity %s; using defaults",
                 current_user.id,
                 activity_id,
             )
 
-        unlocked_pages = progress.unlocked_pages if isinstance(progress.unlocked_pages, list) else [1]
+        unlocked_pages = progress.unlocked_pages if progress and isinstance(progress.unlocked_pages, list) else [1]
         current_app.logger.debug(
             "reading.reading_activity: unlocked_pages=%s for user %s activity %s",
             unlocked_pages,
@@ -133,7 +139,13 @@ def reading_activity(activity_id, page_number):
             page_number,
             current_user.id,
         )
-        return render_template('reading/activity.html', activity=activity, page=page, unlocked_pages=unlocked_pages)
+        return render_template(
+            'reading/activity.html',
+            activity=activity,
+            page=page,
+            total_pages=total_pages,
+            unlocked_pages=unlocked_pages,
+        )
     except Exception:
         db.session.rollback()
         current_app.logger.exception(
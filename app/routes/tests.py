@@ -1,12 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
-from app.models import Test, TestResult, Book, LearnTestResult, LearnTestProgress
+from app.models import Test, TestResult, TestAttempt, Book, LearnTestResult, LearnTestProgress
 from app.forms import AddTestForm, EditTestForm
 from app import db
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
+from sqlalchemy.orm import undefer
 import random
-import re
-from app.utils import admin_required, normalize_text
+from app.utils import admin_required
+from app.fragment_cache import get_fragment_cache
+from app.grading import GradingError, grade_batch, save_results, score_answers
+from app.markup_compiler import (
+    MODE_STANDARD, is_correct, question_count, questions_by_qid, render_learn_lines, render_take_lines,
+)
+from app.result_queue import attempt_submission_key, get_result_queue
 
 tests_bp = Blueprint('tests', __name__, url_prefix='/tests')
 
@@ -40,6 +46,7 @@ def add_test():
             shuffle_paragraphs=shuffle_paragraphs,
             created_by=current_user.id
         )
+        new_test.compile_content()
         db.session.add(new_test)
         db.session.commit()
 
@@ -51,7 +58,7 @@ def add_test():
 @tests_bp.route('/edit/<int:test_id>', methods=['GET', 'POST'])
 @login_required
 def edit_test(test_id):
-    test = Test.query.get_or_404(test_id)
+    test = Test.query.options(undefer(Test.content)).get_or_404(test_id)
 
     # Ensure that only the creator or an admin can edit the test
     if test.created_by != current_user.id and not current_user.is_admin:
@@ -66,6 +73,7 @@ def edit_test(test_id):
         test.content = form.content.data
         test.shuffle_sentences = form.shuffle_sentences.data
         test.shuffle_paragraphs = form.shuffle_paragraphs.data
+        test.compile_content()
         db.session.commit()
         flash('Test updated successfully.', 'success')
         return redirect(url_for('main.index'))
@@ -92,153 +100,80 @@ def delete_test(test_id):
     flash('Test deleted successfully.', 'success')
     return redirect(url_for('main.index'))
 
+def start_attempt(test):
+    now = datetime.utcnow()
+    deadline = now + timedelta(minutes=test.time_limit) if test.time_limit else None
+    attempt = TestAttempt.query.filter_by(
+        user_id=current_user.id,
+        test_id=test.id,
+        status=TestAttempt.STATUS_IN_PROGRESS,
+    ).first()
+    if attempt:
+        attempt.started_at = now
+        attempt.deadline = deadline
+    else:
+        attempt = TestAttempt(user_id=current_user.id, test_id=test.id, started_at=now, deadline=deadline)
+        db.session.add(attempt)
+
+    # Start times used to live in the cookie session; drop any left behind
+    for key in [key for key in session if key.startswith('start_time_')]:
+        session.pop(key)
+    db.session.commit()
+    return attempt
+
 @tests_bp.route('/test/<int:test_id>', methods=['GET', 'POST'])
 @login_required
 def take_test(test_id):
-    test = Test.query.get_or_404(test_id)
-    test_content = test.content
+    test = Test.query.options(undefer(Test.compiled_content)).get_or_404(test_id)
+    compiled = test.get_compiled()
     time_limit = test.time_limit
 
-    # Initialize variables
-    processed_content = []
     correct_answers = {}
     original_order = []
-    question_counter = 1
-
-    # Function to replace answers
-    def replace_answers(line):
-        nonlocal question_counter
-        dropdown_pattern = r'#\s*\[([^\]]+)\]\s*([^\#]+)\s*#'
-        input_pattern = r'\[([^\]]+)\]'
-
-        def dropdown_repl(match):
-            nonlocal question_counter
-            options_str = match.group(1)
-            correct_answer = match.group(2).strip()
-            options = [opt.strip() for opt in options_str.split(',')]
-            qid = f'q{question_counter}'
-            correct_answers[qid] = correct_answer
-            question_counter += 1
-
-            if request.method == 'POST':
-                user_answer = request.form.get(qid, '').strip()
-                normalized_user_answer = normalize_text(user_answer)
-                normalized_correct_answer = normalize_text(correct_answer)
-                select_class = 'custom-select correct' if normalized_user_answer == normalized_correct_answer else 'custom-select incorrect'
-                disabled = 'disabled'
-            else:
-                user_answer = ''
-                select_class = 'custom-select'
-                disabled = ''
-
-            select_html = f'<select name="{qid}" class="{select_class}" {disabled}>'
-            select_html += '<option value="">-- Select an option --</option>'
-            for option in options:
-                normalized_option = normalize_text(option)
-                if request.method == 'POST':
-                    selected = 'selected' if normalized_user_answer == normalized_option else ''
-                else:
-                    selected = ''
-                select_html += f'<option value="{option}" {selected}>{option}</option>'
-            select_html += '</select>'
-
-            if request.method == 'POST' and normalized_user_answer != normalized_correct_answer:
-                select_html += f' <span class="correct-answer">(Correct answer: {correct_answer})</span>'
-
-            return select_html
-
-        def input_repl(match):
-            nonlocal question_counter
-            correct_answer = match.group(1).strip()
-            qid = f'q{question_counter}'
-            correct_answers[qid] = correct_answer
-            question_counter += 1
-
-            if request.method == 'POST':
-                user_answer = request.form.get(qid, '')
-                normalized_user_answer = normalize_text(user_answer.strip())
-                normalized_correct_answer = normalize_text(correct_answer)
-                input_class = 'form-control correct' if normalized_user_answer == normalized_correct_answer else 'form-control incorrect'
-                readonly = 'readonly'
-            else:
-                user_answer = ''
-                input_class = 'form-control'
-                readonly = ''
-
-            input_html = f'<input type="text" name="{qid}" value="{user_answer}" class="{input_class}" {readonly}>'
-
-            if request.method == 'POST' and normalized_user_answer != normalized_correct_answer:
-                input_html += f' <span class="correct-answer">(Correct answer: {correct_answer})</span>'
-
-            return input_html
-
-        # Process the line
-        line = re.sub(dropdown_pattern, dropdown_repl, line)
-        line = re.sub(input_pattern, input_repl, line)
-        return line
-
-    # Function to process the test content
-    def process_content(content):
-        nonlocal question_counter, original_order, processed_content
-        lines = content.splitlines()
-
-        if test.shuffle_sentences:
-            # Split content into sentences
-            sentences = []
-            for line in lines:
-                sentences.extend(re.split(r'(?<=[.!?])\s+', line.strip()))
-            # Store the original correct order using unique tile IDs
-            for idx, sentence in enumerate(sentences):
-                item_id = f'item_{idx + 1}'
-                original_order.append(item_id)
-                correct_answers[item_id] = sentence.strip()
-                processed_content.append({'id': item_id, 'content': sentence.strip()})
-            # Shuffle sentences
-            if request.method == 'GET':
-                random.shuffle(processed_content)
-        elif test.shuffle_paragraphs:
-            # Split content into paragraphs
-            paragraphs = [para.strip() for para in content.split('\n\n') if para.strip()]
-            # Store the original correct order using unique tile IDs
-            for idx, paragraph in enumerate(paragraphs):
-                item_id = f'item_{idx + 1}'
-                original_order.append(item_id)
-                correct_answers[item_id] = paragraph.strip()
-                processed_content.append({'id': item_id, 'content': paragraph.strip()})
-            # Shuffle paragraphs
-            if request.method == 'GET':
-                random.shuffle(processed_content)
-        else:
-            # Default behavior
-            for line in lines:
-                processed_line = replace_answers(line)
-                processed_content.append(processed_line)
 
-    # Determine test type and process content
-    if test.shuffle_sentences or test.shuffle_paragraphs:
+    if compiled['mode'] != MODE_STANDARD:
         test_type = 'drag_and_drop'
-        process_content(test_content)
+        processed_content = []
+        for item in compiled['items']:
+            original_order.append(item['id'])
+            correct_answers[item['id']] = item['content']
+            processed_content.append({'id': item['id'], 'content': item['content']})
+        if request.method == 'GET':
+            random.shuffle(processed_content)
     else:
         test_type = 'standard'
-        for line in test_content.splitlines():
-            processed_line = replace_answers(line)
-            processed_content.append(processed_line)
-
-    total_questions = question_counter - 1
+        for question in compiled['questions']:
+            correct_answers[question['qid']] = question['answer']
+        if request.method == 'POST':
+            processed_content = render_take_lines(compiled, request.form)
+        elif test.content_hash:
+            # The unanswered form is identical for every student
+            cache_key = ('take_test', test.id, test.content_hash, compiled['version'])
+            processed_content = get_fragment_cache().get_or_render(
+                cache_key, lambda: render_take_lines(compiled)
+            )
+        else:
+            processed_content = render_take_lines(compiled)
+    # Gaps, or tiles for drag-and-drop tests: the same count Test.question_count shows
+    total_questions = question_count(compiled)
 
     if request.method == 'POST':
         # Time limit enforcement
-        start_time_str = session.get(f'start_time_{test_id}')
-        if not start_time_str:
+        attempt = TestAttempt.query.filter_by(
+            user_id=current_user.id,
+            test_id=test.id,
+            status=TestAttempt.STATUS_IN_PROGRESS,
+        ).first()
+        if not attempt:
             flash('Test session expired. Please start the test again.', 'danger')
             return redirect(url_for('tests.take_test', test_id=test_id))
         else:
-            start_time = datetime.fromisoformat(start_time_str)
-            elapsed_time = datetime.now(timezone.utc) - start_time
-            elapsed_minutes = elapsed_time.total_seconds() / 60
-
-            if time_limit and elapsed_minutes > time_limit:
+            submitted_at = datetime.utcnow()
+            if attempt.deadline and submitted_at > attempt.deadline:
+                attempt_status = TestAttempt.STATUS_TIMED_OUT
                 flash('Time limit exceeded. Test submitted automatically.', 'warning')
+            else:
+                attempt_status = TestAttempt.STATUS_SUBMITTED
 
         # Calculate score
         score = 0
@@ -279,25 +214,35 @@ def take_test(test_id):
 
         else:
             # Standard test scoring
-            for qid, correct_answer in correct_answers.items():
-                user_answer = request.form.get(qid, '')
-                normalized_user_answer = normalize_text(user_answer.strip())
-                normalized_correct_answer = normalize_text(correct_answer)
-                if normalized_user_answer == normalized_correct_answer:
-                    score += 1
+            score = score_answers(compiled, request.form)
 
         # Save test result
-        test_result = TestResult(
-            score=score,
-            total_questions=total_questions,
-            user_id=current_user.id,
-            test_id=test.id
-        )
-        db.session.add(test_result)
-        db.session.commit()
-
-        # Clear session
-        session.pop(f'start_time_{test_id}', None)
+        result_queue = get_result_queue()
+        if result_queue is not None:
+            # Journaled now, written to the database by the background flusher
+            result_queue.submit({
+                'score': score,
+                'total_questions': total_questions,
+                'user_id': current_user.id,
+                'test_id': test.id,
+                'timestamp': submitted_at.isoformat(),
+                'submission_key': attempt_submission_key(attempt.id, attempt.started_at),
+                'attempt_id': attempt.id,
+                'attempt_started_at': attempt.started_at.isoformat(),
+                'attempt_status': attempt_status,
+                'submitted_at': submitted_at.isoformat(),
+            })
+        else:
+            attempt.status = attempt_status
+            attempt.submitted_at = submitted_at
+            test_result = TestResult(
+                score=score,
+                total_questions=total_questions,
+                user_id=current_user.id,
+                test_id=test.id
+            )
+            db.session.add(test_result)
+            db.session.commit()
 
         flash(f'You scored {score} out of {total_questions}!', 'info')
         return render_template(
@@ -312,8 +257,8 @@ def take_test(test_id):
         )
 
     else:
-        # GET request
-        session[f'start_time_{test_id}'] = datetime.now(timezone.utc).isoformat()
+        # GET request: (re)start the attempt; reloading the page restarts the clock
+        start_attempt(test)
 
         return render_template(
             'tests/take_test.html',
@@ -331,119 +276,37 @@ def take_test(test_id):
 @tests_bp.route('/learn/<int:test_id>', methods=['GET', 'POST'])
 @login_required
 def learn_test(test_id):
-    test = Test.query.get_or_404(test_id)
-    test_content = test.content
+    test = Test.query.options(undefer(Test.compiled_content)).get_or_404(test_id)
+    compiled = test.get_compiled()
 
-    # Initialize variables
-    processed_content = []
-    correct_answers = {}
-    question_counter = 1
-    user_correct = {}
-
-    # Retrieve or create LearnTestProgress
+    # Progress is only created once there is something to save, so GETs stay read-only
     progress = LearnTestProgress.query.filter_by(user_id=current_user.id, test_id=test.id).first()
-    if not progress:
-        progress = LearnTestProgress(user_id=current_user.id, test_id=test.id, answers={})
-        db.session.add(progress)
-        db.session.commit()
 
     # Prepare user_answers
     if request.method == 'POST':
-        user_answers = {}
+        user_answers = {
+            question['qid']: request.form.get(question['qid'], '').strip()
+            for question in compiled['questions']
+        }
     else:
-        user_answers = progress.answers or {}
-
-    # Function to replace answers with input fields or dropdowns
-    def replace_answers(line):
-        nonlocal question_counter
-        dropdown_pattern = r'#\s*\[([^\]]+)\]\s*([^\#]+)\s*#'
-        input_pattern = r'\[([^\]]+)\]'
-
-        def dropdown_repl(match):
-            nonlocal question_counter
-            options_str = match.group(1)
-            correct_answer = match.group(2).strip()
-            options = [opt.strip() for opt in options_str.split(',')]
-            qid = f'q{question_counter}'
-            correct_answers[qid] = correct_answer
-            question_counter += 1
-
-            select_class = 'custom-select'
-
-            if request.method == 'POST':
-                user_answer = request.form.get(qid, '').strip()
-                user_answers[qid] = user_answer
-            else:
-                user_answer = user_answers.get(qid, '')
+        user_answers = (progress.answers if progress else None) or {}
 
-            # Normalize answers for comparison
-            normalized_user_answer = normalize_text(user_answer)
-            normalized_correct_answer = normalize_text(correct_answer)
-
-            # Check if user's answer is correct
-            if normalized_user_answer == normalized_correct_answer:
-                user_correct[qid] = True
-                select_class += ' correct'
-            else:
-                user_correct[qid] = False
-
-            select_html = f'<select name="{qid}" class="{select_class}">'
-            select_html += '<option value="">-- Select an option --</option>'
-            for option in options:
-                selected = 'selected' if user_answer == option else ''
-                select_html += f'<option value="{option}" {selected}>{option}</option>'
-            select_html += '</select>'
-
-            return select_html
-
-        def input_repl(match):
-            nonlocal question_counter
-            correct_answer = match.group(1).strip()
-            qid = f'q{question_counter}'
-            correct_answers[qid] = correct_answer
-            question_counter += 1
-
-            if request.method == 'POST':
-                user_answer = request.form.get(qid, '').strip()
-                user_answers[qid] = user_answer
-            else:
-                user_answer = user_answers.get(qid, '')
-
-            input_class = 'form-control'
-
-            # Normalize answers for comparison
-            normalized_user_answer = normalize_text(user_answer)
-            normalized_correct_answer = normalize_text(correct_answer)
-
-            # Check if user's answer is correct
-            if normalized_user_answer == normalized_correct_answer:
-                user_correct[qid] = True
-                input_class += ' correct'
-            else:
-                user_correct[qid] = False
-
-            input_html = f'<input type="text" name="{qid}" value="{user_answer}" class="{input_class}">'
-
-            return input_html
-
-        # Process the line
-        line = re.sub(dropdown_pattern, dropdown_repl, line)
-        line = re.sub(input_pattern, input_repl, line)
-        return line
-
-    # Process each line in test content
-    for line in test_content.splitlines():
-        processed_line = replace_answers(line)
-        processed_content.append(processed_line)
+    processed_content = render_learn_lines(compiled, user_answers)
 
     if request.method == 'POST':
         # Save user's answers
+        if not progress:
+            progress = LearnTestProgress(user_id=current_user.id, test_id=test.id)
+            db.session.add(progress)
         progress.answers = user_answers
         progress.last_updated = datetime.utcnow()
         db.session.commit()
 
         # Check if all answers are correct
-        all_correct = all(user_correct.values())
+        all_correct = all(
+            is_correct(question, user_answers[question['qid']])
+            for question in compiled['questions']
+        )
         if all_correct:
             # Save learn test result
             learn_result = LearnTestResult(
@@ -463,6 +326,95 @@ def learn_test(test_id):
 
     return render_template(
         'tests/learn_test.html',
+        test_id=test.id,
         test_name=test.name,
         processed_content=processed_content
     )
+
+
+def _parse_learn_answer(questions):
+    data = request.get_json(silent=True) or {}
+    qid = data.get('qid')
+    answer = data.get('answer')
+    if qid not in questions or not isinstance(answer, str):
+        return None, None
+    return qid, answer.strip()
+
+
+@tests_bp.route('/learn/<int:test_id>/answer', methods=['POST'])
+@login_required
+def save_learn_answer(test_id):
+    """Save a single learn-mode answer without re-rendering the test."""
+    test = Test.query.options(undefer(Test.compiled_content)).get_or_404(test_id)
+    qid, answer = _parse_learn_answer(questions_by_qid(test.get_compiled()))
+    if qid is None:
+        return jsonify({'success': False, 'error': 'Invalid data: unknown question or missing answer'}), 400
+
+    LearnTestProgress.upsert_answer(current_user.id, test.id, qid, answer)
+    db.session.commit()
+    return jsonify({'success': True, 'qid': qid})
+
+
+@tests_bp.route('/learn/<int:test_id>/check', methods=['POST'])
+@login_required
+def check_learn_answer(test_id):
+    """Save and grade one learn-mode answer against the compiled test.
+
+    A LearnTestResult is recorded when this answer completes the test, i.e.
+    every question is now answered correctly and was not before.
+    """
+    test = Test.query.options(undefer(Test.compiled_content)).get_or_404(test_id)
+    questions = questions_by_qid(test.get_compiled())
+    qid, answer = _parse_learn_answer(questions)
+    if qid is None:
+        return jsonify({'success': False, 'error': 'Invalid data: unknown question or missing answer'}), 400
+
+    saved_answers = db.session.execute(
+        db.select(LearnTestProgress.answers).filter_by(user_id=current_user.id, test_id=test.id)
+    ).scalar() or {}
+
+    def all_correct(answers):
+        return all(is_correct(question, answers.get(key)) for key, question in questions.items())
+
+    was_completed = all_correct(saved_answers)
+    answers = dict(saved_answers, **{qid: answer})
+    completed = all_correct(answers)
+
+    LearnTestProgress.upsert_answer(current_user.id, test.id, qid, answer)
+    if completed and not was_completed:
+        db.session.add(LearnTestResult(user_id=current_user.id, test_id=test.id))
+    db.session.commit()
+
+    return jsonify({
+        'success': True,
+        'qid': qid,
+        'correct': is_correct(questions[qid], answer),
+        'completed': completed,
+    })
+
+
+@tests_bp.route('/<int:test_id>/grade', methods=['POST'])
+@login_required
+def grade_submissions(test_id):
+    """Grade many answer sets for one test and store all results at once.
+
+    Expects ``{"submissions": [{"username": ..., "answers": {"q1": ...}}, ...]}``
+    (``user_id`` may replace ``username``; drag-and-drop tests take
+    ``item_order`` instead of ``answers``).
+    """
+    test = Test.query.options(undefer(Test.compiled_content)).get_or_404(test_id)
+    if test.created_by != current_user.id and not current_user.is_admin:
+        return jsonify({'success': False, 'error': 'You do not have permission to grade this test.'}), 403
+
+    data = request.get_json(silent=True) or {}
+    submissions = data.get('submissions')
+    if not isinstance(submissions, list) or not all(isinstance(sub, dict) for sub in submissions):
+        return jsonify({'success': False, 'error': 'Invalid data: "submissions" must be a list of objects'}), 400
+
+    try:
+        graded = grade_batch(test, submissions)
+    except GradingError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    save_results(test, graded)
+    return jsonify({'success': True, 'graded': len(graded), 'results': graded})
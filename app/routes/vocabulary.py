@@ -1,20 +1,49 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from ..models import Vocabulary
 from ..forms import EditWordForm
 from .. import db
-from datetime import datetime, timedelta
-import random
-from ..utils import normalize_text
+from datetime import datetime
+from ..pagination import InvalidCursor, page_request, paginate, wants_json
+from ..vocab_review import (
+    CHOOSE_TRANSLATION, CHOOSE_WORD, TYPE_TRANSLATION, TYPE_WORD, UNSCRAMBLE,
+    build_card, due_count, due_words, grade, grade_answers, next_due_word,
+)
+from ..vocab_import import InvalidImport, find_users, import_format, import_vocabulary, read_rows
+from ..utils import normalize_word
+from ..vocab_sync import decode_token, vocabulary_delta
 
 vocab_bp = Blueprint('vocab', __name__, url_prefix='/vocabulary')
 
+REVIEW_TEMPLATES = {
+    CHOOSE_WORD: 'vocabulary/first_review.html',
+    CHOOSE_TRANSLATION: 'vocabulary/second_review.html',
+    UNSCRAMBLE: 'vocabulary/third_review.html',
+    TYPE_WORD: 'vocabulary/fourth_review.html',
+    TYPE_TRANSLATION: 'vocabulary/fourth_review.html',
+}
+REVIEW_BATCH_SIZE = 50
+MAX_REVIEW_BATCH_SIZE = 200
+
 # Display all vocabulary words
 @vocab_bp.route('/')
 @login_required
 def my_vocabulary():
-    vocab_words = Vocabulary.query.filter_by(user_id=current_user.id).all()
-    return render_template('vocabulary/vocabulary.html', vocab_words=vocab_words)
+    page = paginate(Vocabulary.query.filter_by(user_id=current_user.id), (Vocabulary.id,), page_request())
+    if wants_json():
+        return jsonify({
+            'words': [
+                {
+                    'id': vocab.id,
+                    'word': vocab.word,
+                    'translation': vocab.translation,
+                    'next_review': vocab.next_review.isoformat(),
+                }
+                for vocab in page.items
+            ],
+            **page.links(),
+        })
+    return render_template('vocabulary/vocabulary.html', vocab_words=page.items, page=page)
 
 # Add a new word to the vocabulary
 @vocab_bp.route('/add', methods=['POST'])
@@ -27,10 +56,13 @@ def add_to_vocabulary():
     # Ensure that word and translation are not None or empty
     if not word or not translation:
         return jsonify({'success': False, 'error': 'Invalid data: word or translation is missing'}), 400
+    if not normalize_word(word):
+        return jsonify({'success': False, 'error': 'Invalid data: the word is only punctuation'}), 400
 
     try:
         # Check if the word already exists in the user's vocabulary
-        existing_word = Vocabulary.query.filter_by(user_id=current_user.id, word=word).first()
+        existing_word = Vocabulary.query.filter_by(
+            user_id=current_user.id, normalized_word=normalize_word(word)).first()
         if existing_word:
             return jsonify({'success': False, 'error': 'Word already exists in your vocabulary'}), 400
 
@@ -51,6 +83,39 @@ def add_to_vocabulary():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Bulk import: a CSV/JSON word list, for the current user or (admins) many users
+@vocab_bp.route('/import', methods=['POST'])
+@login_required
+def import_words():
+    """Import the request body, or a multipart "file", into one or more decks.
+
+    The format comes from ?format=, else the upload's file name or the
+    Content-Type. Admins may target ?user_id=...&username=... (repeatable).
+    """
+    user_ids, missing = find_users(request.args.getlist('user_id', type=int), request.args.getlist('username'))
+    if missing:
+        return jsonify({'success': False, 'error': f'Unknown users: {", ".join(missing)}'}), 400
+    if not user_ids:
+        user_ids = [current_user.id]
+    elif user_ids != [current_user.id] and not current_user.is_admin:
+        return jsonify({'success': False, 'error': 'Only admins can import into other users\' vocabulary'}), 403
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+        stream, name = upload.stream, upload.filename
+    else:
+        stream, name = request.stream, request.mimetype
+    requested = request.args.get('format')
+    fmt = (import_format(requested) or requested) if requested else (import_format(name) or 'csv')
+
+    try:
+        result = import_vocabulary(read_rows(stream, fmt), user_ids)
+    except InvalidImport as e:
+        return jsonify({'success': False, 'error': f'Invalid {fmt} upload: {e}'}), 400
+    return jsonify({'success': True, **result._asdict()})
+
 # Edit an existing word in the vocabulary
 @vocab_bp.route('/edit/<int:word_id>', methods=['GET', 'POST'])
 @login_required
@@ -62,6 +127,17 @@ def edit_word(word_id):
 
     form = EditWordForm(obj=word)
     if form.validate_on_submit():
+        if not normalize_word(form.word.data):
+            flash('A word cannot be only punctuation.', 'danger')
+            return render_template('vocabulary/edit_word.html', form=form)
+        duplicate = Vocabulary.query.filter(
+            Vocabulary.user_id == current_user.id,
+            Vocabulary.normalized_word == normalize_word(form.word.data),
+            Vocabulary.id != word.id,
+        ).first()
+        if duplicate:
+            flash('That word is already in your vocabulary.', 'danger')
+            return render_template('vocabulary/edit_word.html', form=form)
         word.word = form.word.data
         word.translation = form.translation.data
         db.session.commit()
@@ -89,12 +165,9 @@ def delete_word(word_id):
 @login_required
 def review():
     today = datetime.utcnow()
-    due_words = Vocabulary.query.filter(
-        Vocabulary.user_id == current_user.id,
-        Vocabulary.next_review <= today
-    ).all()
+    word = next_due_word(current_user.id, today)
 
-    if not due_words:
+    if word is None:
         flash('No more words due for review!', 'info')
         return redirect(url_for('vocab.my_vocabulary'))
 
@@ -108,153 +181,106 @@ def review():
             flash('Invalid word. Please try again.', 'danger')
             return redirect(url_for('vocab.review'))
 
-        user_answer = request.form.get('answer', '').strip()
+        user_answer = request.form.get('answer', '')
         review_stage = word.learning_stage
+        correct, correct_answer = grade(word, user_answer)
+        db.session.commit()
 
-        # Ensure that 'correct_answer' is defined appropriately
-        if review_stage == 0:
-            correct_answer = word.word.strip()
-        elif review_stage == 1:
-            correct_answer = word.translation.strip()
-        elif review_stage == 2:
-            correct_answer = word.word.strip()
-        elif review_stage >= 3:
-            if review_stage % 2 == 0:
-                correct_answer = word.word.strip()
-            else:
-                correct_answer = word.translation.strip()
-        else:
-            correct_answer = ''
-
-        # Normalize the text for comparison
-        normalized_user_answer = normalize_text(user_answer)
-        normalized_correct_answer = normalize_text(correct_answer)
-
-        # Debugging statements
         current_app.logger.debug(
-            "vocabulary.review: review_stage=%s question='%s'",
+            "vocabulary.review: review_stage=%s user_answer='%s' correct_answer='%s'",
             review_stage,
-            word.translation if review_stage % 2 == 0 else word.word,
-        )
-        current_app.logger.debug(
-            "vocabulary.review: user_answer='%s' correct_answer='%s'",
             user_answer,
             correct_answer,
         )
-        current_app.logger.debug(
-            "vocabulary.review: normalized_user_answer='%s' normalized_correct_answer='%s'",
-            normalized_user_answer,
-            normalized_correct_answer,
-        )
 
-        if normalized_user_answer == normalized_correct_answer:
-            # Correct answer: increase the learning stage
-            word.learning_stage += 1
-            word.ease_factor = max(1.3, word.ease_factor - 0.2)
-            word.interval = get_next_interval(word.learning_stage, word.ease_factor)
-            word.next_review = datetime.utcnow() + timedelta(
-                minutes=word.interval if word.learning_stage < 3 else word.interval * 24 * 60)
-            db.session.commit()
+        if correct:
             flash('Correct!', 'success')
         else:
-            # Incorrect answer: reset learning stage to 0 and ease factor to default
-            word.learning_stage = 0
-            word.ease_factor = 2.5
-            word.interval = get_next_interval(word.learning_stage, word.ease_factor)
-            word.next_review = datetime.utcnow() + timedelta(minutes=1)
-            db.session.commit()
             flash(f'Incorrect! The correct answer was "{correct_answer}". The word has been reset.', 'danger')
 
         return redirect(url_for('vocab.review'))
 
     else:
-        # GET request
-        # Get the current word index from the session
-        current_word_index = session.get('current_word_index', 0)
-
-        # Reset the current_word_index if it is out of range
-        if current_word_index >= len(due_words):
-            current_word_index = 0
-            session['current_word_index'] = current_word_index
-
-        # Retrieve the current word
-        word = due_words[current_word_index]
-
-        # Determine the review stage
-        review_stage = word.learning_stage
-
-        # Prepare the question and options based on the review stage
-        if review_stage == 0:
-            # First review: Multiple choice for the original word
-            question = word.translation
-            options = get_options(correct_answer=word.word, field='word')
-            template = 'vocabulary/first_review.html'
-        elif review_stage == 1:
-            # Second review: Multiple choice for the translation
-            question = word.word
-            options = get_options(correct_answer=word.translation, field='translation')
-            template = 'vocabulary/second_review.html'
-        elif review_stage == 2:
-            # Third review: Unscramble the word
-            question = word.translation
-            scrambled_word = ''.join(random.sample(word.word, len(word.word)))
-            session['scrambled_word'] = scrambled_word
-            template = 'vocabulary/third_review.html'
-        elif review_stage >= 3:
-            # Fourth and subsequent reviews: Type the word or translation
-            if review_stage % 2 == 0:
-                question = word.translation
-                # The user must type the original word
-            else:
-                question = word.word
-                # The user must type the translation
-            template = 'vocabulary/fourth_review.html'
-        else:
-            flash('Invalid review stage.', 'danger')
-            return redirect(url_for('vocab.my_vocabulary'))
-
-        # Move to the next word index for the next GET request
-        session['current_word_index'] = (current_word_index + 1) % len(due_words)
-
+        # GET request: the queue always serves the most overdue word
+        card = build_card(word)
         return render_template(
-            template,
-            question=question,
-            options=options if 'options' in locals() else None,
-            scrambled_word=session.get('scrambled_word', None),
-            review_stage=review_stage,
-            current_word_number=current_word_index + 1,
-            total_words=len(due_words),
+            REVIEW_TEMPLATES[card['kind']],
+            question=card['question'],
+            options=card.get('options'),
+            scrambled_word=card.get('scrambled'),
+            review_stage=word.learning_stage,
+            total_words=due_count(current_user.id, today),
             word=word  # Pass the word object to the template
         )
-        
-# Utility functions
-def get_options(correct_answer, field='word'):
-    # Generate a list of options including the correct answer
-    options = [correct_answer]
-    vocab_words = Vocabulary.query.filter(Vocabulary.user_id == current_user.id).all()
-
-    if field == 'word':
-        all_options = [word.word for word in vocab_words if word.word != correct_answer]
-    elif field == 'translation':
-        all_options = [word.translation for word in vocab_words if word.translation != correct_answer]
-    else:
-        all_options = []
 
-    # Remove duplicates and ensure unique options
-    all_options = list(set(all_options))
+# Batched review API: a session of N cards costs a GET and a POST, not 2N requests
+@vocab_bp.route('/review/batch', methods=['GET'])
+@login_required
+def review_batch():
+    today = datetime.utcnow()
+    limit = max(1, min(request.args.get('limit', REVIEW_BATCH_SIZE, type=int), MAX_REVIEW_BATCH_SIZE))
+    words = due_words(current_user.id, today).limit(limit).all()
+    return jsonify({
+        'cards': [build_card(word) for word in words],
+        'due': due_count(current_user.id, today),
+    })
+
+def _valid_answer(item, require_stage):
+    if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+        return False
+    stage = item.get('stage')
+    return isinstance(stage, int) or (stage is None and not require_stage)
+
+def _valid_answers(answers, require_stage=False):
+    return (
+        isinstance(answers, list)
+        and len(answers) <= MAX_REVIEW_BATCH_SIZE
+        and all(_valid_answer(item, require_stage) for item in answers)
+    )
+
+@vocab_bp.route('/review/batch', methods=['POST'])
+@login_required
+def grade_batch():
+    """Grade [{"id": ..., "stage": ..., "answer": ...}, ...] and reschedule in one transaction.
+
+    ``stage`` is echoed back from the served card, so an answer to a card that
+    is no longer current is skipped instead of graded.
+    """
+    answers = (request.get_json(silent=True) or {}).get('answers')
+    if not _valid_answers(answers, require_stage=True):
+        return jsonify({'success': False, 'error': 'Expected a list of {"id", "stage", "answer"} objects'}), 400
 
-    # Ensure that there are enough options
-    if len(all_options) >= 3:
-        options.extend(random.sample(all_options, 3))
-    else:
-        options.extend(all_options)
-    random.shuffle(options)
-    return options
-
-def get_next_interval(learning_stage, ease_factor):
-    # Learning stage: 1-minute interval
-    if learning_stage < 3:
-        return 1 / 60  # 1 minute in days format
-    # Long-term review: starts at 1 day, increases by ease_factor
-    else:
-        return 1 * (ease_factor ** (learning_stage - 3))
+    now = datetime.utcnow()
+    try:
+        results = grade_answers(current_user.id, answers, now)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid review timestamp'}), 400
+    db.session.commit()
+    return jsonify({'success': True, 'results': results, 'due': due_count(current_user.id, now)})
+
+# Offline review: download what changed since a token, upload a review log
+@vocab_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_download():
+    try:
+        delta = vocabulary_delta(current_user.id, request.args.get('since'))
+    except InvalidCursor:
+        return jsonify({'success': False, 'error': 'Invalid sync token'}), 400
+    return jsonify({'success': True, **delta})
+
+@vocab_bp.route('/sync', methods=['POST'])
+@login_required
+def sync_upload():
+    """Replay {"reviews": [{"id", "answer", "reviewed_at"}, ...]} in order, then send the delta."""
+    payload = request.get_json(silent=True) or {}
+    reviews = payload.get('reviews', [])
+    if not _valid_answers(reviews):
+        return jsonify({'success': False, 'error': 'Expected a list of {"id", "answer", "reviewed_at"} objects'}), 400
+    try:
+        decode_token(payload.get('since'))
+        results = grade_answers(current_user.id, reviews)
+    except ValueError:
+        # InvalidCursor is a ValueError too
+        return jsonify({'success': False, 'error': 'Invalid sync token or review timestamp'}), 400
+    db.session.commit()
+    return jsonify({'success': True, 'results': results, **vocabulary_delta(current_user.id, payload.get('since'))})
@@ -0,0 +1,202 @@
+"""SQLite FTS5 full-text index over book titles, test names and test text."""
+import re
+from typing import List, NamedTuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from sqlalchemy.orm import attributes
+
+from . import db
+from .markup_compiler import compile_test_content, content_mode, is_current, plain_text
+from .models import Book, Test
+
+BOOK_FTS = 'fts_book'
+TEST_FTS = 'fts_test'
+
+# Match markers chosen so they cannot occur in user text; swapped for <mark>
+# after the surrounding text has been escaped.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Standalone FTS5 tables whose rowids are the ids of the rows they index
+_CREATE_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {BOOK_FTS} USING fts5(title, tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TEST_FTS} USING fts5(name, body, tokenize='unicode61 remove_diacritics 2')",
+)
+
+
+class SearchHit(NamedTuple):
+    id: int
+    rank: float
+    highlight: Markup
+
+
+def create_search_tables(connection) -> None:
+    for statement in _CREATE_STATEMENTS:
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_after_metadata(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_search_tables(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_before_metadata(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for table in (BOOK_FTS, TEST_FTS):
+            connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+
+
+# --- Keeping the index in sync -------------------------------------------
+# Mapper events follow every ORM insert, update and delete (deletes cascade
+# through the ORM in this app).
+
+def _test_body(test: Test) -> str:
+    # Gap answers are left out, so they are never indexed or shown in snippets
+    return plain_text(test.get_compiled())
+
+
+def _changed(target, key: str) -> bool:
+    return attributes.get_history(target, key).has_changes()
+
+
+@event.listens_for(Book, 'after_insert')
+def _book_inserted(mapper, connection, target):
+    connection.execute(
+        text(f'INSERT INTO {BOOK_FTS} (rowid, title) VALUES (:id, :title)'),
+        {'id': target.id, 'title': target.title},
+    )
+
+
+@event.listens_for(Book, 'after_update')
+def _book_updated(mapper, connection, target):
+    if _changed(target, 'title'):
+        connection.execute(
+            text(f'UPDATE {BOOK_FTS} SET title = :title WHERE rowid = :id'),
+            {'id': target.id, 'title': target.title},
+        )
+
+
+@event.listens_for(Book, 'after_delete')
+def _book_deleted(mapper, connection, target):
+    connection.execute(text(f'DELETE FROM {BOOK_FTS} WHERE rowid = :id'), {'id': target.id})
+
+
+@event.listens_for(Test, 'after_insert')
+def _test_inserted(mapper, connection, target):
+    connection.execute(
+        text(f'INSERT INTO {TEST_FTS} (rowid, name, body) VALUES (:id, :name, :body)'),
+        {'id': target.id, 'name': target.name, 'body': _test_body(target)},
+    )
+
+
+@event.listens_for(Test, 'after_update')
+def _test_updated(mapper, connection, target):
+    values = {}
+    if _changed(target, 'name'):
+        values['name'] = target.name
+    if any(_changed(target, key) for key in ('content', 'compiled_content', 'shuffle_sentences', 'shuffle_paragraphs')):
+        values['body'] = _test_body(target)
+    if values:
+        assignments = ', '.join(f'{column} = :{column}' for column in values)
+        connection.execute(
+            text(f'UPDATE {TEST_FTS} SET {assignments} WHERE rowid = :id'),
+            dict(values, id=target.id),
+        )
+
+
+@event.listens_for(Test, 'after_delete')
+def _test_deleted(mapper, connection, target):
+    connection.execute(text(f'DELETE FROM {TEST_FTS} WHERE rowid = :id'), {'id': target.id})
+
+
+def rebuild_search_index(batch_size: int = 500) -> int:
+    """Repopulate both FTS tables from the book and test tables; returns rows indexed."""
+    connection = db.session.connection()
+    create_search_tables(connection)
+    connection.execute(text(f'DELETE FROM {BOOK_FTS}'))
+    connection.execute(text(f'DELETE FROM {TEST_FTS}'))
+    indexed = connection.execute(
+        text(f'INSERT INTO {BOOK_FTS} (rowid, title) SELECT id, title FROM book')
+    ).rowcount
+
+    batch = []
+    rows = db.session.execute(
+        db.select(
+            Test.id, Test.name, Test.content, Test.compiled_content, Test.shuffle_sentences, Test.shuffle_paragraphs
+        ).execution_options(yield_per=batch_size)
+    )
+    for row in rows:
+        compiled = row.compiled_content
+        mode = content_mode(row.shuffle_sentences, row.shuffle_paragraphs)
+        if not is_current(compiled, mode):
+            compiled = compile_test_content(row.content, mode)
+        batch.append({'id': row.id, 'name': row.name, 'body': plain_text(compiled)})
+        if len(batch) >= batch_size:
+            connection.execute(text(f'INSERT INTO {TEST_FTS} (rowid, name, body) VALUES (:id, :name, :body)'), batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        connection.execute(text(f'INSERT INTO {TEST_FTS} (rowid, name, body) VALUES (:id, :name, :body)'), batch)
+        indexed += len(batch)
+    connection.execute(text(f"INSERT INTO {BOOK_FTS} ({BOOK_FTS}) VALUES ('optimize')"))
+    connection.execute(text(f"INSERT INTO {TEST_FTS} ({TEST_FTS}) VALUES ('optimize')"))
+    db.session.commit()
+    return indexed
+
+
+# --- Querying --------------------------------------------------------------
+
+def match_expression(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must match as a prefix.
+
+    Only word characters survive, so user input can never be parsed as FTS5
+    syntax (quotes, operators, column filters).
+    """
+    return ' '.join(f'"{term}"*' for term in _TERM_PATTERN.findall(query))
+
+
+def _to_markup(fragment: str) -> Markup:
+    return Markup(
+        str(escape(fragment)).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    )
+
+
+def _search(table: str, rank: str, fragment: str, query: str, limit: int, after=None, reverse: bool = False) -> List[SearchHit]:
+    """Hits ordered by (rank, id); ``after``/``reverse`` seek past a (rank, id) key."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    params = {'expression': expression, 'start': _MARK_START, 'end': _MARK_END, 'limit': limit}
+    seek = ''
+    if after is not None:
+        seek = f"AND ({rank}, rowid) {'<' if reverse else '>'} (:after_rank, :after_id) "
+        params['after_rank'], params['after_id'] = after
+    order = 'DESC' if reverse else 'ASC'
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid, {rank} AS score, {fragment} AS fragment "
+            f"FROM {table} WHERE {table} MATCH :expression {seek}"
+            f"ORDER BY score {order}, rowid {order} LIMIT :limit"
+        ),
+        params,
+    )
+    return [SearchHit(row.rowid, row.score, _to_markup(row.fragment)) for row in rows]
+
+
+def search_books(query: str, limit: int = 50, after=None, reverse: bool = False) -> List[SearchHit]:
+    return _search(
+        BOOK_FTS, f'bm25({BOOK_FTS})', f'highlight({BOOK_FTS}, 0, :start, :end)',
+        query, limit, after, reverse,
+    )
+
+
+def search_tests(query: str, limit: int = 50, after=None, reverse: bool = False) -> List[SearchHit]:
+    """Best matches first; names weigh ten times as much as the test text."""
+    return _search(
+        TEST_FTS, f'bm25({TEST_FTS}, 10.0, 1.0)', f"snippet({TEST_FTS}, -1, :start, :end, '…', 16)",
+        query, limit, after, reverse,
+    )
@@ -0,0 +1,122 @@
+"""Word translations cached in the database and shared by all users and workers."""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, NamedTuple
+
+import requests
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from werkzeug.utils import import_string
+
+from . import db
+from .http_client import get_http_client
+from .models import Translation
+from .utils import normalize_word
+
+GOOGLE_TRANSLATE_URL = 'https://translate.googleapis.com/translate_a/single'
+
+
+class TranslationBatch(NamedTuple):
+    translations: Dict[str, str]
+    errors: Dict[str, str]
+
+
+def google_translate(word: str, source: str, target: str) -> str:
+    response = get_http_client().get(
+        GOOGLE_TRANSLATE_URL,
+        params={'client': 'gtx', 'sl': source, 'tl': target, 'dt': 't', 'q': word},
+    )
+    response.raise_for_status()
+    data = response.json()
+    try:
+        return data[0][0][0]
+    except (IndexError, KeyError, TypeError) as e:
+        raise ValueError('Unexpected translation response format') from e
+
+
+def get_translate_upstream() -> Callable[[str, str, str], str]:
+    # A callable or import path taking (word, source, target), so tests and
+    # benchmarks can swap in a local stub
+    upstream = current_app.config.get('TRANSLATE_UPSTREAM') or google_translate
+    if isinstance(upstream, str):
+        upstream = import_string(upstream)
+    return upstream
+
+
+def _fetch(app, upstream, word, source, target):
+    try:
+        # Pool threads need the app context to reach the shared HTTP client
+        with app.app_context():
+            return word, upstream(word, source, target), None
+    except requests.RequestException as e:
+        return word, None, f'Translation API request failed: {e}'
+    except ValueError as e:
+        return word, None, str(e)
+
+
+def translate_words(words: Iterable[str], source: str, target: str) -> TranslationBatch:
+    """Translate ``words``; results and errors are keyed by the words as given.
+
+    Fresh rows for all the normalized words are read in one query. Only the
+    misses, and rows older than ``TRANSLATION_CACHE_TTL``, go upstream,
+    concurrently on a small thread pool, and are upserted for every worker.
+    """
+    by_normalized: Dict[str, list] = {}
+    for word in words:
+        normalized = normalize_word(word)
+        if normalized:
+            by_normalized.setdefault(normalized, []).append(word)
+    if not by_normalized:
+        return TranslationBatch({}, {})
+
+    config = current_app.config
+    fresh_after = datetime.utcnow() - timedelta(seconds=config['TRANSLATION_CACHE_TTL'])
+    found = dict(db.session.execute(
+        db.select(Translation.normalized_word, Translation.translation).filter(
+            Translation.source_lang == source,
+            Translation.target_lang == target,
+            Translation.normalized_word.in_(list(by_normalized)),
+            Translation.fetched_at >= fresh_after,
+        )
+    ).all())
+
+    misses = [word for word in by_normalized if word not in found]
+    failed: Dict[str, str] = {}
+    if misses:
+        app = current_app._get_current_object()
+        upstream = get_translate_upstream()
+        with ThreadPoolExecutor(max_workers=min(len(misses), config['TRANSLATE_MAX_WORKERS'])) as pool:
+            fetched = list(pool.map(lambda word: _fetch(app, upstream, word, source, target), misses))
+        now = datetime.utcnow()
+        rows = []
+        for word, translation, error in fetched:
+            if error is None:
+                found[word] = translation
+                rows.append({
+                    'source_lang': source,
+                    'target_lang': target,
+                    'normalized_word': word,
+                    'translation': translation,
+                    'fetched_at': now,
+                })
+            else:
+                failed[word] = error
+        if rows:
+            table = Translation.__table__
+            stmt = sqlite_insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.source_lang, table.c.target_lang, table.c.normalized_word],
+                set_={'translation': stmt.excluded.translation, 'fetched_at': stmt.excluded.fetched_at},
+            )
+            db.session.execute(stmt)
+            db.session.commit()
+
+    translations = {}
+    errors = {}
+    for normalized, originals in by_normalized.items():
+        for word in originals:
+            if normalized in found:
+                translations[word] = found[normalized]
+            else:
+                errors[word] = failed[normalized]
+    return TranslationBatch(translations, errors)
@@ -29,3 +29,12 @@ def normalize_text(text):
     text = ' '.join(text.split())
     return text
 
+# Stripped from words so "house," and "House" are one vocabulary entry and
+# share one cached translation
+WORD_PUNCTUATION = '.,;:!?"()[]{}«»“”‘’…'
+
+def normalize_word(word):
+    # Vocabulary dedup key (Vocabulary.normalized_word); '' for words that are
+    # only punctuation, which cannot be stored
+    return ' '.join((word or '').split()).strip(WORD_PUNCTUATION).lower()
+
@@ -0,0 +1,181 @@
+"""Bulk vocabulary import: word lists into one or many users' decks."""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db
+from .models import User, Vocabulary
+from .utils import normalize_word
+
+FORMATS = ('csv', 'jsonl', 'json')
+FORMAT_ALIASES = {
+    'text/csv': 'csv',
+    'application/json': 'json',
+    'application/jsonl': 'jsonl',
+    'application/x-ndjson': 'jsonl',
+    'ndjson': 'jsonl',
+}
+# Vocabulary.word and Vocabulary.translation column size
+MAX_LENGTH = 150
+
+
+class InvalidImport(ValueError):
+    """The upload cannot be read in the requested format."""
+
+
+class ImportResult(NamedTuple):
+    inserted: int
+    duplicates: int
+    invalid: int
+    users: int
+
+
+def import_format(name: Optional[str]) -> Optional[str]:
+    """The import format for a format name, MIME type or file name, if known."""
+    if not name:
+        return None
+    name = name.lower()
+    if name not in FORMATS and name not in FORMAT_ALIASES:
+        name = os.path.splitext(name)[1].lstrip('.')
+    name = FORMAT_ALIASES.get(name, name)
+    return name if name in FORMATS else None
+
+
+def _pair(row) -> Optional[Tuple[str, str]]:
+    if isinstance(row, dict):
+        word, translation = row.get('word'), row.get('translation')
+    elif isinstance(row, (list, tuple)) and len(row) >= 2:
+        word, translation = row[0], row[1]
+    else:
+        return None
+    if not isinstance(word, str) or not isinstance(translation, str):
+        return None
+    word, translation = word.strip(), translation.strip()
+    if not normalize_word(word) or not translation or len(word) > MAX_LENGTH or len(translation) > MAX_LENGTH:
+        return None
+    return word, translation
+
+
+def _csv_rows(stream: IO[str]) -> Iterator:
+    for n, row in enumerate(csv.reader(stream)):
+        if n == 0 and [cell.strip().lower() for cell in row[:2]] == ['word', 'translation']:
+            continue
+        if row:
+            yield row
+
+
+def _json_rows(stream: IO[str]) -> Iterator:
+    data = json.load(stream)
+    rows = data.get('words') if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise InvalidImport('Expected a list of words or {"words": [...]}')
+    return iter(rows)
+
+
+def read_rows(stream: IO[bytes], fmt: str) -> Iterator[Optional[Tuple[str, str]]]:
+    """``(word, translation)`` per row of a UTF-8 upload, None for unusable rows.
+
+    ``csv`` is ``word,translation`` rows with an optional header; ``jsonl`` is
+    one ``{"word", "translation"}`` object or pair per line; ``json`` is a
+    list of those, or ``{"words": [...]}``, and is parsed whole.
+    Raises InvalidImport for an unknown format or a malformed file.
+    """
+    if fmt not in FORMATS:
+        raise InvalidImport(f'Unknown format {fmt!r}; expected one of {", ".join(FORMATS)}')
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            rows = _csv_rows(text)
+        elif fmt == 'jsonl':
+            rows = (json.loads(line) for line in text if line.strip())
+        else:
+            rows = _json_rows(text)
+        for row in rows:
+            yield _pair(row)
+    except (UnicodeDecodeError, csv.Error, json.JSONDecodeError) as e:
+        raise InvalidImport(str(e)) from e
+    finally:
+        # The caller owns the underlying stream
+        text.detach()
+
+
+def find_users(user_ids: Iterable[int] = (), usernames: Iterable[str] = ()) -> Tuple[List[int], List[str]]:
+    """Ids of the named users, and the ids or usernames that do not exist."""
+    user_ids, usernames = set(user_ids), set(usernames)
+    users = User.query.filter(db.or_(User.id.in_(user_ids), User.username.in_(usernames))).all()
+    missing = sorted(str(user_id) for user_id in user_ids - {user.id for user in users})
+    missing += sorted(usernames - {user.username for user in users})
+    return sorted({user.id for user in users}), missing
+
+
+def _insert_batch(pairs: List[Tuple[str, str]], user_ids: List[int]) -> int:
+    now = datetime.utcnow()
+    table = Vocabulary.__table__
+    rows = [
+        {
+            'word': word,
+            'normalized_word': normalize_word(word),
+            'translation': translation,
+            'user_id': user_id,
+            'next_review': now,
+            'interval': 0,
+            'ease_factor': 2.5,
+            'learning_stage': 0,
+            'updated_at': now,
+        }
+        for user_id in user_ids
+        for word, translation in pairs
+    ]
+    stmt = sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.normalized_word])
+    try:
+        # executemany of one compiled statement; rowcount sums the rows inserted
+        inserted = db.session.execute(stmt, rows).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return inserted
+
+
+def import_vocabulary(rows: Iterable[Optional[Tuple[str, str]]], user_ids: List[int]) -> ImportResult:
+    """Add every ``(word, translation)`` in ``rows`` to each of ``user_ids``' decks.
+
+    Rows are written ``VOCAB_IMPORT_BATCH_SIZE`` (words x users) per
+    transaction through ``INSERT ... ON CONFLICT DO NOTHING``, so duplicates
+    are dropped by the ``(user_id, normalized_word)`` constraint rather than a
+    SELECT per word. Batches already committed stay if a later row fails.
+
+    None rows are counted as invalid; words already in a deck are counted as
+    duplicates and left untouched.
+    """
+    if not user_ids:
+        raise ValueError('No users to import into')
+    words_per_batch = max(1, current_app.config['VOCAB_IMPORT_BATCH_SIZE'] // len(user_ids))
+    inserted = valid = invalid = 0
+    pending = []
+    for pair in rows:
+        if pair is None:
+            invalid += 1
+            continue
+        pending.append(pair)
+        valid += 1
+        if len(pending) >= words_per_batch:
+            inserted += _insert_batch(pending, user_ids)
+            pending = []
+    if pending:
+        inserted += _insert_batch(pending, user_ids)
+    return ImportResult(inserted, valid * len(user_ids) - inserted, invalid, len(user_ids))
+
+
+# --- normalized_word ---------------------------------------------------------
+
+@event.listens_for(Vocabulary.word, 'set')
+def _word_set(target, value, oldvalue, initiator):
+    target.normalized_word = normalize_word(value)
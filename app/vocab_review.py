@@ -0,0 +1,226 @@
+"""Vocabulary review: the due queue, card building, grading and scheduling.
+
+Shared by the one-card-per-page ``vocab.review`` view and the batched JSON
+API (``/vocabulary/review/batch``), which hands out several due cards with
+their options and scrambles already worked out, and grades a list of answers
+in one transaction. Offline review logs uploaded through ``/vocabulary/sync``
+are replayed through the same ``grade_answers``.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from . import db
+from .models import Vocabulary
+from .utils import normalize_text
+
+DISTRACTOR_COUNT = 3
+# Random probes tried before falling back to the first unused values
+MAX_DISTRACTOR_PROBES = 8
+
+# Card kinds, by what the student has to do
+CHOOSE_WORD = 'choose_word'
+CHOOSE_TRANSLATION = 'choose_translation'
+UNSCRAMBLE = 'unscramble'
+TYPE_WORD = 'type_word'
+TYPE_TRANSLATION = 'type_translation'
+
+
+def due_words(user_id: int, now: datetime):
+    return Vocabulary.query.filter(
+        Vocabulary.user_id == user_id,
+        Vocabulary.next_review <= now
+    ).order_by(Vocabulary.next_review, Vocabulary.id)
+
+
+def next_due_word(user_id: int, now: datetime) -> Optional[Vocabulary]:
+    """The most overdue word, read off the (user_id, next_review) index."""
+    return due_words(user_id, now).first()
+
+
+def due_count(user_id: int, now: datetime) -> int:
+    return db.session.scalar(
+        db.select(db.func.count()).select_from(Vocabulary).filter(
+            Vocabulary.user_id == user_id,
+            Vocabulary.next_review <= now
+        )
+    )
+
+
+def sample_distractors(user_id: int, correct_answer: str, field: str = 'word', count: int = DISTRACTOR_COUNT) -> List[str]:
+    """Up to ``count`` distinct wrong answers, sampled without loading the vocabulary.
+
+    Each probe picks a random id between the user's lowest and highest and
+    takes the first of their words at or after it, so every lookup is a
+    seek on the (user_id, id) index however large the vocabulary is.
+    """
+    if field not in ('word', 'translation'):
+        return []
+    column = getattr(Vocabulary, field)
+    owned = Vocabulary.user_id == user_id
+    low, high = db.session.execute(db.select(
+        db.select(db.func.min(Vocabulary.id)).filter(owned).scalar_subquery(),
+        db.select(db.func.max(Vocabulary.id)).filter(owned).scalar_subquery(),
+    )).one()
+    if low is None:
+        return []
+
+    picked = []
+    for _ in range(MAX_DISTRACTOR_PROBES):
+        if len(picked) >= count:
+            break
+        value = db.session.scalar(
+            db.select(column)
+            .filter(owned, Vocabulary.id >= random.randint(low, high), column != correct_answer)
+            .order_by(Vocabulary.id)
+            .limit(1)
+        )
+        if value is not None and value not in picked:
+            picked.append(value)
+    if len(picked) < count:
+        # Small vocabularies: probes keep landing on the same rows
+        picked.extend(db.session.scalars(
+            db.select(column)
+            .filter(owned, column.notin_([correct_answer] + picked))
+            .distinct()
+            .limit(count - len(picked))
+        ))
+    return picked
+
+
+def get_options(user_id: int, correct_answer: str, field: str = 'word') -> List[str]:
+    options = [correct_answer] + sample_distractors(user_id, correct_answer, field)
+    random.shuffle(options)
+    return options
+
+
+def scramble(word: str) -> str:
+    return ''.join(random.sample(word, len(word)))
+
+
+def card_kind(review_stage: int) -> str:
+    if review_stage == 0:
+        return CHOOSE_WORD
+    if review_stage == 1:
+        return CHOOSE_TRANSLATION
+    if review_stage == 2:
+        return UNSCRAMBLE
+    return TYPE_WORD if review_stage % 2 == 0 else TYPE_TRANSLATION
+
+
+def build_card(word: Vocabulary) -> Dict[str, object]:
+    """Everything a client needs to show ``word`` without another request."""
+    kind = card_kind(word.learning_stage)
+    asks_for_word = kind in (CHOOSE_WORD, UNSCRAMBLE, TYPE_WORD)
+    card = {
+        'id': word.id,
+        'stage': word.learning_stage,
+        'kind': kind,
+        'question': word.translation if asks_for_word else word.word,
+    }
+    if kind == CHOOSE_WORD:
+        card['options'] = get_options(word.user_id, word.word, 'word')
+    elif kind == CHOOSE_TRANSLATION:
+        card['options'] = get_options(word.user_id, word.translation, 'translation')
+    elif kind == UNSCRAMBLE:
+        card['scrambled'] = scramble(word.word)
+    return card
+
+
+def correct_answer_for(word: Vocabulary) -> str:
+    if card_kind(word.learning_stage) in (CHOOSE_WORD, UNSCRAMBLE, TYPE_WORD):
+        return word.word.strip()
+    return word.translation.strip()
+
+
+def get_next_interval(learning_stage, ease_factor):
+    # Learning stage: 1-minute interval
+    if learning_stage < 3:
+        return 1 / 60  # 1 minute in days format
+    # Long-term review: starts at 1 day, increases by ease_factor
+    else:
+        return 1 * (ease_factor ** (learning_stage - 3))
+
+
+def grade(word: Vocabulary, user_answer: str, now: Optional[datetime] = None) -> Tuple[bool, str]:
+    """Check ``user_answer`` and reschedule ``word`` as of ``now``; the caller commits."""
+    now = now or datetime.utcnow()
+    word.last_reviewed_at = now
+    correct_answer = correct_answer_for(word)
+    correct = normalize_text(user_answer.strip()) == normalize_text(correct_answer)
+    if correct:
+        # Correct answer: increase the learning stage
+        word.learning_stage += 1
+        word.ease_factor = max(1.3, word.ease_factor - 0.2)
+        word.interval = get_next_interval(word.learning_stage, word.ease_factor)
+        word.next_review = now + timedelta(
+            minutes=word.interval if word.learning_stage < 3 else word.interval * 24 * 60)
+    else:
+        # Incorrect answer: reset learning stage to 0 and ease factor to default
+        word.learning_stage = 0
+        word.ease_factor = 2.5
+        word.interval = get_next_interval(word.learning_stage, word.ease_factor)
+        word.next_review = now + timedelta(minutes=1)
+    return correct, correct_answer
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Naive UTC datetime from an ISO timestamp, like the stored columns."""
+    if not isinstance(value, str):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def grade_answers(user_id: int, answers: List[Dict], now: Optional[datetime] = None) -> List[Dict[str, object]]:
+    """Grade ``[{"id", "answer", "stage"?, "reviewed_at"?}, ...]`` in order; the caller commits.
+
+    ``stage`` is the learning stage of the card the answer was given to; if
+    the word has moved on since, the answer is skipped as stale. Answers
+    carrying ``reviewed_at`` (an ISO timestamp from an offline review log) are
+    replayed as of that time, and skipped when the word has already been
+    reviewed at or after it, so re-uploading a log changes nothing. Live
+    answers (no ``reviewed_at``) are skipped unless the word is due, and only
+    the first answer per word in a batch counts.
+    Raises ValueError for an unparseable ``reviewed_at``.
+    """
+    now = now or datetime.utcnow()
+    reviewed_at = [
+        min(parse_timestamp(item['reviewed_at']), now) if item.get('reviewed_at') else None
+        for item in answers
+    ]
+    words = {
+        word.id: word
+        for word in Vocabulary.query.filter(
+            Vocabulary.user_id == user_id,
+            Vocabulary.id.in_({item['id'] for item in answers}),
+        )
+    }
+    results = []
+    answered = set()
+    for item, at in zip(answers, reviewed_at):
+        word = words.get(item['id'])
+        if word is None:
+            results.append({'id': item['id'], 'error': 'not_found'})
+            continue
+        if at is None:
+            if word.id in answered:
+                results.append({'id': word.id, 'skipped': 'duplicate'})
+                continue
+            answered.add(word.id)
+            stale = word.next_review > now
+        else:
+            stale = word.last_reviewed_at is not None and at <= word.last_reviewed_at
+        if stale or item.get('stage', word.learning_stage) != word.learning_stage:
+            results.append({'id': word.id, 'skipped': 'stale'})
+            continue
+        correct, correct_answer = grade(word, str(item.get('answer') or ''), at or now)
+        results.append({
+            'id': word.id,
+            'correct': correct,
+            'correct_answer': correct_answer,
+            'next_review': word.next_review.isoformat(),
+        })
+    return results
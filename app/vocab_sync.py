@@ -0,0 +1,122 @@
+"""Delta sync of a student's vocabulary for offline review (``/vocabulary/sync``)."""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import event, tuple_
+
+from . import db
+from .models import Vocabulary, VocabularyTombstone
+from .pagination import NEXT, InvalidCursor, decode_cursor, encode_cursor
+
+
+def word_json(word: Vocabulary) -> Dict[str, object]:
+    return {
+        'id': word.id,
+        'word': word.word,
+        'translation': word.translation,
+        'next_review': word.next_review.isoformat(),
+        'interval': word.interval,
+        'ease_factor': word.ease_factor,
+        'learning_stage': word.learning_stage,
+        'updated_at': word.updated_at.isoformat(),
+    }
+
+
+def decode_token(token: Optional[str]):
+    """``(updated_at, id, started)`` from a sync token, or None; raises InvalidCursor.
+
+    ``started`` is when the full sync being paged through began, None for
+    incremental tokens.
+    """
+    if not token:
+        return None
+    key, direction = decode_cursor(token)
+    try:
+        updated_at, word_id, started = key
+        return (
+            datetime.fromisoformat(updated_at),
+            int(word_id),
+            datetime.fromisoformat(started) if started else None,
+        )
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def encode_token(updated_at: datetime, word_id: int, started: Optional[datetime] = None) -> str:
+    return encode_cursor([updated_at.isoformat(), word_id, started.isoformat() if started else None], NEXT)
+
+
+def vocabulary_delta(user_id: int, token: Optional[str], now: Optional[datetime] = None) -> Dict[str, object]:
+    """Words changed and ids deleted since ``token``, one page at a time.
+
+    Changes are read off the ``(user_id, updated_at)`` index and deletions
+    from ``vocabulary_tombstone``. A reply with ``more`` set is followed by a
+    request with its token. Without a token, or with one older than
+    ``SYNC_TOMBSTONE_TTL``, the reply is ``full``: the client replaces its deck
+    with this and the following pages.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    window = timedelta(seconds=config['SYNC_SAFETY_WINDOW'])
+    since = decode_token(token)
+    if since is not None and since[2] is None and since[0] < now - timedelta(seconds=config['SYNC_TOMBSTONE_TTL']):
+        # Deletions that old may have been pruned: start over
+        since = None
+    started = now - window if since is None else since[2]
+    full = started is not None
+    limit = config['SYNC_PAGE_SIZE']
+
+    query = Vocabulary.query.filter(Vocabulary.user_id == user_id)
+    if since is not None:
+        query = query.filter(tuple_(Vocabulary.updated_at, Vocabulary.id) > tuple_(since[0], since[1]))
+    words = query.order_by(Vocabulary.updated_at, Vocabulary.id).limit(limit + 1).all()
+    more = len(words) > limit
+    words = words[:limit]
+
+    deleted = []
+    if not full:
+        deleted = db.session.scalars(
+            db.select(VocabularyTombstone.vocabulary_id).filter(
+                VocabularyTombstone.user_id == user_id,
+                VocabularyTombstone.deleted_at > since[0],
+            ).order_by(VocabularyTombstone.deleted_at)
+        ).all()
+
+    if more:
+        next_token = encode_token(words[-1].updated_at, words[-1].id, started)
+    elif full:
+        # Caught up with a full download: continue from when it began, so
+        # words deleted (or changed) after their page was sent come next
+        next_token = encode_token(started, 0)
+    else:
+        # Caught up: continue from shortly before now, never from the last row,
+        # so a write whose transaction was still open is sent next time
+        next_token = encode_token(now - window, 0)
+    return {
+        'words': [word_json(word) for word in words],
+        'deleted': deleted,
+        'token': next_token,
+        'more': more,
+        'full': full,
+    }
+
+
+def prune_tombstones(now: Optional[datetime] = None) -> int:
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=current_app.config['SYNC_TOMBSTONE_TTL'])
+    deleted = db.session.execute(
+        db.delete(VocabularyTombstone).where(VocabularyTombstone.deleted_at < cutoff)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+# --- Tombstones --------------------------------------------------------------
+
+@event.listens_for(Vocabulary, 'after_delete')
+def _vocabulary_deleted(mapper, connection, target):
+    connection.execute(VocabularyTombstone.__table__.insert().values(
+        user_id=target.user_id,
+        vocabulary_id=target.id,
+        deleted_at=datetime.utcnow(),
+    ))
@@ -0,0 +1,110 @@
+"""Benchmark: /tts through the on-disk audio cache vs. straight to the upstream.
+
+Replaces the TTS upstream with a local stub that sleeps ``--latency`` seconds
+and returns a ``--clip-bytes`` clip, then replays ``--requests`` lookups of
+words drawn with a Zipf-like distribution (as learners click them) against
+the app with and without the cache. Run from the repository root::
+
+    python -m benchmarks.bench_audio_cache [--requests 1000] [--words 5000] [--latency 0.02]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import create_app  # noqa: E402
+
+
+def make_words(rng, size):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = sorted({''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)})
+    rng.shuffle(words)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    return words, cum_weights
+
+
+def stub_upstream(latency, clip_bytes, calls):
+    def fetch(text, lang):
+        calls.append(text)
+        time.sleep(latency)
+        return b'\xff\xfb' + bytes(clip_bytes - 2)
+
+    return fetch
+
+
+def run(label, config, lookups):
+    app = create_app(config)
+    client = app.test_client()
+    timings = []
+    for word in lookups:
+        started = time.perf_counter()
+        response = client.get('/tts', query_string={'text': word, 'lang': 'en'})
+        # Misses stream, so the clip is only complete (and cached) once read
+        response.get_data()
+        response.close()
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95)]
+    print(
+        f'{label:<10} total {sum(timings):7.2f} s   p50 {statistics.median(timings) * 1000:7.2f} ms'
+        f'   p95 {p95 * 1000:7.2f} ms'
+    )
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--clip-bytes', type=int, default=8 * 1024)
+    parser.add_argument('--max-bytes', type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    words, cum_weights = make_words(rng, args.words)
+    lookups = rng.choices(words, cum_weights=cum_weights, k=args.requests)
+    print(f'{args.requests} lookups over {len(set(lookups))} distinct words')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/bench.db',
+            'INSTANCE_PATH': tmp,
+            'TESTING': True,
+        }
+        uncached_calls = []
+        run('upstream', dict(
+            base,
+            AUDIO_CACHE_MAX_BYTES=0,
+            TTS_UPSTREAM=stub_upstream(args.latency, args.clip_bytes, uncached_calls),
+        ), lookups)
+
+        cached_calls = []
+        app = run('cached', dict(
+            base,
+            AUDIO_CACHE_DIR=f'{tmp}/audio',
+            AUDIO_CACHE_MAX_BYTES=args.max_bytes,
+            TTS_UPSTREAM=stub_upstream(args.latency, args.clip_bytes, cached_calls),
+        ), lookups)
+        stats = app.extensions['audio_cache'].stats()
+        hit_rate = stats['hits'] / max(1, stats['hits'] + stats['misses'])
+        print(
+            f'upstream calls {len(uncached_calls)} -> {len(cached_calls)}   hit rate {hit_rate:.1%}'
+            f'   evictions {stats["evictions"]}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark: multiple-choice distractors by index probes vs. loading the vocabulary.
+
+Seeds ``--words`` vocabulary rows for one student, interleaved with the
+same number for other users as real ids are, and times the old
+``get_options`` approach (load every row, ``random.sample``) against
+``sample_distractors``. Run from the repository root::
+
+    python -m benchmarks.bench_distractors [--words 20000] [--repeat 200]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Vocabulary  # noqa: E402
+from app.vocab_review import sample_distractors  # noqa: E402
+
+OTHER_USERS = 3
+
+
+def seed(words):
+    db.session.execute(User.__table__.insert(), [
+        {'id': n, 'username': f'user{n}', 'password': 'x', 'is_admin': False} for n in range(1, OTHER_USERS + 2)
+    ])
+    now = datetime.utcnow()
+    rows = []
+    for n in range(words * (OTHER_USERS + 1)):
+        rows.append({
+            'word': f'word{n}',
+            'normalized_word': f'word{n}',
+            'translation': f'slovo{n}',
+            'user_id': n % (OTHER_USERS + 1) + 1,
+            'next_review': now,
+            'interval': 0,
+            'ease_factor': 2.5,
+            'learning_stage': 0,
+        })
+        if len(rows) == 5000:
+            db.session.execute(Vocabulary.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Vocabulary.__table__.insert(), rows)
+    db.session.commit()
+
+
+def legacy_distractors(user_id, correct_answer):
+    vocab_words = Vocabulary.query.filter(Vocabulary.user_id == user_id).all()
+    all_options = list({word.word for word in vocab_words if word.word != correct_answer})
+    options = random.sample(all_options, 3)
+    db.session.expunge_all()
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/bench.db',
+            'INSTANCE_PATH': tmp,
+            'TESTING': True,
+        })
+        with app.app_context():
+            db.create_all()
+            seed(args.words)
+            print(f'{args.words} words for the student, {args.words * OTHER_USERS} for other users')
+            for name, run, number in (
+                ('load all + sample', lambda: legacy_distractors(1, 'word0'), max(1, args.repeat // 20)),
+                ('index probes', lambda: sample_distractors(1, 'word0'), args.repeat),
+            ):
+                seconds = min(timeit.Timer(run).repeat(repeat=3, number=number)) / number
+                print(f'{name:<20}{seconds * 1000:9.3f} ms per card')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
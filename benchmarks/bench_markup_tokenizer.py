@@ -0,0 +1,83 @@
+"""Micro-benchmark: single-pass tokenizer vs. the legacy two-pass regex path.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_markup_tokenizer [--lines 10000] [--repeat 5]
+"""
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.markup_tokenizer import tokenize  # noqa: E402
+
+LEGACY_DROPDOWN_PATTERN = r'#\s*\[([^\]]+)\]\s*([^\#]+)\s*#'
+LEGACY_INPUT_PATTERN = r'\[([^\]]+)\]'
+
+
+def legacy_parse(content):
+    """The per-line ``re.sub`` passes previously run inside take_test/learn_test."""
+    found = []
+
+    def dropdown_repl(match):
+        found.append(('dropdown', match.group(2).strip()))
+        return ''
+
+    def input_repl(match):
+        found.append(('input', match.group(1).strip()))
+        return ''
+
+    for line in content.splitlines():
+        line = re.sub(LEGACY_DROPDOWN_PATTERN, dropdown_repl, line)
+        re.sub(LEGACY_INPUT_PATTERN, input_repl, line)
+    return found
+
+
+def tokenizer_parse(content):
+    return list(tokenize(content))
+
+
+def realistic_content(lines):
+    template = (
+        '<p>{n}. Yesterday she [went] to the #[shop, shops, shopping] shop# '
+        'and [bought] some bread before it #[start, started] started# to rain.</p>'
+    )
+    return '\n'.join(template.format(n=n) for n in range(lines))
+
+
+def adversarial_content(lines, width):
+    # Every "#[" opens a dropdown that never closes: the legacy regex rescans
+    # to the end of the line from each one.
+    return '\n'.join('#[' * width for _ in range(lines))
+
+
+def bench(label, content, repeat):
+    results = {}
+    for name, parse in (('regex', legacy_parse), ('tokenizer', tokenizer_parse)):
+        timer = timeit.Timer(lambda: parse(content))
+        results[name] = min(timer.repeat(repeat=repeat, number=1))
+    ratio = results['regex'] / results['tokenizer'] if results['tokenizer'] else float('inf')
+    print(
+        f"{label:<34} regex {results['regex'] * 1000:9.2f} ms   "
+        f"tokenizer {results['tokenizer'] * 1000:9.2f} ms   ratio {ratio:6.2f}x"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    bench(f'realistic, {args.lines} lines', realistic_content(args.lines), args.repeat)
+    for width in (500, 2000):
+        bench(f'adversarial, 20 lines x {width} "#["', adversarial_content(20, width), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark: FTS5 search vs. the legacy ``ilike('%q%')`` scans.
+
+Builds a throwaway SQLite database with ``--tests`` tests spread over books,
+indexes it with ``rebuild_search_index`` and times both paths for a few
+queries. Run from the repository root::
+
+    python -m benchmarks.bench_search_index [--tests 100000] [--repeat 5]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import create_app, db  # noqa: E402
+from app.markup_compiler import compile_test_content  # noqa: E402
+from app.models import Book, Test, User  # noqa: E402
+from app.search_index import rebuild_search_index, search_tests  # noqa: E402
+
+def make_vocabulary(rng, size=30000):
+    """Synthetic words drawn with a Zipf-like distribution, like real text."""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = sorted({''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)})
+    rng.shuffle(words)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    return words, cum_weights
+
+
+def seed(count, books=200):
+    rng = random.Random(42)
+    words, cum_weights = make_vocabulary(rng)
+
+    def sample(k):
+        return rng.choices(words, cum_weights=cum_weights, k=k)
+
+    db.session.execute(User.__table__.insert(), [{'id': 1, 'username': 'bench', 'password': 'x', 'is_admin': True}])
+    db.session.execute(Book.__table__.insert(), [{'id': n, 'title': ' '.join(sample(3))} for n in range(1, books + 1)])
+    rows = []
+    for n in range(1, count + 1):
+        text = sample(40)
+        text[rng.randrange(40)] = f'[{text[0]}]'
+        content = ' '.join(text)
+        rows.append({
+            'id': n,
+            'name': f'Unit {n} ' + ' '.join(sample(2)),
+            'content': content,
+            'compiled_content': compile_test_content(content),
+            'book_id': rng.randint(1, books),
+            'created_by': 1,
+        })
+        if len(rows) == 5000:
+            db.session.execute(Test.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Test.__table__.insert(), rows)
+    db.session.commit()
+    # Queries from very common to absent
+    return [words[0], words[50], words[2000], words[20000][:4], f'{words[10]} {words[300]}', 'zzzzq']
+
+
+def ilike_search(query):
+    return db.session.scalars(
+        db.select(Test.id).filter(db.or_(Test.name.ilike(f'%{query}%'), Test.content.ilike(f'%{query}%'))).limit(50)
+    ).all()
+
+
+def ilike_name_search(query):
+    return db.session.scalars(db.select(Test.id).filter(Test.name.ilike(f'%{query}%'))).all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tests', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/bench.db',
+            'INSTANCE_PATH': tmp,
+            'TESTING': True,
+        })
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            queries = seed(args.tests)
+            seeded = time.perf_counter()
+            rebuild_search_index()
+            indexed = time.perf_counter()
+            print(f'seeded {args.tests} tests in {seeded - started:.1f} s, indexed in {indexed - seeded:.1f} s')
+
+            for query in queries:
+                timings = {}
+                for name, run in (
+                    ('ilike name', lambda: ilike_name_search(query)),
+                    ('ilike name+content', lambda: ilike_search(query)),
+                    ('fts5', lambda: search_tests(query)),
+                ):
+                    timings[name] = min(timeit.Timer(run).repeat(repeat=args.repeat, number=1))
+                print(f'{query!r:<24}' + '   '.join(f'{name} {seconds * 1000:8.2f} ms' for name, seconds in timings.items()))
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
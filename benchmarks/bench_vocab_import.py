@@ -0,0 +1,92 @@
+"""Benchmark: bulk vocabulary import vs. one add_to_vocabulary call per word.
+
+Imports a ``--words`` list into one student's deck the old way (duplicate
+SELECT, INSERT and commit per word, as ``vocab.add_to_vocabulary`` does) and
+with ``import_vocabulary``, then imports it into a class of ``--users``
+students at once. Run from the repository root::
+
+    python -m benchmarks.bench_vocab_import [--words 2000] [--users 30]
+"""
+import argparse
+import io
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, Vocabulary  # noqa: E402
+from app.utils import normalize_word  # noqa: E402
+from app.vocab_import import import_vocabulary, read_rows  # noqa: E402
+
+
+def word_list(words):
+    return ''.join(f'word{n},slovo{n}\n' for n in range(words)).encode()
+
+
+def legacy_import(data, user_id):
+    for line in data.decode().splitlines():
+        word, translation = line.split(',')
+        if Vocabulary.query.filter_by(user_id=user_id, normalized_word=normalize_word(word)).first():
+            continue
+        db.session.add(Vocabulary(
+            word=word,
+            translation=translation,
+            user_id=user_id,
+            next_review=datetime.utcnow(),
+            interval=0,
+            ease_factor=2.5,
+            learning_stage=0,
+        ))
+        db.session.commit()
+
+
+def timed(name, run, rows):
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    print(f'{name:<28}{seconds * 1000:10.1f} ms  {rows / seconds:10.0f} rows/s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--words', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    data = word_list(args.words)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/bench.db',
+            'INSTANCE_PATH': tmp,
+            'TESTING': True,
+        })
+        with app.app_context():
+            db.create_all()
+            db.session.execute(User.__table__.insert(), [
+                {'id': n, 'username': f'user{n}', 'password': 'x', 'is_admin': False}
+                for n in range(1, args.users + 3)
+            ])
+            db.session.commit()
+            class_ids = list(range(3, args.users + 3))
+
+            print(f'{args.words} words')
+            timed('per-word add, 1 user', lambda: legacy_import(data, 1), args.words)
+            timed('bulk import, 1 user', lambda: import_vocabulary(read_rows(io.BytesIO(data), 'csv'), [2]),
+                  args.words)
+            timed(f'bulk import, {args.users} users',
+                  lambda: import_vocabulary(read_rows(io.BytesIO(data), 'csv'), class_ids),
+                  args.words * args.users)
+            timed('bulk re-import (duplicates)',
+                  lambda: import_vocabulary(read_rows(io.BytesIO(data), 'csv'), class_ids),
+                  args.words * args.users)
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
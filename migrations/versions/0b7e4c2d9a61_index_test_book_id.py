@@ -0,0 +1,26 @@
+"""Index test.book_id
+
+Revision ID: 0b7e4c2d9a61
+Revises: f3b8d6a2e914
+Create Date: 2026-10-17 15:08:52.640117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e4c2d9a61'
+down_revision = 'f3b8d6a2e914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_test_book_id'), ['book_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_test_book_id'))
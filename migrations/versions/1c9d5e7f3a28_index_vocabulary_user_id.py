@@ -0,0 +1,26 @@
+"""Index vocabulary.user_id
+
+Revision ID: 1c9d5e7f3a28
+Revises: 0b7e4c2d9a61
+Create Date: 2026-10-17 15:46:13.902775
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c9d5e7f3a28'
+down_revision = '0b7e4c2d9a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_vocabulary_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_vocabulary_user_id'))
@@ -0,0 +1,26 @@
+"""Index vocabulary (user_id, next_review) for the review queue
+
+Revision ID: 3e6a8c0d2f47
+Revises: 2d4f6a8b0c13
+Create Date: 2026-10-17 18:11:07.524390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e6a8c0d2f47'
+down_revision = '2d4f6a8b0c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.create_index('ix_vocabulary_user_next_review', ['user_id', 'next_review'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.drop_index('ix_vocabulary_user_next_review')
@@ -0,0 +1,51 @@
+"""Vocabulary sync: updated_at, last_reviewed_at and tombstones
+
+Revision ID: 4f7b9d1e3a58
+Revises: 3e6a8c0d2f47
+Create Date: 2026-10-17 19:24:52.107631
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7b9d1e3a58'
+down_revision = '3e6a8c0d2f47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('vocabulary_tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('vocabulary_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('vocabulary_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_vocabulary_tombstone_user_deleted_at', ['user_id', 'deleted_at'], unique=False)
+
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_reviewed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing rows count as changed now, so the first delta sync sends them
+    op.execute("UPDATE vocabulary SET updated_at = strftime('%Y-%m-%d %H:%M:%S.000000', 'now')")
+
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_vocabulary_user_updated_at', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.drop_index('ix_vocabulary_user_updated_at')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('last_reviewed_at')
+
+    with op.batch_alter_table('vocabulary_tombstone', schema=None) as batch_op:
+        batch_op.drop_index('ix_vocabulary_tombstone_user_deleted_at')
+
+    op.drop_table('vocabulary_tombstone')
@@ -0,0 +1,128 @@
+"""Vocabulary normalized_word, unique per user
+
+Rows of one user that normalize to the same word are merged before the
+unique constraint is created: the survivor keeps the most advanced schedule,
+the latest updated_at and last_reviewed_at, and the distinct translations
+joined with "; " (its own translation alone when they do not fit). The other
+rows are deleted and tombstoned so sync clients drop them; every merge is
+logged.
+
+The downgrade is lossy: it drops the column and constraint, but the merged
+duplicates are not restored.
+
+Revision ID: 5a8c0e2f4b69
+Revises: 4f7b9d1e3a58
+Create Date: 2026-10-17 21:08:13.552904
+
+"""
+import logging
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8c0e2f4b69'
+down_revision = '4f7b9d1e3a58'
+branch_labels = None
+depends_on = None
+
+log = logging.getLogger('alembic.runtime.migration')
+
+# Frozen copy of app.utils.normalize_word
+_PUNCTUATION = '.,;:!?"()[]{}«»“”‘’…'
+# Vocabulary.translation column size
+_MAX_LENGTH = 150
+
+
+def _normalize_word(word):
+    return ' '.join((word or '').split()).strip(_PUNCTUATION).lower()
+
+
+def _merge(rows):
+    """Values for the surviving row of a group of duplicates."""
+    survivor = max(rows, key=lambda row: (row.learning_stage, row.next_review, -row.id))
+    translations = [survivor.translation]
+    for row in rows:
+        if row.translation not in translations:
+            translations.append(row.translation)
+    translation = '; '.join(translations)
+    if len(translation) > _MAX_LENGTH:
+        log.warning(
+            'vocabulary %s (user %s, %r): translations too long to merge, keeping %r; dropped %r',
+            survivor.id, survivor.user_id, survivor.word, survivor.translation, translations[1:],
+        )
+        translation = survivor.translation
+    reviewed = [row.last_reviewed_at for row in rows if row.last_reviewed_at is not None]
+    return survivor, {
+        'id': survivor.id,
+        'translation': translation,
+        'pronunciation_url': survivor.pronunciation_url or next(
+            (row.pronunciation_url for row in rows if row.pronunciation_url), None),
+        'updated_at': max(row.updated_at for row in rows),
+        'last_reviewed_at': max(reviewed) if reviewed else None,
+    }
+
+
+def upgrade():
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('normalized_word', sa.String(length=150), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        'SELECT id, user_id, word, translation, pronunciation_url, next_review, learning_stage, '
+        'last_reviewed_at, updated_at FROM vocabulary ORDER BY id'
+    )).all()
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.user_id, _normalize_word(row.word)), []).append(row)
+
+    normalized = []
+    merged = []
+    dropped = []
+    for (user_id, word), group in groups.items():
+        survivor = group[0]
+        if len(group) > 1:
+            survivor, values = _merge(group)
+            merged.append(values)
+            dropped.extend(row for row in group if row.id != survivor.id)
+            log.info(
+                'vocabulary: merged duplicate ids %s of user %s into %s (%r)',
+                [row.id for row in group if row.id != survivor.id], user_id, survivor.id, survivor.word,
+            )
+        normalized.append({'id': survivor.id, 'normalized_word': word})
+
+    if dropped:
+        now = datetime.utcnow()
+        connection.execute(
+            sa.text('DELETE FROM vocabulary WHERE id = :id'),
+            [{'id': row.id} for row in dropped],
+        )
+        connection.execute(
+            sa.text('INSERT INTO vocabulary_tombstone (user_id, vocabulary_id, deleted_at) '
+                    'VALUES (:user_id, :vocabulary_id, :deleted_at)'),
+            [{'user_id': row.user_id, 'vocabulary_id': row.id, 'deleted_at': now} for row in dropped],
+        )
+        connection.execute(
+            sa.text('UPDATE vocabulary SET translation = :translation, pronunciation_url = :pronunciation_url, '
+                    'updated_at = :updated_at, last_reviewed_at = :last_reviewed_at WHERE id = :id'),
+            merged,
+        )
+        log.info('vocabulary: merged %d duplicate rows into %d words', len(dropped), len(merged))
+    if normalized:
+        connection.execute(
+            sa.text('UPDATE vocabulary SET normalized_word = :normalized_word WHERE id = :id'),
+            normalized,
+        )
+
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.alter_column('normalized_word', existing_type=sa.String(length=150), nullable=False)
+        batch_op.create_unique_constraint('_user_normalized_word_uc', ['user_id', 'normalized_word'])
+
+
+def downgrade():
+    # Lossy: duplicates merged by upgrade() are not split back out
+    with op.batch_alter_table('vocabulary', schema=None) as batch_op:
+        batch_op.drop_constraint('_user_normalized_word_uc', type_='unique')
+        batch_op.drop_column('normalized_word')
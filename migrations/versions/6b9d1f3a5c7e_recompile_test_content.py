@@ -0,0 +1,170 @@
+"""Recompile test content: dropdowns take priority over inputs again
+
+Revision ID: 6b9d1f3a5c7e
+Revises: 5a8c0e2f4b69
+Create Date: 2026-10-18 10:14:27.390412
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import sqlite
+
+
+# revision identifiers, used by Alembic.
+revision = '6b9d1f3a5c7e'
+down_revision = '5a8c0e2f4b69'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of app.markup_compiler (format 2) and app.utils.normalize_text,
+# so replaying this revision does not depend on later code. The regex passes
+# give the same result as the format 2 tokenizer: dropdowns first, inputs
+# only in the text between them.
+_COMPILED_FORMAT_VERSION = 2
+_MODE_STANDARD = 'standard'
+_MODE_SENTENCES = 'sentences'
+_MODE_PARAGRAPHS = 'paragraphs'
+_DROPDOWN_PATTERN = re.compile(r'#\s*\[([^\]]+)\]\s*([^\#]+)\s*#')
+_INPUT_PATTERN = re.compile(r'\[([^\]]+)\]')
+_SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def _normalize_text(text):
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join([c for c in text if not unicodedata.combining(c)])
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    return ' '.join(text.split())
+
+
+def _content_mode(shuffle_sentences, shuffle_paragraphs):
+    if shuffle_sentences:
+        return _MODE_SENTENCES
+    if shuffle_paragraphs:
+        return _MODE_PARAGRAPHS
+    return _MODE_STANDARD
+
+
+def _question(qid, kind, answer, options=None):
+    answer = answer.strip()
+    question = {'qid': qid, 'kind': kind, 'answer': answer, 'normalized_answer': _normalize_text(answer)}
+    if options is not None:
+        options = [opt.strip() for opt in options.split(',')]
+        question['options'] = options
+        question['normalized_options'] = [_normalize_text(opt) for opt in options]
+    return question
+
+
+def _compile_line(line, questions, counter):
+    # Dropdowns first, then inputs in the text between them; all dropdowns of
+    # a line are numbered before its inputs
+    pieces = []
+    position = 0
+    for match in _DROPDOWN_PATTERN.finditer(line):
+        pieces.append(('text', line[position:match.start()]))
+        qid = f'q{counter}'
+        counter += 1
+        questions.append(_question(qid, 'dropdown', match.group(2), match.group(1)))
+        pieces.append(('question', qid))
+        position = match.end()
+    pieces.append(('text', line[position:]))
+
+    segments = []
+    for kind, value in pieces:
+        if kind == 'question':
+            segments.append({'qid': value})
+            continue
+        position = 0
+        for match in _INPUT_PATTERN.finditer(value):
+            if match.start() > position:
+                segments.append({'text': value[position:match.start()]})
+            qid = f'q{counter}'
+            counter += 1
+            questions.append(_question(qid, 'input', match.group(1)))
+            segments.append({'qid': qid})
+            position = match.end()
+        if position < len(value):
+            segments.append({'text': value[position:]})
+    return segments, counter
+
+
+def _compile_test_content(content, mode):
+    content = content or ''
+    questions = []
+    lines = []
+    counter = 1
+    for line in content.splitlines():
+        segments, counter = _compile_line(line, questions, counter)
+        lines.append(segments)
+    items = []
+    if mode != _MODE_STANDARD:
+        if mode == _MODE_SENTENCES:
+            chunks = []
+            for line in content.splitlines():
+                chunks.extend(_SENTENCE_SPLIT_PATTERN.split(line.strip()))
+        else:
+            chunks = [para for para in content.split('\n\n') if para.strip()]
+        items = [{'id': f'item_{idx + 1}', 'content': chunk.strip()} for idx, chunk in enumerate(chunks)]
+    return {
+        'version': _COMPILED_FORMAT_VERSION,
+        'mode': mode,
+        'questions': questions,
+        'lines': lines,
+        'items': items,
+    }
+
+
+def _is_current(compiled, mode):
+    return (
+        isinstance(compiled, dict)
+        and compiled.get('version') == _COMPILED_FORMAT_VERSION
+        and compiled.get('mode') == mode
+    )
+
+
+def _question_count(compiled):
+    if compiled['mode'] == _MODE_STANDARD:
+        return len(compiled['questions'])
+    return len(compiled['items'])
+
+
+def upgrade():
+    # Rows compiled by the tokenizer that let an earlier "[" shadow a dropdown
+    # have different questions; store them in the current format.
+    test_table = sa.table(
+        'test',
+        sa.column('id', sa.Integer),
+        sa.column('content', sa.Text),
+        sa.column('shuffle_sentences', sa.Boolean),
+        sa.column('shuffle_paragraphs', sa.Boolean),
+        sa.column('compiled_content', sqlite.JSON),
+        sa.column('question_count', sa.Integer),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(
+        test_table.c.id,
+        test_table.c.content,
+        test_table.c.shuffle_sentences,
+        test_table.c.shuffle_paragraphs,
+        test_table.c.compiled_content,
+    )).fetchall()
+    for row in rows:
+        mode = _content_mode(row.shuffle_sentences, row.shuffle_paragraphs)
+        if _is_current(row.compiled_content, mode):
+            continue
+        compiled = _compile_test_content(row.content, mode)
+        bind.execute(
+            test_table.update()
+            .where(test_table.c.id == row.id)
+            .values(compiled_content=compiled, question_count=_question_count(compiled))
+        )
+
+
+def downgrade():
+    # Older code sees the newer version number and recompiles in memory
+    pass
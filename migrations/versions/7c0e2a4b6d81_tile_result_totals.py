@@ -0,0 +1,32 @@
+"""Tile test results: total_questions is the tile count
+
+Revision ID: 7c0e2a4b6d81
+Revises: 6b9d1f3a5c7e
+Create Date: 2026-10-18 11:02:45.817305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c0e2a4b6d81'
+down_revision = '6b9d1f3a5c7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # take_test used to record 0 for drag-and-drop tests while scoring tiles
+    op.execute(
+        'UPDATE test_result SET total_questions = '
+        '(SELECT question_count FROM test WHERE test.id = test_result.test_id) '
+        'WHERE total_questions = 0 AND test_id IN '
+        '(SELECT id FROM test WHERE shuffle_sentences OR shuffle_paragraphs)'
+    )
+
+
+def downgrade():
+    op.execute(
+        'UPDATE test_result SET total_questions = 0 WHERE test_id IN '
+        '(SELECT id FROM test WHERE shuffle_sentences OR shuffle_paragraphs)'
+    )
@@ -0,0 +1,40 @@
+"""Add test_attempt table for server-side test timing
+
+Revision ID: a81d4e0c52f3
+Revises: 3f6c2a1d9b7e
+Create Date: 2026-10-17 10:03:18.551207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81d4e0c52f3'
+down_revision = '3f6c2a1d9b7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('test_attempt',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('test_id', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('deadline', sa.DateTime(), nullable=True),
+    sa.Column('submitted_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.create_index('ix_test_attempt_user_test_status', ['user_id', 'test_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('test_attempt', schema=None) as batch_op:
+        batch_op.drop_index('ix_test_attempt_user_test_status')
+
+    op.drop_table('test_attempt')
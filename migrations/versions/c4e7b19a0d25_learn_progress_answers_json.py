@@ -0,0 +1,69 @@
+"""Store LearnTestProgress answers as JSON instead of pickles
+
+Revision ID: c4e7b19a0d25
+Revises: a81d4e0c52f3
+Create Date: 2026-10-17 10:41:52.918334
+
+"""
+import json
+import pickle
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import sqlite
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7b19a0d25'
+down_revision = 'a81d4e0c52f3'
+branch_labels = None
+depends_on = None
+
+progress_table = sa.table(
+    'learn_test_progress',
+    sa.column('id', sa.Integer),
+    sa.column('answers', sa.LargeBinary),
+)
+
+
+def _load_pickle(raw):
+    try:
+        value = pickle.loads(raw) if raw else {}
+    except Exception:
+        value = {}
+    return value if isinstance(value, dict) else {}
+
+
+def upgrade():
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(progress_table.c.id, progress_table.c.answers)).fetchall()
+    converted = [(row.id, json.dumps(_load_pickle(row.answers))) for row in rows]
+
+    with op.batch_alter_table('learn_test_progress', schema=None) as batch_op:
+        batch_op.alter_column('answers',
+               existing_type=sa.BLOB(),
+               type_=sqlite.JSON(),
+               existing_nullable=False)
+
+    for row_id, answers in converted:
+        bind.execute(
+            sa.text('UPDATE learn_test_progress SET answers = :answers WHERE id = :id'),
+            {'answers': answers, 'id': row_id},
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    rows = bind.execute(sa.text('SELECT id, answers FROM learn_test_progress')).fetchall()
+    converted = [(row.id, pickle.dumps(json.loads(row.answers or '{}'))) for row in rows]
+
+    with op.batch_alter_table('learn_test_progress', schema=None) as batch_op:
+        batch_op.alter_column('answers',
+               existing_type=sqlite.JSON(),
+               type_=sa.BLOB(),
+               existing_nullable=False)
+
+    for row_id, answers in converted:
+        bind.execute(
+            progress_table.update().where(progress_table.c.id == row_id).values(answers=answers)
+        )
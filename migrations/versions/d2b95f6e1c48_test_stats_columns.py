@@ -0,0 +1,41 @@
+"""Add question_count, attempt_count and avg_score to test
+
+Revision ID: d2b95f6e1c48
+Revises: c4e7b19a0d25
+Create Date: 2026-10-17 11:27:05.730159
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b95f6e1c48'
+down_revision = 'c4e7b19a0d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('question_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('attempt_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('avg_score', sa.Float(), nullable=True))
+
+    # Same numbers `flask backfill-test-stats` produces, computed in SQL
+    op.execute("""
+        UPDATE test SET
+            question_count = COALESCE(CASE json_extract(compiled_content, '$.mode')
+                WHEN 'standard' THEN json_array_length(compiled_content, '$.questions')
+                ELSE json_array_length(compiled_content, '$.items')
+            END, 0),
+            attempt_count = (SELECT COUNT(*) FROM test_result WHERE test_result.test_id = test.id),
+            avg_score = (SELECT AVG(score) FROM test_result WHERE test_result.test_id = test.id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('test', schema=None) as batch_op:
+        batch_op.drop_column('avg_score')
+        batch_op.drop_column('attempt_count')
+        batch_op.drop_column('question_count')
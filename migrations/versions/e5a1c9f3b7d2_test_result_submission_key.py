@@ -0,0 +1,28 @@
+"""Add submission_key to test_result
+
+Revision ID: e5a1c9f3b7d2
+Revises: d2b95f6e1c48
+Create Date: 2026-10-17 13:02:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c9f3b7d2'
+down_revision = 'd2b95f6e1c48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_result', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submission_key', sa.String(length=32), nullable=True))
+        batch_op.create_index(batch_op.f('ix_test_result_submission_key'), ['submission_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('test_result', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_test_result_submission_key'))
+        batch_op.drop_column('submission_key')
@@ -0,0 +1,89 @@
+"""Add FTS5 search tables for books and tests
+
+Revision ID: f3b8d6a2e914
+Revises: e5a1c9f3b7d2
+Create Date: 2026-10-17 14:21:09.377046
+
+"""
+import json
+import re
+from html import unescape as unescape_html
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d6a2e914'
+down_revision = 'e5a1c9f3b7d2'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of app.markup_compiler.plain_text, so replaying this revision
+# does not depend on later code
+_DROPDOWN_PATTERN = re.compile(r'#\s*\[([^\]]+)\]\s*([^\#]+)\s*#')
+_INPUT_PATTERN = re.compile(r'\[([^\]]+)\]')
+_SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+')
+_TAG_PATTERN = re.compile(r'<[^<>]*>')
+_GAP = '___'
+
+
+def _plain_text(compiled):
+    if compiled['mode'] != 'standard':
+        lines = [item['content'] for item in compiled['items']]
+    else:
+        lines = [
+            ''.join(segment.get('text', _GAP) for segment in segments)
+            for segments in compiled['lines']
+        ]
+    return unescape_html(_TAG_PATTERN.sub(' ', '\n'.join(lines)))
+
+
+def _blank_gaps(line):
+    # Dropdowns first, then inputs in the text between them, as the compiler does
+    pieces = []
+    position = 0
+    for match in _DROPDOWN_PATTERN.finditer(line):
+        pieces.append(_INPUT_PATTERN.sub(_GAP, line[position:match.start()]))
+        position = match.end()
+    pieces.append(_INPUT_PATTERN.sub(_GAP, line[position:]))
+    return _GAP.join(pieces)
+
+
+def _plain_text_from_content(content, shuffle_sentences, shuffle_paragraphs):
+    """``_plain_text`` for a row saved without compiled content."""
+    content = content or ''
+    if shuffle_sentences:
+        lines = []
+        for line in content.splitlines():
+            lines.extend(chunk.strip() for chunk in _SENTENCE_SPLIT_PATTERN.split(line.strip()))
+    elif shuffle_paragraphs:
+        lines = [para.strip() for para in content.split('\n\n') if para.strip()]
+    else:
+        lines = [_blank_gaps(line) for line in content.splitlines()]
+    return unescape_html(_TAG_PATTERN.sub(' ', '\n'.join(lines)))
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE fts_book USING fts5(title, tokenize='unicode61 remove_diacritics 2')")
+    op.execute("CREATE VIRTUAL TABLE fts_test USING fts5(name, body, tokenize='unicode61 remove_diacritics 2')")
+
+    op.execute("INSERT INTO fts_book (rowid, title) SELECT id, title FROM book")
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT id, name, content, compiled_content, shuffle_sentences, shuffle_paragraphs FROM test"
+    )).fetchall()
+    for row in rows:
+        if row.compiled_content:
+            body = _plain_text(json.loads(row.compiled_content))
+        else:
+            body = _plain_text_from_content(row.content, row.shuffle_sentences, row.shuffle_paragraphs)
+        bind.execute(
+            sa.text("INSERT INTO fts_test (rowid, name, body) VALUES (:id, :name, :body)"),
+            {'id': row.id, 'name': row.name, 'body': body},
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE fts_test")
+    op.execute("DROP TABLE fts_book")
@@ -0,0 +1,195 @@
+import io
+import os
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from app.audio_cache import GOOGLE_TTS_URL, AudioCache, AudioStream
+
+
+def _stub_upstream(calls):
+    def fetch(text, lang):
+        calls.append((text, lang))
+        return f'{lang}:{text}'.encode('utf-8')
+
+    return fetch
+
+
+def test_tts_served_from_disk_after_first_request(app_factory, tmp_path):
+    calls = []
+    app = app_factory(AUDIO_CACHE_DIR=str(tmp_path / 'audio'), TTS_UPSTREAM=_stub_upstream(calls))
+    client = app.test_client()
+
+    first = client.get('/tts?text=Hello%20%20World&lang=en')
+    assert first.status_code == 200
+    assert first.mimetype == 'audio/mpeg'
+    assert first.data == b'en:hello world'
+    assert 'immutable' in first.headers['Cache-Control']
+    etag = first.headers['ETag']
+
+    # Case and spacing normalize to the same clip
+    second = client.get('/tts?text=hello%20world&lang=en')
+    assert second.data == b'en:hello world'
+    assert second.headers['ETag'] == etag
+    assert calls == [('hello world', 'en')]
+
+    revalidated = client.get('/tts?text=hello%20world&lang=en', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+    client.get('/tts?text=hello%20world&lang=uk')
+    assert calls == [('hello world', 'en'), ('hello world', 'uk')]
+    assert app.extensions['audio_cache'].stats()['hits'] == 2
+
+
+def test_tts_upstream_failure_is_not_cached(app_factory, tmp_path):
+    def failing(text, lang):
+        raise requests.ConnectionError('offline')
+
+    app = app_factory(AUDIO_CACHE_DIR=str(tmp_path / 'audio'), TTS_UPSTREAM=failing)
+    client = app.test_client()
+
+    assert client.get('/tts?text=word').status_code == 502
+    assert client.get('/tts').status_code == 400
+    cache = app.extensions['audio_cache']
+    assert cache.get(cache.key('en', 'word')) is None
+
+
+def test_eviction_drops_least_recently_used_clips(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=100)
+    keys = [cache.key('en', word) for word in ('one', 'two', 'three', 'four')]
+    for age, key in enumerate(keys[:3]):
+        path = cache.put(key, b'x' * 30)
+        os.utime(path, (1000 + age, 1000 + age))
+
+    # Reading "one" makes "two" the least recently used clip
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[3], b'x' * 30)
+
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], keys[3]))
+    assert cache.stats()['evictions'] == 1
+
+
+def test_writes_under_the_cap_do_not_rescan_the_cache(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path), max_bytes=100)
+    scans = []
+    clips = cache._clips
+    monkeypatch.setattr(cache, '_clips', lambda: scans.append(1) or clips())
+
+    for word in ('one', 'two', 'three'):
+        cache.put(cache.key('en', word), b'x' * 30)
+    # Only the first write scans, to learn what is already on disk
+    assert len(scans) == 1
+    assert cache.stats()['current_bytes'] == 90
+
+    cache.put(cache.key('en', 'four'), b'x' * 30)
+    assert len(scans) == 2
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['current_bytes'] == 90
+
+
+def _streaming_upstream(calls, closed, length=None):
+    def fetch(text, lang, range_header=None):
+        calls.append(range_header)
+        chunks = [b'ID3', b'-', text.encode('utf-8')]
+        body_length = sum(len(chunk) for chunk in chunks)
+        if range_header:
+            return AudioStream(206, {'Content-Range': f'bytes 3-{body_length - 1}/{body_length}'}, chunks[1:], lambda: closed.append(True))
+        headers = {'Content-Length': str(length or body_length)}
+        return AudioStream(200, headers, iter(chunks), lambda: closed.append(True))
+
+    return fetch
+
+
+def test_tts_streams_misses_into_cache(app_factory, tmp_path):
+    calls, closed = [], []
+    app = app_factory(AUDIO_CACHE_DIR=str(tmp_path / 'audio'), TTS_UPSTREAM=_streaming_upstream(calls, closed))
+    client = app.test_client()
+
+    # Browsers open media with "bytes=0-"; that is fetched whole and cached
+    first = client.get('/tts?text=cat', headers={'Range': 'bytes=0-'})
+    assert first.status_code == 200
+    assert first.headers['Content-Length'] == '7'
+    assert first.data == b'ID3-cat'
+    assert calls == [None]
+    first.close()
+    assert closed == [True]
+
+    second = client.get('/tts?text=cat')
+    assert second.data == b'ID3-cat'
+    assert calls == [None]
+
+
+def test_tts_forwards_partial_ranges_without_caching(app_factory, tmp_path):
+    calls, closed = [], []
+    app = app_factory(AUDIO_CACHE_DIR=str(tmp_path / 'audio'), TTS_UPSTREAM=_streaming_upstream(calls, closed))
+    client = app.test_client()
+
+    partial = client.get('/tts?text=cat', headers={'Range': 'bytes=3-'})
+    assert partial.status_code == 206
+    assert partial.headers['Content-Range'] == 'bytes 3-6/7'
+    assert partial.data == b'-cat'
+    assert calls == ['bytes=3-']
+
+    cache = app.extensions['audio_cache']
+    assert cache.get(cache.key('en', 'cat')) is None
+
+
+def test_truncated_stream_is_not_cached(app_factory, tmp_path):
+    calls, closed = [], []
+    upstream = _streaming_upstream(calls, closed, length=100)
+    app = app_factory(AUDIO_CACHE_DIR=str(tmp_path / 'audio'), TTS_UPSTREAM=upstream)
+
+    response = app.test_client().get('/tts?text=cat')
+    assert response.data == b'ID3-cat'
+
+    cache = app.extensions['audio_cache']
+    assert cache.get(cache.key('en', 'cat')) is None
+    assert not any(name.endswith('.tmp') for _, _, names in os.walk(tmp_path / 'audio') for name in names)
+
+
+class _FailingBody(io.RawIOBase):
+    """Sends the first bytes of a clip, then the connection drops."""
+
+    def __init__(self):
+        self.sent = False
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if self.sent:
+            raise requests.exceptions.ChunkedEncodingError('connection dropped')
+        self.sent = True
+        return b'ID3'
+
+
+class _MidBodyFailureAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = _FailingBody()
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_tts_failing_mid_body_trips_the_circuit_breaker(app_factory, tmp_path):
+    app = app_factory(AUDIO_CACHE_DIR=str(tmp_path / 'audio'), HTTP_BREAKER_THRESHOLD=2)
+    http_client = app.extensions['http_client']
+    http_client.session(GOOGLE_TTS_URL).mount('https://', _MidBodyFailureAdapter())
+    client = app.test_client()
+
+    for _ in range(2):
+        with pytest.raises(requests.RequestException):
+            client.get('/tts?text=cat').data
+
+    host = http_client.stats()['hosts']['translate.google.com']
+    assert host['circuit'] == 'open'
+    assert host['failures'] == 2
+    assert client.get('/tts?text=cat').status_code == 503
+    cache = app.extensions['audio_cache']
+    assert cache.get(cache.key('en', 'cat')) is None
@@ -0,0 +1,115 @@
+from sqlalchemy import event
+
+from app import db
+from app.catalog_index import BOOKS, TESTS, PrefixIndex, TrigramIndex, get_catalog_index
+from app.models import Book, Test
+
+
+def test_prefix_index_ranks_whole_name_matches_first():
+    index = PrefixIndex([(1, "Grammar in Use"), (2, "English Grammar"), (3, "Gramática Básica"), (4, "Grammar in Use")])
+
+    assert index.search("gram") == ["Gramática Básica", "Grammar in Use", "English Grammar"]
+    assert index.search("in u") == ["Grammar in Use"]
+    assert index.search("GRAM", limit=1) == ["Gramática Básica"]
+    assert index.search("  ") == []
+
+    index.discard(1)
+    assert "Grammar in Use" in index.search("use")
+    index.discard(4)
+    assert index.search("use") == []
+    index.add(2, "Headway")
+    assert index.search("english") == [] and index.search("head") == ["Headway"]
+
+
+def _setup(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="teacher", password="secret", is_admin=True)
+    login_helper(client, "teacher", "secret")
+    for name in ("Present Simple", "Present Perfect", "Past Simple"):
+        client.post("/tests/add", data={"book_title": "Solutions", "name": name, "content": "Say [hi]"})
+    return app, client
+
+
+def test_autocomplete_runs_no_queries_and_is_cacheable(app_factory, user_factory, login_helper):
+    app, client = _setup(app_factory, user_factory, login_helper)
+    client.get("/autocomplete_test?q=pre")  # builds the index
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/autocomplete_search?query=simp&search_option=tests")
+        again = client.get(
+            "/autocomplete_search?query=simp&search_option=tests",
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.get_json() == [
+        {"label": "Past Simple", "value": "Past Simple"},
+        {"label": "Present Simple", "value": "Present Simple"},
+    ]
+    assert "max-age=60" in response.headers["Cache-Control"]
+    assert again.status_code == 304
+    assert statements == []
+
+
+def test_index_follows_commits_but_not_rollbacks(app_factory, user_factory, login_helper):
+    app, client = _setup(app_factory, user_factory, login_helper)
+    assert client.get("/autocomplete_book?q=sol").get_json() == ["Solutions"]
+
+    with app.app_context():
+        catalog = get_catalog_index()
+        book = Book.query.one()
+        book.title = "Headway"
+        db.session.commit()
+        assert catalog.search(BOOKS, "head") == ["Headway"]
+        assert catalog.search(BOOKS, "sol") == []
+
+        db.session.delete(Test.query.filter_by(name="Past Simple").one())
+        db.session.commit()
+        assert catalog.search(TESTS, "past") == []
+
+        test = Test.query.filter_by(name="Present Perfect").one()
+        test.name = "Future Perfect"
+        db.session.flush()
+        db.session.rollback()
+        assert catalog.search(TESTS, "fut") == []
+        assert catalog.search(TESTS, "present p") == ["Present Perfect"]
+
+
+def test_trigram_index_ranks_by_similarity_and_bounds_candidates():
+    index = TrigramIndex([(1, "Solutions Intermediate"), (2, "Solutions Elementary"), (3, "Headway"), (4, "Solutions Intermediate")])
+
+    assert index.search("solutoins intermedate") == [1, 4]
+    assert index.search("solutions elementry") == [2, 1, 4]
+    assert index.search("hedway") == [3]
+    assert index.search("zzz") == []
+
+    index.discard(3)
+    assert index.search("hedway") == []
+
+    crowded = TrigramIndex([(n, f"Unit {n}") for n in range(5000)], max_candidates=100)
+    assert len(crowded.search("unit 42", limit=500)) <= 100
+
+
+def test_search_falls_back_to_fuzzy_matches(app_factory, user_factory, login_helper):
+    app, client = _setup(app_factory, user_factory, login_helper)
+
+    response = client.get("/search", query_string={"query": "Solutons", "search_option": "books"})
+    assert b"No exact matches" in response.data
+    assert b"Solutions" in response.data
+
+    response = client.get("/search", query_string={"query": "Presnt Perfekt", "search_option": "tests"})
+    assert b"Present Perfect" in response.data
+    assert b"Present Simple" not in response.data
+
+    response = client.get("/search", query_string={"query": "Present", "search_option": "tests"})
+    assert b"No exact matches" not in response.data
@@ -0,0 +1,47 @@
+from app.fragment_cache import FragmentCache, get_fragment_cache
+from app.models import Test
+
+
+def test_lru_evicts_by_size_and_counts_hits():
+    cache = FragmentCache(max_entries=10, max_bytes=10)
+
+    assert cache.get_or_render("a", lambda: ["aaaa"]) == ("aaaa",)
+    cache.get_or_render("b", lambda: ["bbbb"])
+    cache.get_or_render("a", lambda: ["unused"])
+    cache.get_or_render("c", lambda: ["cccc"])
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    assert stats["bytes"] == 8
+    # "b" was least recently used, so it was the one evicted
+    assert cache.get_or_render("a", lambda: ["new"]) == ("aaaa",)
+    assert cache.get_or_render("b", lambda: ["new"]) == ("new",)
+
+
+def test_oversized_fragments_are_not_cached():
+    cache = FragmentCache(max_entries=10, max_bytes=3)
+    cache.get_or_render("big", lambda: ["too big"])
+    assert cache.stats()["entries"] == 0
+
+
+def test_take_test_get_reuses_rendered_questions(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+    client.post("/tests/add", data={"book_title": "Book", "name": "T", "content": "Say [hi]"})
+    with app.app_context():
+        test_id = Test.query.one().id
+        cache = get_fragment_cache()
+        cache.clear()
+
+    first = client.get(f"/tests/test/{test_id}")
+    second = client.get(f"/tests/test/{test_id}")
+    assert first.status_code == second.status_code == 200
+    assert b'name="q1"' in second.data
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+
+    client.post(f"/tests/edit/{test_id}", data={"name": "T", "content": "Say [bye]"})
+    client.get(f"/tests/test/{test_id}")
+    assert cache.stats()["misses"] == 2
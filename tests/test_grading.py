@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from app import db
+from app.grading import make_normalizer
+from app.models import Test, TestResult
+
+
+@pytest.fixture
+def class_app(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="teacher", password="secret")
+    for idx in range(3):
+        user_factory(app, username=f"student{idx}", password="secret")
+    login_helper(client, "teacher", "secret")
+    client.post(
+        "/tests/add",
+        data={"book_title": "Book", "name": "Quiz", "content": "I [am] here.\nYou #[is, are] are#."},
+    )
+    with app.app_context():
+        test_id = Test.query.one().id
+    return app, client, test_id
+
+
+def test_normalizer_runs_once_per_distinct_answer(monkeypatch):
+    calls = []
+    monkeypatch.setattr("app.grading.normalize_text", lambda text: calls.append(text) or text.lower())
+    normalize = make_normalizer()
+
+    assert [normalize(answer) for answer in ("Am", " Am ", "am", "Am")] == ["am", "am", "am", "am"]
+    assert calls == ["Am", "am"]
+
+
+def test_grade_endpoint_inserts_all_results(class_app):
+    app, client, test_id = class_app
+    submissions = [
+        {"username": "student0", "answers": {"q1": "am", "q2": "are"}},
+        {"username": "student1", "answers": {"q1": "AM", "q2": "is"}},
+        {"username": "student2", "answers": {}},
+    ]
+
+    response = client.post(f"/tests/{test_id}/grade", json={"submissions": submissions})
+
+    data = response.get_json()
+    assert data["success"] is True
+    assert [row["score"] for row in data["results"]] == [2, 1, 0]
+    with app.app_context():
+        assert TestResult.query.count() == 3
+        test = db.session.get(Test, test_id)
+        assert test.attempt_count == 3
+        assert test.avg_score == pytest.approx(1.0)
+
+
+def test_grade_endpoint_rejects_whole_batch_on_unknown_user(class_app):
+    app, client, test_id = class_app
+    submissions = [
+        {"username": "student0", "answers": {"q1": "am"}},
+        {"username": "nobody", "answers": {"q1": "am"}},
+    ]
+
+    response = client.post(f"/tests/{test_id}/grade", json={"submissions": submissions})
+
+    assert response.status_code == 400
+    assert "Submission 1" in response.get_json()["error"]
+    with app.app_context():
+        assert TestResult.query.count() == 0
+
+
+@pytest.mark.parametrize("submission", [
+    {"username": "student0", "answers": {"q1": 5}},
+    {"username": "student0", "answers": {"q1": ["am"]}},
+    {"username": "student0", "answers": ["am"]},
+    {"user_id": [1], "answers": {}},
+    {"user_id": {"id": 1}, "answers": {}},
+    {"username": ["student0"], "answers": {}},
+])
+def test_grade_endpoint_rejects_mistyped_submissions(class_app, submission):
+    app, client, test_id = class_app
+
+    response = client.post(f"/tests/{test_id}/grade", json={"submissions": [submission]})
+
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("Submission 0:")
+    with app.app_context():
+        assert TestResult.query.count() == 0
+
+
+def test_grade_endpoint_requires_test_owner(class_app, login_helper):
+    app, client, test_id = class_app
+    client.get("/auth/logout")
+    login_helper(client, "student0", "secret")
+
+    response = client.post(f"/tests/{test_id}/grade", json={"submissions": []})
+
+    assert response.status_code == 403
+
+
+def test_grade_batch_cli(class_app, tmp_path):
+    app, _, test_id = class_app
+    path = tmp_path / "answers.json"
+    path.write_text(json.dumps([{"username": "student0", "answers": {"q1": "am", "q2": "are"}}]))
+
+    result = app.test_cli_runner().invoke(args=["grade-batch", str(test_id), str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert "student0\t2/2" in result.output
+    with app.app_context():
+        assert TestResult.query.one().score == 2
+
+
+def test_grade_batch_cli_reports_mistyped_answers(class_app, tmp_path):
+    app, _, test_id = class_app
+    path = tmp_path / "answers.json"
+    path.write_text(json.dumps([{"username": "student0", "answers": {"q1": 1}}]))
+
+    result = app.test_cli_runner().invoke(args=["grade-batch", str(test_id), str(path)])
+
+    assert result.exit_code == 1
+    assert "Submission 0" in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
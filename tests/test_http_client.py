@@ -0,0 +1,92 @@
+import io
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from app.http_client import CircuitOpenError, ConcurrencyLimitError, HTTPClient
+
+URL = 'https://upstream.test/audio'
+
+
+class StubAdapter(BaseAdapter):
+    """Answers from a list of status codes; an exception instance is raised instead."""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def send(self, request, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response.raw = io.BytesIO(b'ok')
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _client(outcomes, **kwargs):
+    client = HTTPClient(**kwargs)
+    adapter = StubAdapter(outcomes)
+    client.session(URL).mount('https://', adapter)
+    return client, adapter
+
+
+def test_calls_use_pooled_session_and_timeouts():
+    client, adapter = _client([200, 200], connect_timeout=1.5, read_timeout=4)
+
+    assert client.get(URL).content == b'ok'
+    assert client.get(URL, params={'q': 'x'}).status_code == 200
+    assert [call['timeout'] for call in adapter.calls] == [(1.5, 4), (1.5, 4)]
+
+    stats = client.stats()
+    assert stats['in_flight'] == 0
+    assert stats['hosts']['upstream.test']['requests'] == 2
+    assert stats['hosts']['upstream.test']['circuit'] == 'closed'
+    assert 'latency_p95_ms' in stats['hosts']['upstream.test']
+
+
+def test_circuit_opens_after_failures_and_recovers():
+    failures = [requests.ConnectTimeout('slow'), 503]
+    client, adapter = _client(failures + [200], failure_threshold=2, reset_timeout=0.05)
+
+    with pytest.raises(requests.ConnectTimeout):
+        client.get(URL)
+    assert client.get(URL).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+    assert len(adapter.calls) == 2
+
+    time.sleep(0.06)
+    assert client.get(URL).status_code == 200
+    host = client.stats()['hosts']['upstream.test']
+    assert host['circuit'] == 'closed'
+    assert (host['requests'], host['failures'], host['rejected']) == (3, 2, 1)
+
+
+def test_concurrency_limit_fails_fast():
+    client, _ = _client([200, 200], max_concurrency=1, acquire_timeout=0.01)
+
+    with client.stream(URL):
+        with pytest.raises(ConcurrencyLimitError):
+            client.get(URL)
+    assert client.get(URL).status_code == 200
+    assert client.stats()['peak_in_flight'] == 1
+
+
+def test_admin_metrics_include_outbound_client(app_factory, user_factory, login_helper):
+    app = app_factory()
+    user_factory(app, username='admin', password='pw', is_admin=True)
+    client = app.test_client()
+    login_helper(client, 'admin', 'pw')
+
+    data = client.get('/admin/metrics').get_json()
+    assert data['http_client']['max_concurrency'] == app.config['HTTP_MAX_CONCURRENCY']
@@ -0,0 +1,74 @@
+from app import db
+from app.models import LearnTestProgress, Test
+
+
+def _setup(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+    client.post(
+        "/tests/add",
+        data={"book_title": "Book", "name": "Learn", "content": "I [am] here.\nYou #[is, are] are#."},
+    )
+    with app.app_context():
+        test_id = Test.query.one().id
+    return app, client, test_id
+
+
+def test_save_answer_upserts_single_question(app_factory, user_factory, login_helper):
+    app, client, test_id = _setup(app_factory, user_factory, login_helper)
+
+    first = client.post(f"/tests/learn/{test_id}/answer", json={"qid": "q1", "answer": " am "})
+    second = client.post(f"/tests/learn/{test_id}/answer", json={"qid": "q2", "answer": "are"})
+    third = client.post(f"/tests/learn/{test_id}/answer", json={"qid": "q1", "answer": "was"})
+
+    assert first.get_json() == {"success": True, "qid": "q1"}
+    assert second.status_code == third.status_code == 200
+    with app.app_context():
+        progress = LearnTestProgress.query.one()
+        assert progress.answers == {"q1": "was", "q2": "are"}
+
+    page = client.get(f"/tests/learn/{test_id}")
+    assert b'value="was"' in page.data
+
+
+def test_save_answer_rejects_unknown_question(app_factory, user_factory, login_helper):
+    app, client, test_id = _setup(app_factory, user_factory, login_helper)
+
+    response = client.post(f"/tests/learn/{test_id}/answer", json={"qid": "q9", "answer": "x"})
+
+    assert response.status_code == 400
+    with app.app_context():
+        assert LearnTestProgress.query.count() == 0
+
+
+def test_answers_are_stored_as_json(app_factory, user_factory, login_helper):
+    app, client, test_id = _setup(app_factory, user_factory, login_helper)
+    client.post(f"/tests/learn/{test_id}", data={"q1": "am", "q2": "is"})
+
+    with app.app_context():
+        raw = db.session.execute(db.text("SELECT answers FROM learn_test_progress")).scalar()
+        assert raw == '{"q1": "am", "q2": "is"}'
+
+
+def test_check_answer_grades_and_records_completion_once(app_factory, user_factory, login_helper):
+    from app.models import LearnTestResult
+
+    app, client, test_id = _setup(app_factory, user_factory, login_helper)
+
+    wrong = client.post(f"/tests/learn/{test_id}/check", json={"qid": "q1", "answer": "was"})
+    assert wrong.get_json() == {"success": True, "qid": "q1", "correct": False, "completed": False}
+
+    right = client.post(f"/tests/learn/{test_id}/check", json={"qid": "q1", "answer": "AM"})
+    assert right.get_json()["correct"] is True
+    assert right.get_json()["completed"] is False
+
+    done = client.post(f"/tests/learn/{test_id}/check", json={"qid": "q2", "answer": "are"})
+    assert done.get_json()["completed"] is True
+    again = client.post(f"/tests/learn/{test_id}/check", json={"qid": "q2", "answer": "are"})
+    assert again.get_json()["completed"] is True
+
+    with app.app_context():
+        assert LearnTestResult.query.count() == 1
+        assert LearnTestProgress.query.one().answers == {"q1": "AM", "q2": "are"}
@@ -0,0 +1,148 @@
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Book, ReadingActivity, ReadingPage, Test, User
+from app.routes.main import AUTOCOMPLETE_LIMIT
+
+BIG_CONTENT = "Fill the [gap]. " * 5000
+
+
+@contextmanager
+def _recorded_queries(app):
+    """Record every SELECT with its query count and the bytes its rows carry.
+
+    Row sizes are measured by replaying each statement on a separate
+    connection, so the application's own cursors are left untouched.
+    """
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+        path = engine.url.database
+    queries = []
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+        replay = sqlite3.connect(path)
+        for statement, parameters in statements:
+            rows = replay.execute(statement, parameters).fetchall()
+            size = sum(len(str(value)) for row in rows for value in row)
+            queries.append({"sql": statement, "bytes": size})
+        replay.close()
+
+
+def _seed(app):
+    with app.app_context():
+        user = User.query.one()
+        book = Book(title="Grammar")
+        db.session.add(book)
+        for idx in range(20):
+            test = Test(name=f"Unit {idx}", content=BIG_CONTENT, book=book, created_by=user.id)
+            test.compile_content()
+            db.session.add(test)
+        activity = ReadingActivity(title="Story")
+        activity.pages = [ReadingPage(content=BIG_CONTENT, page_number=n) for n in range(1, 6)]
+        db.session.add(activity)
+        db.session.commit()
+        return book.id
+
+
+def _login(app, client, user_factory, login_helper):
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+
+
+def _assert_no_large_columns(queries):
+    for query in queries:
+        assert "content" not in query["sql"].split("FROM")[0], query["sql"]
+        assert query["bytes"] < 5000, query["sql"]
+
+
+def test_book_listing_skips_test_content(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login(app, client, user_factory, login_helper)
+    book_id = _seed(app)
+
+    with _recorded_queries(app) as queries:
+        response = client.get(f"/book/{book_id}")
+
+    assert response.status_code == 200
+    assert b"Unit 19" in response.data
+    # user, book, tests
+    assert len(queries) <= 3
+    _assert_no_large_columns(queries)
+
+
+def test_search_and_autocomplete_skip_test_content(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login(app, client, user_factory, login_helper)
+    _seed(app)
+
+    with _recorded_queries(app) as queries:
+        search = client.get("/search?query=Unit&search_option=tests")
+        suggestions = client.get("/autocomplete_search?query=Unit&search_option=tests")
+        names = client.get("/autocomplete_test?q=Unit")
+
+    assert search.status_code == 200 and b"Unit 3" in search.data
+    # Suggestions are capped and come from the in-process catalog index
+    assert len(suggestions.get_json()) == AUTOCOMPLETE_LIMIT
+    assert len(names.get_json()) == AUTOCOMPLETE_LIMIT
+    _assert_no_large_columns(queries)
+
+
+def test_reading_tasks_counts_pages_without_loading_them(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login(app, client, user_factory, login_helper)
+    _seed(app)
+
+    with _recorded_queries(app) as queries:
+        response = client.get("/reading/activities")
+
+    assert response.status_code == 200
+    assert b"Story" in response.data
+    _assert_no_large_columns(queries)
+
+
+def test_home_page_counts_tests_with_one_aggregate(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login(app, client, user_factory, login_helper)
+    _seed(app)
+    with app.app_context():
+        user = User.query.one()
+        for title in ("Reading", "Listening", "Writing"):
+            book = Book(title=title)
+            db.session.add(book)
+            test = Test(name=f"{title} 1", content="Say [hi]", book=book, created_by=user.id)
+            test.compile_content()
+            db.session.add(test)
+        db.session.commit()
+
+    with _recorded_queries(app) as queries:
+        response = client.get("/")
+
+    assert response.status_code == 200
+    assert b"Tests: 20" in response.data and b"Tests: 1" in response.data
+    assert b'<div class="score-big">23</div>' in response.data
+    # user, books, one GROUP BY for every count: no per-book test loads
+    assert len(queries) <= 3
+    _assert_no_large_columns(queries)
+
+    with _recorded_queries(app) as queries:
+        response = client.get("/search?query=read&search_option=books")
+    assert b"Number of tests: 1" in response.data
+    # user, full-text match, books, counts
+    assert len(queries) <= 4
+    _assert_no_large_columns(queries)
@@ -0,0 +1,92 @@
+from app import db
+from app.models import Test, TestResult
+from app.markup_compiler import MODE_SENTENCES, compile_test_content, content_hash
+
+
+def _login_user(app, client, user_factory, login_helper):
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+
+
+def _add_test(client, content, **extra):
+    data = {"book_title": "Book", "name": "Gaps", "content": content}
+    data.update(extra)
+    return client.post("/tests/add", data=data)
+
+
+def test_compile_numbers_dropdowns_before_inputs():
+    compiled = compile_test_content("I [am] #[is, are] are# here.\nNo gaps")
+
+    assert [q["qid"] for q in compiled["questions"]] == ["q1", "q2"]
+    dropdown, text_input = compiled["questions"]
+    assert dropdown["kind"] == "dropdown"
+    assert dropdown["options"] == ["is", "are"]
+    assert dropdown["answer"] == "are"
+    assert text_input["kind"] == "input"
+    assert text_input["normalized_answer"] == "am"
+    assert compiled["lines"][0] == [
+        {"text": "I "},
+        {"qid": "q2"},
+        {"text": " "},
+        {"qid": "q1"},
+        {"text": " here."},
+    ]
+    assert compiled["lines"][1] == [{"text": "No gaps"}]
+
+
+def test_compile_sentence_items():
+    compiled = compile_test_content("One. Two!\nThree?", MODE_SENTENCES)
+    assert [item["content"] for item in compiled["items"]] == ["One.", "Two!", "Three?"]
+
+
+def test_add_and_edit_store_compiled_content(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login_user(app, client, user_factory, login_helper)
+
+    _add_test(client, "Say [hello]")
+    with app.app_context():
+        test = Test.query.one()
+        assert test.content_hash == content_hash("Say [hello]")
+        assert test.compiled_content["questions"][0]["answer"] == "hello"
+        test_id = test.id
+
+    client.post(f"/tests/edit/{test_id}", data={"name": "Gaps", "content": "Say [bye] [now]"})
+    with app.app_context():
+        test = db.session.get(Test, test_id)
+        assert test.content_hash == content_hash("Say [bye] [now]")
+        assert len(test.compiled_content["questions"]) == 2
+
+
+def test_take_test_grades_from_compiled_form(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login_user(app, client, user_factory, login_helper)
+    _add_test(client, "I [am] #[is, are] are# here.")
+    with app.app_context():
+        test_id = Test.query.one().id
+
+    page = client.get(f"/tests/test/{test_id}")
+    assert page.status_code == 200
+    assert b'name="q1"' in page.data and b'name="q2"' in page.data
+
+    result = client.post(f"/tests/test/{test_id}", data={"q1": "Are", "q2": "was"})
+    assert result.status_code == 200
+    assert b"Correct answer: am" in result.data
+    with app.app_context():
+        stored = TestResult.query.one()
+        assert (stored.score, stored.total_questions) == (1, 2)
+
+
+def test_learn_test_renders_saved_answers(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    _login_user(app, client, user_factory, login_helper)
+    _add_test(client, "I [am] here.\nYou #[is, are] are#.")
+    with app.app_context():
+        test_id = Test.query.one().id
+
+    client.post(f"/tests/learn/{test_id}", data={"q1": "am", "q2": "is"})
+    page = client.get(f"/tests/learn/{test_id}")
+    assert b'value="am" class="form-control correct"' in page.data
+    assert b'<option value="is" selected>' in page.data
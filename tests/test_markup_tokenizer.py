@@ -0,0 +1,49 @@
+import time
+
+from app.markup_tokenizer import DROPDOWN, INPUT, LINE_END, TEXT, Token, tokenize, tokenize_line
+
+
+def test_tokenize_line_yields_typed_tokens():
+    assert tokenize_line("I [am] #[is, are] are# here.") == [
+        Token(TEXT, "I "),
+        Token(INPUT, "am"),
+        Token(TEXT, " "),
+        Token(DROPDOWN, "are", ("is", "are")),
+        Token(TEXT, " here."),
+    ]
+
+
+def test_malformed_markup_tokenizes_like_the_regexes():
+    # An unterminated dropdown leaves its options as a plain input
+    assert tokenize_line("#[a, b] no end") == [
+        Token(TEXT, "#"),
+        Token(INPUT, "a, b"),
+        Token(TEXT, " no end"),
+    ]
+    assert tokenize_line("[] and [[x]") == [Token(TEXT, "[] and "), Token(INPUT, "[x")]
+    assert tokenize_line("# [a] b #") == [Token(DROPDOWN, "b", ("a",))]
+    # Dropdowns are matched before inputs, even after an unclosed "["
+    assert tokenize_line("[a #[b] c#") == [Token(TEXT, "[a "), Token(DROPDOWN, "c", ("b",))]
+    assert tokenize_line("[x] #[a, [b] c# [y]") == [
+        Token(INPUT, "x"),
+        Token(TEXT, " "),
+        Token(DROPDOWN, "c", ("a", "[b")),
+        Token(TEXT, " "),
+        Token(INPUT, "y"),
+    ]
+
+
+def test_tokenize_emits_line_end_per_line():
+    kinds = [token.kind for token in tokenize("[a]\n\nplain")]
+    assert kinds == [INPUT, LINE_END, LINE_END, TEXT, LINE_END]
+
+
+def test_adversarial_input_stays_linear():
+    line = "#[" * 100000
+    started = time.perf_counter()
+    tokens = tokenize_line(line)
+    elapsed = time.perf_counter() - started
+
+    assert tokens == [Token(TEXT, line)]
+    # The old regexes need minutes for this line; a linear scan takes milliseconds
+    assert elapsed < 2
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Book, Test, User, Vocabulary
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def _seed_tests(app, count, name="Unit"):
+    with app.app_context():
+        user = User.query.first()
+        book = Book(title="Grammar")
+        db.session.add(book)
+        for idx in range(count):
+            test = Test(name=f"{name} {idx}", content="Say [hi]", book=book, created_by=user.id)
+            test.compile_content()
+            db.session.add(test)
+        db.session.commit()
+        return book.id
+
+
+def _login(app, user_factory, login_helper, username="student"):
+    client = app.test_client()
+    user_factory(app, username=username, password="secret")
+    login_helper(client, username, "secret")
+    return client
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor([-1.5e-06, 42], "n")
+    assert decode_cursor(cursor) == ((-1.5e-06, 42), "n")
+
+
+@pytest.mark.parametrize("key", [[{"a": 1}], [[1, 2]], ["x", {}]])
+def test_cursor_keys_must_be_scalars(key):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(key, "n"))
+
+
+@pytest.mark.parametrize("url", ["/book/{book_id}", "/vocabulary/", "/search?query=unit&search_option=tests"])
+def test_non_scalar_cursor_is_a_bad_request(app_factory, user_factory, login_helper, url):
+    app = app_factory()
+    client = _login(app, user_factory, login_helper)
+    url = url.format(book_id=_seed_tests(app, 2))
+    separator = "&" if "?" in url else "?"
+    for key in ([{"a": 1}], [[1, 2], 3]):
+        assert client.get(f"{url}{separator}cursor={encode_cursor(key, 'n')}").status_code == 400
+
+
+def test_book_tests_pages_forward_and_back(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = _login(app, user_factory, login_helper)
+    book_id = _seed_tests(app, 7)
+
+    first = client.get(f"/book/{book_id}?format=json&per_page=3").get_json()
+    assert [t["name"] for t in first["tests"]] == ["Unit 0", "Unit 1", "Unit 2"]
+    assert first["prev_cursor"] is None
+
+    second = client.get(f"/book/{book_id}?format=json&per_page=3&cursor={first['next_cursor']}").get_json()
+    third = client.get(f"/book/{book_id}?format=json&per_page=3&cursor={second['next_cursor']}").get_json()
+    assert [t["name"] for t in second["tests"]] == ["Unit 3", "Unit 4", "Unit 5"]
+    assert [t["name"] for t in third["tests"]] == ["Unit 6"]
+    assert third["next_cursor"] is None
+
+    back = client.get(f"/book/{book_id}?format=json&per_page=3&cursor={third['prev_cursor']}").get_json()
+    assert back["tests"] == second["tests"]
+    start = client.get(f"/book/{book_id}?format=json&per_page=3&cursor={back['prev_cursor']}").get_json()
+    assert start["tests"] == first["tests"]
+    assert start["prev_cursor"] is None
+
+    html = client.get(f"/book/{book_id}?per_page=3&cursor={first['next_cursor']}")
+    assert b'rel="prev"' in html.data and b'rel="next"' in html.data
+    assert b"Unit 3" in html.data and b"Unit 2" not in html.data
+
+    assert client.get(f"/book/{book_id}?cursor=not-a-cursor").status_code == 400
+
+
+def test_search_pages_by_rank(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = _login(app, user_factory, login_helper)
+    _seed_tests(app, 5, name="Present Simple")
+
+    names = []
+    url = "/search?query=present&search_option=tests&format=json&per_page=2"
+    data = client.get(url).get_json()
+    names.extend(t["name"] for t in data["tests"])
+    while data["next_cursor"]:
+        data = client.get(f"{url}&cursor={data['next_cursor']}").get_json()
+        names.extend(t["name"] for t in data["tests"])
+
+    assert sorted(names) == [f"Present Simple {idx}" for idx in range(5)]
+    assert len(set(names)) == 5
+    previous = client.get(f"{url}&cursor={data['prev_cursor']}").get_json()
+    assert [t["name"] for t in previous["tests"]] == names[2:4]
+
+
+def test_vocabulary_pages_only_own_words(app_factory, user_factory, login_helper):
+    app = app_factory()
+    user_factory(app, username="other", password="secret")
+    client = _login(app, user_factory, login_helper)
+    with app.app_context():
+        me = User.query.filter_by(username="student").one()
+        other = User.query.filter_by(username="other").one()
+        for idx in range(5):
+            for owner in (me, other):
+                db.session.add(Vocabulary(word=f"{owner.username}-{idx}", translation="t", user_id=owner.id, next_review=datetime.utcnow()))
+        db.session.commit()
+
+    first = client.get("/vocabulary/?format=json&per_page=4").get_json()
+    rest = client.get(f"/vocabulary/?format=json&per_page=4&cursor={first['next_cursor']}").get_json()
+
+    words = [w["word"] for w in first["words"] + rest["words"]]
+    assert words == [f"student-{idx}" for idx in range(5)]
+    assert rest["next_cursor"] is None
+    assert b"student-4" in client.get(f"/vocabulary/?per_page=4&cursor={first['next_cursor']}").data
@@ -0,0 +1,65 @@
+import sqlite3
+from contextlib import contextmanager
+
+from app import db
+from app.models import LearnTestProgress, ReadingActivity, ReadingPage, Test, UserReadingProgress
+
+
+@contextmanager
+def _held_write_lock(app):
+    """Hold SQLite's RESERVED lock from another connection, like a busy worker."""
+    with app.app_context():
+        path = db.engine.url.database
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+
+def _setup(app_factory, user_factory, login_helper):
+    # A short busy timeout makes any write attempt fail fast instead of waiting
+    app = app_factory(SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 0.2}})
+    client = app.test_client()
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+    client.post("/tests/add", data={"book_title": "Book", "name": "Learn", "content": "I [am] here."})
+    with app.app_context():
+        activity = ReadingActivity(title="Story")
+        activity.pages = [ReadingPage(content="Once upon a time", page_number=1)]
+        db.session.add(activity)
+        db.session.commit()
+        ids = Test.query.one().id, activity.id
+    return app, client, ids
+
+
+def test_learn_and_reading_gets_take_no_write_lock(app_factory, user_factory, login_helper):
+    app, client, (test_id, activity_id) = _setup(app_factory, user_factory, login_helper)
+
+    with _held_write_lock(app):
+        learn_page = client.get(f"/tests/learn/{test_id}")
+        reading_page = client.get(f"/reading/activity/{activity_id}/page/1")
+        # Control: a real mutation cannot get the lock while it is held
+        unlock = client.post(f"/reading/activity/{activity_id}/unlock/2")
+
+    assert learn_page.status_code == 200
+    assert b'name="q1"' in learn_page.data
+    assert reading_page.status_code == 200
+    assert b"Story - Page 1" in reading_page.data
+    assert unlock.status_code == 500
+    with app.app_context():
+        assert LearnTestProgress.query.count() == 0
+        assert UserReadingProgress.query.count() == 0
+
+
+def test_progress_rows_are_created_on_first_mutation(app_factory, user_factory, login_helper):
+    app, client, (test_id, activity_id) = _setup(app_factory, user_factory, login_helper)
+
+    client.post(f"/tests/learn/{test_id}", data={"q1": "was"})
+    client.post(f"/reading/activity/{activity_id}/unlock/2")
+
+    with app.app_context():
+        assert LearnTestProgress.query.one().answers == {"q1": "was"}
+        assert UserReadingProgress.query.one().unlocked_pages == [1, 2]
@@ -0,0 +1,158 @@
+import os
+import shutil
+
+from app.models import Test, TestAttempt, TestResult
+from app import result_queue
+from app.result_queue import EXTENSION_KEY, ResultQueue
+
+
+def _setup(app_factory, user_factory, login_helper, journal_dir):
+    app = app_factory(RESULT_WRITE_BEHIND=True, RESULT_FLUSH_INTERVAL=0, RESULT_JOURNAL_DIR=str(journal_dir))
+    client = app.test_client()
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+    client.post("/tests/add", data={"book_title": "Book", "name": "Quiz", "content": "Say [hi] and [bye]"})
+    with app.app_context():
+        test_id = Test.query.one().id
+    return app, client, test_id
+
+
+def _segments(journal_dir):
+    return [name for name in os.listdir(journal_dir) if name.endswith(".jsonl")]
+
+
+def test_submission_is_journaled_then_flushed(app_factory, user_factory, login_helper, tmp_path):
+    journal_dir = tmp_path / "journal"
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, journal_dir)
+    client.get(f"/tests/test/{test_id}")
+
+    response = client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "nope"})
+
+    assert b"You scored 1 out of 2!" in response.data
+    with app.app_context():
+        assert TestResult.query.count() == 0
+        assert TestAttempt.query.one().status == TestAttempt.STATUS_IN_PROGRESS
+
+    assert app.extensions[EXTENSION_KEY].flush() == 1
+
+    with app.app_context():
+        result = TestResult.query.one()
+        assert (result.score, result.total_questions) == (1, 2)
+        assert result.submission_key
+        assert TestAttempt.query.one().status == TestAttempt.STATUS_SUBMITTED
+        test = Test.query.one()
+        assert (test.attempt_count, test.avg_score) == (1, 1.0)
+
+
+def test_journal_is_replayed_after_crash(app_factory, user_factory, login_helper, tmp_path):
+    journal_dir = tmp_path / "journal"
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, journal_dir)
+    client.get(f"/tests/test/{test_id}")
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "bye"})
+
+    # Simulate the worker dying before its flusher ran: the segment stays on
+    # disk and its lock is released.
+    app.extensions[EXTENSION_KEY]._active.close()
+    (segment,) = _segments(journal_dir)
+    shutil.copy(journal_dir / segment, tmp_path / "segment.bak")
+
+    restarted = app_factory(
+        SQLALCHEMY_DATABASE_URI=app.config["SQLALCHEMY_DATABASE_URI"],
+        RESULT_WRITE_BEHIND=True,
+        RESULT_FLUSH_INTERVAL=0,
+        RESULT_JOURNAL_DIR=str(journal_dir),
+    )
+
+    assert _segments(journal_dir) == []
+    with restarted.app_context():
+        assert TestResult.query.one().score == 2
+        assert Test.query.one().attempt_count == 1
+
+    # A crash between the commit and deleting the segment replays it again
+    shutil.copy(tmp_path / "segment.bak", journal_dir / segment)
+    assert restarted.extensions[EXTENSION_KEY].flush() == 0
+    with restarted.app_context():
+        assert TestResult.query.count() == 1
+        assert Test.query.one().attempt_count == 1
+
+
+def test_late_flush_does_not_close_restarted_attempt(app_factory, user_factory, login_helper, tmp_path):
+    journal_dir = tmp_path / "journal"
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, journal_dir)
+    client.get(f"/tests/test/{test_id}")
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "bye"})
+    # The student starts again before the background flush ran
+    client.get(f"/tests/test/{test_id}")
+
+    app.extensions[EXTENSION_KEY].flush()
+
+    with app.app_context():
+        assert TestResult.query.count() == 1
+        assert TestAttempt.query.one().status == TestAttempt.STATUS_IN_PROGRESS
+
+
+def test_double_submit_before_flush_records_one_result(app_factory, user_factory, login_helper, tmp_path):
+    journal_dir = tmp_path / "journal"
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, journal_dir)
+    client.get(f"/tests/test/{test_id}")
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "nope"})
+    # The attempt is still in progress until the flush, so a resubmit is accepted
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "bye"})
+
+    assert app.extensions[EXTENSION_KEY].flush() == 1
+    with app.app_context():
+        assert TestResult.query.one().score == 1
+        assert Test.query.one().attempt_count == 1
+        assert TestAttempt.query.one().status == TestAttempt.STATUS_SUBMITTED
+
+
+def test_flushing_a_segment_another_worker_deleted(app_factory, user_factory, login_helper, tmp_path, monkeypatch):
+    journal_dir = tmp_path / "journal"
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, journal_dir)
+    client.get(f"/tests/test/{test_id}")
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "bye"})
+    queue = app.extensions[EXTENSION_KEY]
+    store = queue._store
+
+    def store_then_lose_race(records):
+        inserted = store(records)
+        # A second worker adopted the same segment and finished first
+        for name in _segments(journal_dir):
+            if os.path.join(journal_dir, name) != queue._active_path:
+                os.unlink(journal_dir / name)
+        return inserted
+
+    monkeypatch.setattr(queue, "_store", store_then_lose_race)
+    assert queue.flush() == 1
+    with app.app_context():
+        assert TestResult.query.count() == 1
+
+
+def test_other_workers_cannot_flush_a_segment_being_opened(app_factory, user_factory, login_helper, tmp_path,
+                                                           monkeypatch):
+    journal_dir = tmp_path / "journal"
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, journal_dir)
+    queue = app.extensions[EXTENSION_KEY]
+    other = ResultQueue(app, str(journal_dir), interval=0)
+    try_lock = result_queue._try_lock
+    open_segment = queue._open_segment
+
+    def flush_before_lock(handle):
+        # Another worker flushes in the gap between creating the file and locking it
+        if handle.name.endswith(result_queue.OPENING_SUFFIX):
+            other.flush()
+        return try_lock(handle)
+
+    def open_then_flush():
+        open_segment()
+        other.flush()
+
+    monkeypatch.setattr(result_queue, "_try_lock", flush_before_lock)
+    monkeypatch.setattr(queue, "_open_segment", open_then_flush)
+    client.get(f"/tests/test/{test_id}")
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi", "q2": "bye"})
+
+    assert _segments(journal_dir) == [os.path.basename(queue._active_path)]
+    assert queue.flush() == 1
+    with app.app_context():
+        assert TestResult.query.one().score == 2
@@ -0,0 +1,91 @@
+import pytest
+
+from app import db
+from app.models import Test, TestResult, User
+
+
+@pytest.fixture
+def stats_app(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+    client.post("/tests/add", data={"book_title": "Book", "name": "Stats", "content": "[a] [b]\n[c]"})
+    return app, client
+
+
+def test_question_count_follows_content_edits(stats_app):
+    app, client = stats_app
+    with app.app_context():
+        test = Test.query.one()
+        assert test.question_count == 3
+        test_id = test.id
+
+    client.post(f"/tests/edit/{test_id}", data={"name": "Stats", "content": "[a]"})
+    with app.app_context():
+        assert db.session.get(Test, test_id).question_count == 1
+
+
+def test_results_update_attempt_count_and_average(stats_app):
+    app, client = stats_app
+    with app.app_context():
+        test_id = Test.query.one().id
+
+    for answers in ({"q1": "a", "q2": "b", "q3": "c"}, {"q1": "a"}):
+        client.get(f"/tests/test/{test_id}")
+        client.post(f"/tests/test/{test_id}", data=answers)
+
+    with app.app_context():
+        test = db.session.get(Test, test_id)
+        assert test.attempt_count == 2
+        assert test.avg_score == pytest.approx(2.0)
+
+        db.session.delete(TestResult.query.filter_by(score=1).one())
+        db.session.commit()
+        db.session.refresh(test)
+        assert (test.attempt_count, test.avg_score) == (1, pytest.approx(3.0))
+
+
+def test_backfill_command_recomputes_stats(stats_app):
+    app, _ = stats_app
+    with app.app_context():
+        test = Test.query.one()
+        user = User.query.one()
+        db.session.execute(
+            TestResult.__table__.insert(),
+            [
+                {"score": 1, "total_questions": 3, "user_id": user.id, "test_id": test.id},
+                {"score": 2, "total_questions": 3, "user_id": user.id, "test_id": test.id},
+            ],
+        )
+        test.question_count = 0
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["backfill-test-stats"])
+
+    assert "Updated statistics for 1 tests." in result.output
+    with app.app_context():
+        test = Test.query.one()
+        assert (test.question_count, test.attempt_count) == (3, 2)
+        assert test.avg_score == pytest.approx(1.5)
+
+
+def test_tile_tests_record_the_listed_question_count(stats_app):
+    app, client = stats_app
+    client.post("/tests/add", data={
+        "book_title": "Book", "name": "Tiles", "content": "One. Two. Three.", "shuffle_sentences": "y",
+    })
+    with app.app_context():
+        test = Test.query.filter_by(name="Tiles").one()
+        assert test.question_count == 3
+        test_id = test.id
+
+    client.get(f"/tests/test/{test_id}")
+    response = client.post(f"/tests/test/{test_id}", data={"item_order": "item_1,item_3,item_2"})
+    assert b"You scored 1 out of 3!" in response.data
+
+    with app.app_context():
+        result = TestResult.query.filter_by(test_id=test_id).one()
+        assert (result.score, result.total_questions) == (1, 3)
+        test = db.session.get(Test, test_id)
+        assert test.avg_score <= test.question_count
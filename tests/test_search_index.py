@@ -0,0 +1,89 @@
+from app import db
+from app.models import Book, Test
+from app.search_index import match_expression, search_books, search_tests
+
+
+def _setup(app_factory, user_factory, login_helper):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="teacher", password="secret", is_admin=True)
+    login_helper(client, "teacher", "secret")
+    client.post("/tests/add", data={
+        "book_title": "Solutions Intermediate",
+        "name": "Past Simple",
+        "content": "Yesterday the <b>policeman</b> [noticed] the blood on the floor.",
+    })
+    client.post("/tests/add", data={
+        "book_title": "Solutions Intermediate",
+        "name": "Policeman vocabulary",
+        "content": "A #[thief, judge] thief# steals things.",
+    })
+    return app, client
+
+
+def test_search_ranks_names_above_text_and_hides_answers(app_factory, user_factory, login_helper):
+    app, _ = _setup(app_factory, user_factory, login_helper)
+
+    with app.app_context():
+        hits = search_tests("police")
+        names = [db.session.get(Test, hit.id).name for hit in hits]
+        assert names == ["Policeman vocabulary", "Past Simple"]
+        snippet = hits[1].highlight
+        assert "<mark>policeman</mark>" in snippet
+        assert "<b>" not in snippet and "___" in snippet
+        # Gap answers are not part of the index
+        assert search_tests("noticed") == []
+        assert search_tests("thief") == []
+
+
+def test_index_follows_edits_and_deletes(app_factory, user_factory, login_helper):
+    app, client = _setup(app_factory, user_factory, login_helper)
+    with app.app_context():
+        test_id = Test.query.filter_by(name="Past Simple").one().id
+        book = Book.query.one()
+        book.title = "Headway Upper"
+        db.session.commit()
+
+    client.post(f"/tests/edit/{test_id}", data={
+        "name": "Past Continuous",
+        "content": "While she was [walking] home it started to rain.",
+    })
+
+    with app.app_context():
+        assert [hit.id for hit in search_tests("rain")] == [test_id]
+        assert search_tests("blood") == []
+        assert [str(hit.highlight) for hit in search_books("head")] == ["<mark>Headway</mark> Upper"]
+        assert search_books("solutions") == []
+
+        db.session.delete(db.session.get(Test, test_id))
+        db.session.commit()
+        assert search_tests("rain") == []
+
+
+def test_search_page_and_operator_characters(app_factory, user_factory, login_helper):
+    app, client = _setup(app_factory, user_factory, login_helper)
+
+    response = client.get("/search", query_string={"query": "floor", "search_option": "tests"})
+    assert b"Past Simple" in response.data
+    assert b"<mark>floor</mark>" in response.data
+
+    assert match_expression('"floor" OR name:x*') == '"floor"* "OR"* "name"* "x"*'
+    response = client.get("/search", query_string={"query": 'NEAR("(', "search_option": "books"})
+    assert response.status_code == 200
+    assert client.get("/autocomplete_search?query=solu&search_option=books").get_json() == [
+        {"label": "Solutions Intermediate", "value": "Solutions Intermediate"}
+    ]
+
+
+def test_rebuild_command_repopulates_index(app_factory, user_factory, login_helper):
+    app, _ = _setup(app_factory, user_factory, login_helper)
+    with app.app_context():
+        db.session.execute(db.text("DELETE FROM fts_test"))
+        db.session.commit()
+        assert search_tests("floor") == []
+
+    result = app.test_cli_runner().invoke(args=["rebuild-search-index"])
+
+    assert "Indexed 3 books and tests." in result.output
+    with app.app_context():
+        assert len(search_tests("floor")) == 1
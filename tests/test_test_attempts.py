@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Test, TestAttempt, TestResult
+
+
+def _setup(app_factory, user_factory, login_helper, **test_fields):
+    app = app_factory()
+    client = app.test_client()
+    user_factory(app, username="student", password="secret")
+    login_helper(client, "student", "secret")
+    data = {"book_title": "Book", "name": "Timed", "content": "Say [hi]"}
+    data.update(test_fields)
+    client.post("/tests/add", data=data)
+    with app.app_context():
+        test_id = Test.query.one().id
+    return app, client, test_id
+
+
+def test_get_records_attempt_instead_of_session(app_factory, user_factory, login_helper):
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, time_limit=10)
+
+    client.get(f"/tests/test/{test_id}")
+    client.get(f"/tests/test/{test_id}")
+
+    with client.session_transaction() as sess:
+        assert not any(key.startswith("start_time_") for key in sess)
+    with app.app_context():
+        attempt = TestAttempt.query.one()
+        assert attempt.status == TestAttempt.STATUS_IN_PROGRESS
+        assert attempt.deadline - attempt.started_at == timedelta(minutes=10)
+
+    client.post(f"/tests/test/{test_id}", data={"q1": "hi"})
+    with app.app_context():
+        attempt = TestAttempt.query.one()
+        assert attempt.status == TestAttempt.STATUS_SUBMITTED
+        assert attempt.submitted_at is not None
+        assert TestResult.query.count() == 1
+
+
+def test_post_without_attempt_is_rejected(app_factory, user_factory, login_helper):
+    app, client, test_id = _setup(app_factory, user_factory, login_helper)
+
+    response = client.post(f"/tests/test/{test_id}", data={"q1": "hi"})
+
+    assert response.status_code == 302
+    with app.app_context():
+        assert TestResult.query.count() == 0
+
+
+def test_late_submission_is_marked_timed_out(app_factory, user_factory, login_helper):
+    app, client, test_id = _setup(app_factory, user_factory, login_helper, time_limit=1)
+    client.get(f"/tests/test/{test_id}")
+    with app.app_context():
+        attempt = TestAttempt.query.one()
+        attempt.started_at = datetime.utcnow() - timedelta(minutes=5)
+        attempt.deadline = datetime.utcnow() - timedelta(minutes=4)
+        db.session.commit()
+
+    response = client.post(f"/tests/test/{test_id}", data={"q1": "hi"})
+
+    assert b"Time limit exceeded" in response.data
+    with app.app_context():
+        assert TestAttempt.query.one().status == TestAttempt.STATUS_TIMED_OUT
+        assert TestResult.query.count() == 1
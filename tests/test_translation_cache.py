@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import requests
+
+from app import db
+from app.models import Translation
+
+
+def _stub_upstream(calls, failing=()):
+    def translate(word, source, target):
+        calls.append(word)
+        if word in failing:
+            raise requests.ConnectionError('offline')
+        return f'{word}-{target}'
+
+    return translate
+
+
+def test_translate_is_cached_across_requests(app_factory):
+    calls = []
+    app = app_factory(TRANSLATE_UPSTREAM=_stub_upstream(calls))
+    client = app.test_client()
+
+    first = client.get('/translate?word=House,')
+    assert first.status_code == 200
+    assert first.get_json()['translation'] == 'house-uk'
+
+    second = client.get('/translate?word=house')
+    assert second.get_json()['translation'] == 'house-uk'
+    assert calls == ['house']
+
+    assert client.get('/translate').status_code == 400
+
+
+def _logged_in_client(app, user_factory, login_helper):
+    user_factory(app, username='student', password='secret')
+    client = app.test_client()
+    login_helper(client, 'student', 'secret')
+    return client
+
+
+def test_batch_fetches_only_misses(app_factory, user_factory, login_helper):
+    calls = []
+    app = app_factory(TRANSLATE_UPSTREAM=_stub_upstream(calls, failing={'broken'}))
+    client = _logged_in_client(app, user_factory, login_helper)
+    client.get('/translate?word=cat')
+
+    response = client.post('/translate/batch', json={'words': ['cat', 'Dog', 'dog!', 'broken', 'bird']})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['translations'] == {'cat': 'cat-uk', 'Dog': 'dog-uk', 'dog!': 'dog-uk', 'bird': 'bird-uk'}
+    assert list(data['errors']) == ['broken']
+    assert sorted(calls) == ['bird', 'broken', 'cat', 'dog']
+
+    with app.app_context():
+        assert db.session.query(Translation).count() == 3
+
+
+def test_stale_translations_are_refetched(app_factory):
+    calls = []
+    app = app_factory(TRANSLATE_UPSTREAM=_stub_upstream(calls), TRANSLATION_CACHE_TTL=3600)
+    client = app.test_client()
+    client.get('/translate?word=tree')
+
+    with app.app_context():
+        row = db.session.query(Translation).one()
+        row.translation = 'outdated'
+        row.fetched_at = datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+
+    assert client.get('/translate?word=tree').get_json()['translation'] == 'tree-uk'
+    assert calls == ['tree', 'tree']
+    with app.app_context():
+        assert db.session.query(Translation).one().translation == 'tree-uk'
+
+
+def test_batch_rejects_bad_payloads(app_factory, user_factory, login_helper):
+    calls = []
+    app = app_factory(TRANSLATE_UPSTREAM=_stub_upstream(calls), TRANSLATE_BATCH_MAX_WORDS=2)
+    assert app.test_client().post('/translate/batch', json={'words': ['a']}).status_code == 302
+    assert calls == []
+    client = _logged_in_client(app, user_factory, login_helper)
+
+    assert client.post('/translate/batch', json={'words': 'cat'}).status_code == 400
+    assert client.post('/translate/batch', json={'words': ['a', 'b', 'c']}).status_code == 400
+    assert client.post('/translate/batch', json={'words': []}).get_json() == {'translations': {}, 'errors': {}}
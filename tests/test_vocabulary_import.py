@@ -0,0 +1,158 @@
+import io
+import json
+
+from sqlalchemy import event
+
+from app import db
+from app.models import User, Vocabulary
+from app.vocab_import import import_vocabulary, read_rows
+
+
+def _client(app_factory, user_factory, login_helper, username="teacher", is_admin=True, **overrides):
+    app = app_factory(**overrides)
+    user_factory(app, username=username, password="secret", is_admin=is_admin)
+    client = app.test_client()
+    login_helper(client, username, "secret")
+    return app, client
+
+
+def _words(app, username):
+    with app.app_context():
+        user = User.query.filter_by(username=username).one()
+        return sorted(
+            (word.word, word.translation)
+            for word in Vocabulary.query.filter_by(user_id=user.id)
+        )
+
+
+def test_csv_import_normalizes_and_skips_duplicates(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    client.post("/vocabulary/add", json={"word": "House", "translation": "dim"})
+
+    body = "word,translation\nhouse,budynok\n\"cat, the\",kit\n Dog ,pes\ndog,sobaka\n,empty\nsolo\n"
+    response = client.post("/vocabulary/import", data=body, content_type="text/csv")
+    data = response.get_json()
+    assert data == {"success": True, "inserted": 2, "duplicates": 2, "invalid": 2, "users": 1}
+    assert _words(app, "teacher") == [("Dog", "pes"), ("House", "dim"), ("cat, the", "kit")]
+
+    # The single-word endpoint shares the normalized uniqueness
+    response = client.post("/vocabulary/add", json={"word": "dog,", "translation": "pes"})
+    assert response.status_code == 400
+
+
+def test_admin_imports_into_many_users_in_batches(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper, VOCAB_IMPORT_BATCH_SIZE=4)
+    for name in ("ann", "bob"):
+        user_factory(app, username=name, password="secret")
+    with app.app_context():
+        bob = User.query.filter_by(username="bob").one()
+        db.session.add(Vocabulary(word="word1", translation="old", user_id=bob.id))
+        db.session.commit()
+        bob_id = bob.id
+
+    lines = "".join(json.dumps({"word": f"word{n}", "translation": f"slovo{n}"}) + "\n" for n in range(5))
+    commits = []
+
+    def count_commit(session):
+        commits.append(1)
+
+    event.listen(db.session, "after_commit", count_commit)
+    try:
+        response = client.post(
+            f"/vocabulary/import?username=ann&user_id={bob_id}",
+            data={"file": (io.BytesIO(lines.encode()), "words.jsonl")},
+            content_type="multipart/form-data",
+        )
+    finally:
+        event.remove(db.session, "after_commit", count_commit)
+    assert response.get_json() == {"success": True, "inserted": 9, "duplicates": 1, "invalid": 0, "users": 2}
+    # Two words (four rows) per transaction
+    assert len(commits) == 3
+    assert len(_words(app, "ann")) == 5
+    assert ("word1", "old") in _words(app, "bob")
+
+    response = client.post("/vocabulary/import?username=nobody", data="a,b", content_type="text/csv")
+    assert response.status_code == 400
+
+
+def test_students_import_only_into_their_own_vocabulary(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper, username="student", is_admin=False)
+    user_factory(app, username="other", password="secret")
+
+    response = client.post("/vocabulary/import?username=other", data="a,b", content_type="text/csv")
+    assert response.status_code == 403
+    assert _words(app, "other") == []
+
+    response = client.post("/vocabulary/import?username=student", data=json.dumps([["a", "b"]]),
+                           content_type="application/json")
+    assert response.get_json()["inserted"] == 1
+
+    response = client.post("/vocabulary/import", data="[not json", content_type="application/json")
+    assert response.status_code == 400
+    response = client.post("/vocabulary/import?format=xml", data="<a/>", content_type="text/plain")
+    assert response.status_code == 400
+
+
+def test_import_vocabulary_cli(app_factory, user_factory, tmp_path):
+    app = app_factory()
+    user_factory(app, username="ann", password="secret")
+    user_factory(app, username="bob", password="secret")
+    path = tmp_path / "words.csv"
+    path.write_text("\ufeffword,translation\ncat,kit\ndog,pes\n", encoding="utf-8")
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["import-vocabulary", str(path), "--user", "ann", "--user", "bob"])
+    assert result.exit_code == 0, result.output
+    assert "Inserted 4 words for 2 users (0 duplicates, 0 invalid rows skipped)." in result.output
+    assert _words(app, "bob") == [("cat", "kit"), ("dog", "pes")]
+
+    result = runner.invoke(args=["import-vocabulary", str(path), "--user", "nobody"])
+    assert result.exit_code != 0
+    assert "Unknown users: nobody" in result.output
+
+
+def test_read_rows_streams(app_factory, user_factory):
+    app = app_factory()
+    user_factory(app, username="ann", password="secret")
+    data = b"".join(b"word%d,slovo%d\n" % (n, n) for n in range(10000))
+    stream = io.BytesIO(data)
+
+    rows = read_rows(stream, "csv")
+    assert next(rows) == ("word0", "slovo0")
+    assert stream.tell() < len(data) // 4
+
+    with app.app_context():
+        result = import_vocabulary(rows, [User.query.filter_by(username="ann").one().id])
+    assert result.inserted == 9999
+    assert not stream.closed
+
+
+def test_editing_into_an_existing_word_is_refused(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    client.post("/vocabulary/import", data="cat,kit\ndog,pes\n", content_type="text/csv")
+    with app.app_context():
+        dog_id = Vocabulary.query.filter_by(word="dog").one().id
+
+    response = client.post(f"/vocabulary/edit/{dog_id}", data={"word": "Cat", "translation": "pes"})
+    assert response.status_code == 200
+    assert "already in your vocabulary" in response.get_data(as_text=True)
+    assert _words(app, "teacher") == [("cat", "kit"), ("dog", "pes")]
+
+    client.post(f"/vocabulary/edit/{dog_id}", data={"word": "Puppy", "translation": "cucenya"})
+    with app.app_context():
+        assert db.session.get(Vocabulary, dog_id).normalized_word == "puppy"
+
+
+def test_punctuation_only_words_are_refused(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+
+    response = client.post("/vocabulary/add", json={"word": "...", "translation": "krapky"})
+    assert response.status_code == 400
+    assert "punctuation" in response.get_json()["error"]
+    assert client.post("/vocabulary/add", json={"word": "cat", "translation": "kit"}).get_json()["success"]
+
+    with app.app_context():
+        cat_id = Vocabulary.query.filter_by(word="cat").one().id
+    response = client.post(f"/vocabulary/edit/{cat_id}", data={"word": "!!", "translation": "kit"})
+    assert "only punctuation" in response.get_data(as_text=True)
+    assert _words(app, "teacher") == [("cat", "kit")]
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import db
+from app.models import User, Vocabulary
+from app.vocab_review import MAX_DISTRACTOR_PROBES, sample_distractors
+
+
+def _seed_words(app, overdue_minutes):
+    """One word per entry, due that many minutes ago (negative: not due yet)."""
+    with app.app_context():
+        user = User.query.filter_by(username="student").one()
+        now = datetime.utcnow()
+        for idx, minutes in enumerate(overdue_minutes):
+            db.session.add(Vocabulary(
+                word=f"word{idx}",
+                translation=f"slovo{idx}",
+                user_id=user.id,
+                next_review=now - timedelta(minutes=minutes),
+                learning_stage=4,
+            ))
+        db.session.commit()
+
+
+def _client(app_factory, user_factory, login_helper):
+    app = app_factory()
+    user_factory(app, username="student", password="secret")
+    client = app.test_client()
+    login_helper(client, "student", "secret")
+    return app, client
+
+
+def test_review_serves_most_overdue_word_first(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    _seed_words(app, [5, 60, 30, -60])
+
+    page = client.get("/vocabulary/review").get_data(as_text=True)
+    assert "Words due: 3" in page
+    assert "slovo1" in page
+
+    # A correct answer reschedules the word and the queue moves on
+    with app.app_context():
+        word_id = Vocabulary.query.filter_by(word="word1").one().id
+    client.post("/vocabulary/review", data={"word_id": word_id, "answer": "word1"})
+    page = client.get("/vocabulary/review").get_data(as_text=True)
+    assert "Words due: 2" in page
+    assert "slovo2" in page
+
+    with client.session_transaction() as session:
+        assert "current_word_index" not in session
+
+
+def test_review_queue_uses_user_next_review_index(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    _seed_words(app, [1])
+
+    with app.app_context():
+        query = Vocabulary.query.filter(
+            Vocabulary.user_id == 1,
+            Vocabulary.next_review <= datetime.utcnow(),
+        ).order_by(Vocabulary.next_review, Vocabulary.id).limit(1)
+        sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "ix_vocabulary_user_next_review" in plan
+
+
+def test_distractors_are_sampled_from_own_vocabulary(app_factory, user_factory, login_helper):
+    app, _ = _client(app_factory, user_factory, login_helper)
+    user_factory(app, username="other", password="secret")
+    _seed_words(app, [0] * 4)
+
+    with app.app_context():
+        other = User.query.filter_by(username="other").one()
+        db.session.add(Vocabulary(word="foreign", translation="chuzhe", user_id=other.id))
+        db.session.commit()
+        student = User.query.filter_by(username="student").one()
+
+        for _ in range(20):
+            distractors = sample_distractors(student.id, "word0", "word")
+            assert sorted(distractors) == ["word1", "word2", "word3"]
+        assert sorted(sample_distractors(student.id, "slovo3", "translation")) == ["slovo0", "slovo1", "slovo2"]
+        assert sample_distractors(other.id, "foreign") == []
+
+
+def test_distractor_queries_do_not_grow_with_vocabulary(app_factory, user_factory, login_helper):
+    app, _ = _client(app_factory, user_factory, login_helper)
+    _seed_words(app, [0] * 500)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        student = User.query.filter_by(username="student").one()
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            distractors = sample_distractors(student.id, "word0")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+
+    assert len(set(distractors)) == 3
+    assert "word0" not in distractors
+    assert len(statements) <= 2 + MAX_DISTRACTOR_PROBES
+
+
+def test_review_batch_serves_ready_to_show_cards(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    _seed_words(app, [40, 30, 20, 10, -5])
+    with app.app_context():
+        for word, stage in zip(Vocabulary.query.order_by(Vocabulary.id), [0, 1, 2, 3, 0]):
+            word.learning_stage = stage
+        db.session.commit()
+
+    data = client.get("/vocabulary/review/batch?limit=3").get_json()
+    assert data["due"] == 4
+    cards = data["cards"]
+    assert [card["kind"] for card in cards] == ["choose_word", "choose_translation", "unscramble"]
+    assert cards[0]["question"] == "slovo0"
+    assert "word0" in cards[0]["options"] and len(cards[0]["options"]) == 4
+    assert "slovo1" in cards[1]["options"]
+    assert sorted(cards[2]["scrambled"]) == sorted("word2")
+
+    # The regular review page renders the same card for stage 0
+    page = client.get("/vocabulary/review").get_data(as_text=True)
+    assert "slovo0" in page and "word0" in page
+
+
+def test_review_batch_grades_answers_in_one_transaction(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    user_factory(app, username="other", password="secret")
+    _seed_words(app, [30, 20, 10])
+    with app.app_context():
+        other = User.query.filter_by(username="other").one()
+        foreign = Vocabulary(word="foreign", translation="chuzhe", user_id=other.id)
+        db.session.add(foreign)
+        db.session.commit()
+        ids = [word.id for word in Vocabulary.query.filter(Vocabulary.user_id != other.id).order_by(Vocabulary.id)]
+        foreign_id = foreign.id
+
+    response = client.post("/vocabulary/review/batch", json={"answers": [
+        {"id": ids[0], "stage": 4, "answer": " Word0 "},
+        {"id": ids[1], "stage": 4, "answer": "wrong"},
+        {"id": foreign_id, "stage": 0, "answer": "chuzhe"},
+    ]})
+    data = response.get_json()
+    assert data["success"] is True
+    assert [result.get("correct") for result in data["results"]] == [True, False, None]
+    assert data["results"][1]["correct_answer"] == "word1"
+    assert data["results"][2]["error"] == "not_found"
+    assert data["due"] == 1
+
+    with app.app_context():
+        assert db.session.get(Vocabulary, ids[0]).learning_stage == 5
+        assert db.session.get(Vocabulary, ids[1]).learning_stage == 0
+        assert db.session.get(Vocabulary, foreign_id).learning_stage == 0
+
+    assert client.post("/vocabulary/review/batch", json={"answers": [{"id": "x"}]}).status_code == 400
+    # The served stage must be echoed back
+    assert client.post("/vocabulary/review/batch", json={"answers": [{"id": ids[2], "answer": "word2"}]}).status_code == 400
+    assert client.post("/vocabulary/review/batch", json={}).status_code == 400
+
+
+def test_review_batch_grades_each_served_card_once(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    _seed_words(app, [30, 20, -5])
+    with app.app_context():
+        ids = [word.id for word in Vocabulary.query.order_by(Vocabulary.id)]
+
+    response = client.post("/vocabulary/review/batch", json={"answers": [
+        {"id": ids[0], "stage": 4, "answer": "word0"},
+        {"id": ids[0], "stage": 4, "answer": "word0"},
+        # Served at stage 3, but the word has moved on since
+        {"id": ids[1], "stage": 3, "answer": "slovo1"},
+        # Not due yet
+        {"id": ids[2], "stage": 4, "answer": "word2"},
+    ]})
+    results = response.get_json()["results"]
+    assert results[0]["correct"] is True
+    assert [result.get("skipped") for result in results[1:]] == ["duplicate", "stale", "stale"]
+    with app.app_context():
+        assert [db.session.get(Vocabulary, word_id).learning_stage for word_id in ids] == [5, 4, 4]
+
+    # Resending the same answer is stale: the word is no longer due or at stage 4
+    response = client.post("/vocabulary/review/batch", json={"answers": [{"id": ids[0], "stage": 4, "answer": "word0"}]})
+    assert response.get_json()["results"] == [{"id": ids[0], "skipped": "stale"}]
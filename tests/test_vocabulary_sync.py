@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import User, Vocabulary, VocabularyTombstone
+from app.vocab_sync import encode_token, prune_tombstones
+
+
+def _client(app_factory, user_factory, login_helper, **overrides):
+    app = app_factory(**overrides)
+    user_factory(app, username="student", password="secret")
+    client = app.test_client()
+    login_helper(client, "student", "secret")
+    with app.app_context():
+        user = User.query.filter_by(username="student").one()
+        for idx in range(5):
+            db.session.add(Vocabulary(
+                word=f"word{idx}",
+                translation=f"slovo{idx}",
+                user_id=user.id,
+                next_review=datetime.utcnow() - timedelta(minutes=idx),
+                learning_stage=4,
+            ))
+        db.session.commit()
+    return app, client
+
+
+def _download_all(client, token=None):
+    words, deleted = {}, []
+    while True:
+        data = client.get("/vocabulary/sync", query_string={"since": token} if token else None).get_json()
+        words.update({word["id"]: word for word in data["words"]})
+        deleted.extend(data["deleted"])
+        token = data["token"]
+        if not data["more"]:
+            return words, deleted, token
+
+
+def test_full_download_pages_then_sends_only_changes(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper, SYNC_PAGE_SIZE=2)
+
+    first = client.get("/vocabulary/sync").get_json()
+    assert first["full"] is True and first["more"] is True
+    assert len(first["words"]) == 2
+    words, deleted, token = _download_all(client)
+    assert sorted(word["word"] for word in words.values()) == [f"word{idx}" for idx in range(5)]
+    assert deleted == []
+
+    # A token from before the last writes, past the safety window
+    with app.app_context():
+        token = encode_token(datetime.utcnow(), 0)
+        edited = Vocabulary.query.filter_by(word="word1").one()
+        edited.translation = "nove slovo"
+        removed_id = Vocabulary.query.filter_by(word="word2").one().id
+        db.session.commit()
+        edited_id = edited.id
+
+    assert client.post(f"/vocabulary/delete/{removed_id}").status_code == 302
+    data = client.get("/vocabulary/sync", query_string={"since": token}).get_json()
+    assert data["full"] is False
+    assert [word["id"] for word in data["words"]] == [edited_id]
+    assert data["words"][0]["translation"] == "nove slovo"
+    assert data["deleted"] == [removed_id]
+
+
+def test_words_deleted_during_a_full_sync_are_sent_next(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper, SYNC_PAGE_SIZE=2, SYNC_SAFETY_WINDOW=0)
+
+    first = client.get("/vocabulary/sync").get_json()
+    # A word from the first page is deleted while the client is still paging
+    removed_id = first["words"][0]["id"]
+    assert client.post(f"/vocabulary/delete/{removed_id}").status_code == 302
+    words, deleted, token = _download_all(client, first["token"])
+    assert removed_id not in words and deleted == []
+
+    data = client.get("/vocabulary/sync", query_string={"since": token}).get_json()
+    assert data["full"] is False
+    assert data["deleted"] == [removed_id]
+
+
+def test_expired_or_invalid_tokens(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+
+    with app.app_context():
+        stale = encode_token(datetime.utcnow() - timedelta(seconds=app.config["SYNC_TOMBSTONE_TTL"] + 1), 0)
+    data = client.get("/vocabulary/sync", query_string={"since": stale}).get_json()
+    assert data["full"] is True
+    assert len(data["words"]) == 5
+
+    assert client.get("/vocabulary/sync", query_string={"since": "garbage"}).status_code == 400
+    assert client.post("/vocabulary/sync", json={"since": "garbage"}).status_code == 400
+
+
+def test_review_log_replays_once(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    with app.app_context():
+        ids = [word.id for word in Vocabulary.query.order_by(Vocabulary.id)]
+    reviewed_at = datetime.utcnow() - timedelta(hours=2)
+    log = [
+        {"id": ids[0], "answer": "word0", "reviewed_at": reviewed_at.isoformat() + "Z"},
+        {"id": ids[0], "answer": "wrong", "reviewed_at": (reviewed_at + timedelta(minutes=1)).isoformat() + "Z"},
+        {"id": ids[1], "answer": "word1", "reviewed_at": reviewed_at.isoformat() + "+00:00"},
+    ]
+
+    data = client.post("/vocabulary/sync", json={"reviews": log}).get_json()
+    assert data["success"] is True
+    assert [result.get("correct") for result in data["results"]] == [True, False, True]
+    assert data["full"] is True
+    with app.app_context():
+        word0 = db.session.get(Vocabulary, ids[0])
+        word1 = db.session.get(Vocabulary, ids[1])
+        assert word0.learning_stage == 0
+        assert word0.last_reviewed_at == reviewed_at + timedelta(minutes=1)
+        assert word0.next_review == reviewed_at + timedelta(minutes=2)
+        assert word1.learning_stage == 5
+
+    # Retrying the same upload after a dropped reply changes nothing
+    data = client.post("/vocabulary/sync", json={"reviews": log}).get_json()
+    assert [result.get("skipped") for result in data["results"]] == ["stale"] * 3
+    with app.app_context():
+        assert db.session.get(Vocabulary, ids[1]).learning_stage == 5
+
+    bad = [{"id": ids[0], "answer": "word0", "reviewed_at": "yesterday"}]
+    assert client.post("/vocabulary/sync", json={"reviews": bad}).status_code == 400
+
+
+def test_prune_tombstones(app_factory, user_factory, login_helper):
+    app, client = _client(app_factory, user_factory, login_helper)
+    with app.app_context():
+        for word in Vocabulary.query.limit(2):
+            db.session.delete(word)
+        db.session.commit()
+        assert VocabularyTombstone.query.count() == 2
+
+        later = datetime.utcnow() + timedelta(seconds=app.config["SYNC_TOMBSTONE_TTL"] + 1)
+        assert prune_tombstones() == 0
+        assert prune_tombstones(later) == 2